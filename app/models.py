@@ -85,6 +85,9 @@ class TestSession(db.Model):
     # Resultado final (JSON ou texto)
     ai_result = db.Column(db.Text)
 
+    # Mapa exato do relatório (`compact_chart`, ~330 bytes)
+    chart_blob = db.Column(db.LargeBinary, nullable=True)
+
 
 class PromptLog(db.Model):
     __tablename__ = "prompt_logs"
@@ -94,6 +97,17 @@ class PromptLog(db.Model):
     prompt_text = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
+    # Ledger das chamadas ao LLM (ver `llm_gateway`)
+    purpose = db.Column(db.String(30), nullable=True)       # report, compatibility, guru…
+    model = db.Column(db.String(50), nullable=True)
+    temperature = db.Column(db.Float, nullable=True)
+    prompt_tokens = db.Column(db.Integer, nullable=True)
+    completion_tokens = db.Column(db.Integer, nullable=True)
+    latency_ms = db.Column(db.Float, nullable=True)         # chamada inteira (stream até o fim)
+    ttft_ms = db.Column(db.Float, nullable=True)            # até o primeiro token
+    status = db.Column(db.String(10), nullable=True)        # ok, error
+    error = db.Column(db.Text, nullable=True)
+
     def __repr__(self) -> str:
         return f"<PromptLog {self.id} – {self.user_email} at {self.created_at}>"
 
@@ -139,3 +153,134 @@ class Payment(db.Model):
 
     def __repr__(self) -> str:
         return f"<Payment {self.id} – User {self.user_id} – {self.status}>"
+
+
+class GeocodeCache(db.Model):
+    """Cache persistente de geocodificação (ver `geocoding_service`)."""
+
+    __tablename__ = "geocode_cache"
+
+    # "cidade|país" sem acentos/caixa — ex.: "sao paulo|brasil"
+    place_key = db.Column(db.String(255), primary_key=True)
+    city = db.Column(db.String(100))
+    country = db.Column(db.String(100))
+    lat = db.Column(db.Float, nullable=True)   # NULL ⇒ "sem resultados"
+    lon = db.Column(db.Float, nullable=True)
+    found = db.Column(db.Boolean, default=True, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<GeocodeCache {self.place_key} – found={self.found}>"
+
+
+class ChartCache(db.Model):
+    """Mapas natais memoizados (ver `chart_cache`)."""
+
+    __tablename__ = "chart_cache"
+
+    # "jd=…|lat=…|lon=…|hs=…|orbs=…"
+    fingerprint = db.Column(db.String(128), primary_key=True)
+    version = db.Column(db.String(16), nullable=False, index=True)
+    payload = db.Column(db.Text, nullable=False)   # JSON: positions + aspects
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ChartCache {self.fingerprint} v{self.version}>"
+
+
+class LLMCacheEntry(db.Model):
+    """Respostas do LLM endereçadas pelo conteúdo do prompt (ver `llm_cache`)."""
+
+    __tablename__ = "llm_cache"
+
+    # sha256 de versão do template, finalidade, modelo, temperatura, max_tokens e mensagens
+    cache_key = db.Column(db.String(64), primary_key=True)
+    purpose = db.Column(db.String(30), nullable=False)
+    prompt_version = db.Column(db.String(20), nullable=False)
+    model = db.Column(db.String(50), nullable=False)
+    response = db.Column(db.Text, nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    last_hit_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<LLMCacheEntry {self.cache_key[:12]} {self.purpose} v{self.prompt_version}>"
+
+
+class SkyEvent(db.Model):
+    """Calendário global do céu, um ano por vez (ver `sky_calendar`)."""
+
+    __tablename__ = "sky_events"
+
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False, index=True)
+    jd = db.Column(db.Float, nullable=False, index=True)   # Julian Day UT
+    kind = db.Column(db.String(20), nullable=False)        # ingress, station, new_moon…
+    body = db.Column(db.String(10), nullable=False)
+    sign = db.Column(db.String(20), nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    detail = db.Column(db.String(20))                      # retrograde/direct, tipo do eclipse
+
+    def __repr__(self) -> str:
+        return f"<SkyEvent {self.kind} {self.body} jd={self.jd:.4f}>"
+
+
+class ChartVector(db.Model):
+    """Longitudes de cada mapa gerado, fonte do índice de similaridade (ver `chart_index`)."""
+
+    __tablename__ = "chart_vectors"
+
+    session_id = db.Column(db.Integer, db.ForeignKey("test_sessions.id"), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+    birth_year = db.Column(db.Integer, nullable=True)
+    sun_sign = db.Column(db.String(20), nullable=True)
+    longitudes = db.Column(db.Text, nullable=False)   # JSON: 11 longitudes (SUN … PLUTO, ASC)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"<ChartVector sessão {self.session_id}>"
+
+
+class SolarReturn(db.Model):
+    """Revoluções solares pré‑calculadas por sessão e ano (ver `returns_service`)."""
+
+    __tablename__ = "solar_returns"
+
+    session_id = db.Column(db.Integer, db.ForeignKey("test_sessions.id"), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    jd = db.Column(db.Float, nullable=False)                # Julian Day UT do retorno exato
+    moon_longitude = db.Column(db.Float, nullable=False)    # mapa do retorno no local de nascimento
+    asc_longitude = db.Column(db.Float, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<SolarReturn sessão {self.session_id} {self.year}>"
+
+
+class ReportJob(db.Model):
+    """Fila persistente de geração de relatórios (ver `job_queue`)."""
+
+    __tablename__ = "report_jobs"
+    __table_args__ = (db.Index("ix_report_jobs_ready", "status", "run_after"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(
+        db.Integer, db.ForeignKey("test_sessions.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    kind = db.Column(db.String(20), nullable=False, default="report")
+    status = db.Column(db.String(10), nullable=False, default="queued")   # queued, running, done, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)   # backoff
+    locked_by = db.Column(db.String(100), nullable=True)     # host:pid:id do worker
+    lease_until = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    partial_text = db.Column(db.Text, nullable=True)        # texto já gerado (SSE do relatório)
+    use_cache = db.Column(db.Boolean, nullable=True, default=True)   # False ⇒ ignora o llm_cache
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<ReportJob {self.id} sessão {self.session_id} – {self.status}>"
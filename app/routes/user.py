@@ -1,10 +1,11 @@
 # ── IMPORTS ───────────────────────────────────────────────────────────
-import os, json, threading, asyncio
+import os, json, asyncio, time
 from datetime import datetime
 
 from flask import (
     Blueprint, render_template, request, redirect,
-    url_for, flash, session, current_app, make_response
+    url_for, flash, session, current_app, make_response, jsonify,
+    stream_with_context
 )
 from sqlalchemy import func
 from pyppeteer import launch
@@ -14,19 +15,51 @@ from app.models import User, TestSession, GuruQuestion
 from app.services.perfil_service import (
     generate_report_via_ai as generate_skyai_report_via_ai
 )
-from app.services.astrology_service import get_astrological_signs
-from app.services.numerology_service import get_numerology
+from app.services.astrology_service import get_astrological_data
+from app.services import (
+    chart_cache, chart_index, compact_chart, compatibility_service, ephemeris_executor,
+    http_client, job_queue, llm_cache, llm_gateway, sky_calendar, synastry_service, unknown_time_service,
+)
 from app.models import Payment
 
 import re
 
 current_year = datetime.utcnow().year       # ← defina ANTES do prompt
 
-# (opcional) import OpenAI somente dentro das funções que usam
+# Chamadas ao OpenAI: sempre via `llm_gateway` (cliente compartilhado + ledger)
 
 # ── CONFIGURAÇÕES ──────────────────────────────────────────────────────
 user_bp = Blueprint("user", __name__, template_folder="../templates")
 
+# Streaming (SSE): intervalo de gravação/leitura do texto parcial do relatório
+# e duração máxima de cada conexão (abaixo do --timeout do gunicorn; o
+# EventSource reconecta sozinho e retoma pelo Last-Event-ID)
+#
+# ⚠️ Capacidade: cada stream aberto (tela de carregamento, compatibilidade,
+# Guru) ocupa uma thread do gthread enquanto durar — quase sempre dormindo,
+# mas ocupada. Por isso o Procfile sobe o web com `WEB_THREADS` (padrão 32)
+# threads por processo: cabem ~24 streams simultâneos por dyno com folga
+# para o resto do site. Mais compradores ao mesmo tempo → mais
+# WEB_THREADS/WEB_CONCURRENCY (cada poll usa uma conexão do pool do banco
+# por um instante) ou mais dynos. SSE_POLL_SECONDS maior = menos SELECTs
+# por stream, texto chegando em saltos maiores.
+SSE_POLL_SECONDS = float(os.getenv("SSE_POLL_SECONDS", "1.0"))
+SSE_MAX_SECONDS  = float(os.getenv("SSE_MAX_SECONDS", "55"))
+
+# 🔹 Server‑Sent Events: um evento (dados em JSON) e a resposta em streaming
+def sse_event(event, data, event_id=None):
+    linhas = [f"event: {event}"]
+    if event_id is not None:
+        linhas.append(f"id: {event_id}")
+    linhas.append("data: " + json.dumps(data, ensure_ascii=False))
+    return "\n".join(linhas) + "\n\n"
+
+def sse_response(eventos):
+    resp = current_app.response_class(stream_with_context(eventos), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"    # nginx/proxy: não bufferizar
+    return resp
+
 # 🔹 Página para o usuário preencher seus dados astrais
 @user_bp.route('/preencher-dados', methods=['GET', 'POST'])
 def preencher_dados():
@@ -63,7 +96,8 @@ def preencher_dados():
             'birth_date': birth_date_str,
             'birth_time': birth_time,
             'birth_city': birth_city,
-            'birth_country': birth_country
+            'birth_country': birth_country,
+            'fresh': request.values.get('fresh') == '1',   # ignora o cache de respostas do LLM
         }
         session.modified = True
 
@@ -103,6 +137,14 @@ def processando_relatorio():
 
         # Ainda processando → permanece na tela de loading
         if sessao.ai_result is None:
+            job = job_queue.job_for_session(sessao.id)
+            if job is None:
+                # Sessão de antes da fila (ou job perdido): enfileira de novo
+                job_queue.enqueue(sessao.id)
+                db.session.commit()
+            elif job.status == job_queue.DEAD:
+                flash("No pudimos generar tu informe. Nuestro equipo ya fue notificado; inténtalo más tarde.", "danger")
+                return redirect(url_for("auth_views.dashboard"))
             return render_template(
                 "carregando.html",
                 sessao_id=sessao.id,
@@ -143,19 +185,16 @@ def processando_relatorio():
             birth_country = pending["birth_country"],
         )
         db.session.add(new_sessao)
+        db.session.flush()
+
+        # 3️⃣ Enfileira a geração na mesma transação (executada pelo `worker.py`)
+        job_queue.enqueue(new_sessao.id, use_cache=not pending.get("fresh"))
         db.session.commit()
 
         # Limpa dados pendentes
         session.pop("pending_data", None)
         session.modified = True
 
-        # 3️⃣ Dispara geração em background
-        threading.Thread(
-            target=gerar_relatorio_background,
-            args=(current_app._get_current_object(), new_sessao.id),
-            daemon=True,
-        ).start()
-
         return render_template(
             "carregando.html",
             sessao_id=new_sessao.id,
@@ -168,50 +207,146 @@ def processando_relatorio():
         flash("Error inesperado al generar tu informe. Inténtalo de nuevo.", "danger")
         return redirect(url_for("auth_views.dashboard"))
 
-# 🔹 Função de geração do relatório em background
-def gerar_relatorio_background(app, sessao_id):
-    with app.app_context():
-        try:
-            sessao = TestSession.query.get(sessao_id)
-            if not sessao:
-                current_app.logger.error(f"[BACKGROUND] Sessão {sessao_id} não encontrada.")
-                return
+# 🔹 Mapa natal da sessão (cache de mapas → barato); None se falhar
+def calcular_mapa(sessao):
+    try:
+        return get_astrological_data(
+            sessao.birth_date.strftime("%Y-%m-%d"),
+            sessao.birth_time.strftime("%H:%M"),
+            sessao.birth_city,
+            sessao.birth_country,
+        )
+    except Exception as e:
+        current_app.logger.warning(f"[ASTRO] Mapa da sessão {sessao.id} não calculado: {e}")
+        return None
 
-            dados = {
-                "full_name": sessao.full_name,
-                "birth_date": sessao.birth_date.strftime("%Y-%m-%d"),
-                "birth_time": sessao.birth_time,
-                "birth_city": sessao.birth_city,
-                "birth_country": sessao.birth_country,
-            }
+# 🔹 Inclui o mapa da sessão no índice de mapas parecidos
+def indexar_mapa(sessao, astro=None):
+    try:
+        astro = astro or calcular_mapa(sessao)
+        if astro is None:
+            return
+        chart_index.add_chart(sessao.id, sessao.user_id, astro, sessao.birth_date.year)
+    except Exception as e:
+        current_app.logger.warning(f"[CHART INDEX] Sessão {sessao.id} não indexada: {e}")
 
-            current_app.logger.info(f"[BACKGROUND] Gerando relatório para sessão {sessao_id}")
-            resultado = generate_skyai_report_via_ai(dados)
+# 🔹 Geração do relatório — job "report" da fila (roda no `worker.py`)
+# Falhas levantam exceção: o `job_queue` reagenda com backoff ou manda ao dead‑letter.
+def gerar_relatorio_job(sessao_id):
+    sessao = db.session.get(TestSession, sessao_id)
+    if not sessao:
+        current_app.logger.error(f"[JOB] Sessão {sessao_id} não encontrada.")
+        return
+    if sessao.ai_result is not None:   # tentativa anterior já gravou (lease venceu depois)
+        return
+
+    dados = {
+        "full_name": sessao.full_name,
+        "birth_date": sessao.birth_date.strftime("%Y-%m-%d"),
+        "birth_time": sessao.birth_time,
+        "birth_city": sessao.birth_city,
+        "birth_country": sessao.birth_country,
+        "email": getattr(db.session.get(User, sessao.user_id), "email", None),
+    }
 
-            # Se a IA indicou erro ➜ aborta
-            if resultado.get("erro"):
-                current_app.logger.error(f"[AI ❌] {resultado['erro']}")
-                return
+    # Texto parcial no job (no máximo a cada SSE_POLL_SECONDS) → /relatorio/stream
+    ultimo = {"t": 0.0, "texto": ""}
+    def progresso(texto):
+        agora = time.monotonic()
+        if agora - ultimo["t"] < SSE_POLL_SECONDS or texto == ultimo["texto"]:
+            return
+        ultimo.update(t=agora, texto=texto)
+        try:
+            job_queue.progress(sessao_id, texto)
+        except Exception as e:
+            current_app.logger.warning(f"[JOB] Progresso da sessão {sessao_id} não gravado: {e}")
+
+    current_app.logger.info(f"[JOB] Gerando relatório para sessão {sessao_id}")
+    astro = calcular_mapa(sessao)   # um cálculo só: prompt, blob e índice
+    job = job_queue.job_for_session(sessao_id)
+    usar_cache = job is None or job.use_cache is not False   # NULL (jobs antigos) ⇒ usa o cache
+    resultado = generate_skyai_report_via_ai(dados, astro, on_text=progresso, use_cache=usar_cache)
+
+    # Se a IA indicou erro ➜ tenta de novo mais tarde
+    if resultado.get("erro"):
+        raise RuntimeError(f"[AI ❌] {resultado['erro']}")
+
+    # Grava somente se o JSON está completo (sun_sign presente)
+    if not resultado.get("sun_sign"):
+        raise RuntimeError("[AI ⚠️] JSON inválido; relatório ignorado.")
+
+    sessao.ai_result  = json.dumps(resultado, ensure_ascii=False)
+    sessao.sun_sign   = resultado["sun_sign"]
+    sessao.moon_sign  = resultado["moon_sign"]
+    sessao.ascendant  = resultado["ascendant"]
+    sessao.life_path  = resultado["life_path"]
+    sessao.soul_urge  = resultado["soul_urge"]
+    sessao.expression = resultado["expression"]
+    if astro is not None:
+        sessao.chart_blob = compact_chart.encode(astro)
+    db.session.commit()
+    current_app.logger.info(f"[AI ✅] Relatório salvo – sessão {sessao_id}")
+    indexar_mapa(sessao, astro)
+
+
+job_queue.register("report", gerar_relatorio_job)
+
+# 🔹 Relatório em streaming (SSE) para a tela de carregamento: repassa o texto
+#    que o worker vai gravando no job e avisa quando o relatório fica pronto
+@user_bp.route("/relatorio/stream")
+def relatorio_stream():
+    if "user_id" not in session:
+        return jsonify(error="Inicia sesión para ver tu informe."), 401
 
-            # Grava somente se o JSON está completo (sun_sign presente)
-            if resultado.get("sun_sign"):
-                sessao.ai_result  = json.dumps(resultado, ensure_ascii=False)
-                sessao.sun_sign   = resultado["sun_sign"]
-                sessao.moon_sign  = resultado["moon_sign"]
-                sessao.ascendant  = resultado["ascendant"]
-                sessao.life_path  = resultado["life_path"]
-                sessao.soul_urge  = resultado["soul_urge"]
-                sessao.expression = resultado["expression"]
-                db.session.commit()
-                current_app.logger.info(f"[AI ✅] Relatório salvo – sessão {sessao_id}")
-            else:
-                # JSON inválido ➜ não salva; mantém sessão sem resultado
-                current_app.logger.warning(f"[AI ⚠️] JSON inválido; relatório ignorado.")
-                db.session.rollback()
+    sessao = TestSession.query.filter_by(id=request.args.get("sessao_id"), user_id=session["user_id"]).first()
+    if not sessao:
+        return jsonify(error="Sesión no encontrada."), 404
 
-        except Exception as e:
-            db.session.rollback()
-            current_app.logger.error(f"[BACKGROUND EXCEPTION] {e}")
+    sessao_id  = sessao.id
+    pronto     = sessao.ai_result is not None
+    url_pronto = url_for("user.gerar_relatorio", sessao_id=sessao_id)
+    url_espera = url_for("user.processando_relatorio", sessao_id=sessao_id)   # reenfileira / mostra o erro
+    try:
+        enviado = int(request.headers.get("Last-Event-ID") or 0)   # reconexão: caracteres já recebidos
+    except ValueError:
+        enviado = 0
+    db.session.close()   # cada leitura abaixo usa conexão própria e curta
+
+    def eventos():
+        nonlocal enviado
+        yield "retry: 2000\n\n"
+        if pronto:
+            yield sse_event("done", {"url": url_pronto})
+            return
+        status = None
+        inicio = ultimo_envio = time.monotonic()
+        while time.monotonic() - inicio < SSE_MAX_SECONDS:
+            estado = job_queue.progress_for_session(sessao_id)
+            if estado is None or estado["status"] == job_queue.DEAD:
+                yield sse_event("failed", {"url": url_espera})
+                return
+            if estado["status"] == job_queue.DONE:
+                yield sse_event("done", {"url": url_pronto})
+                return
+            if estado["status"] != status:
+                status = estado["status"]
+                yield sse_event("status", {"status": status, "attempt": estado["attempts"]})
+                ultimo_envio = time.monotonic()
+
+            texto = estado["text"]
+            if len(texto) < enviado:            # nova tentativa: recomeça do zero
+                enviado = 0
+                yield sse_event("reset", "", event_id=0)
+            if len(texto) > enviado:
+                yield sse_event("token", texto[enviado:], event_id=len(texto))
+                enviado = len(texto)
+                ultimo_envio = time.monotonic()
+            elif time.monotonic() - ultimo_envio > 15:
+                yield ": ping\n\n"             # mantém proxies com a conexão aberta
+                ultimo_envio = time.monotonic()
+            time.sleep(SSE_POLL_SECONDS)
+
+    return sse_response(eventos())
 
 # 🔹 Tela para visualizar o relatório
 @user_bp.route("/relatorio")
@@ -486,68 +621,63 @@ def select_product():
 
     return render_template('products.html')
 
-@user_bp.route("/compatibility", methods=["GET", "POST"])
-def compatibility():
-    # ─────────── Requer login ───────────
-    if "user_id" not in session:
-        flash("Inicia sesión para continuar.", "error")
-        return redirect(url_for("auth_views.login_view"))
-
-    user = User.query.get(session["user_id"])
+# 🔹 Compatibilidade: mapas, numerologia, sinastria e mensagens para o modelo
+#    (POST do formulário e /compatibility/stream). None se faltar campo.
+COMPAT_LLM = dict(model="gpt-4o-mini", temperature=0.85, max_tokens=1300, purpose="compatibility")
+COMPAT_PROMPT_VERSION = "2026.10"   # versão do template no `llm_cache`; suba ao mudar o prompt
 
-    # ─────────── Bloqueio se já usado ───────────
-    if user.compatibility_used:
-        flash("Ya usaste tu prueba de Compatibilidad. Compra nuevamente para desbloquear una nueva.", "info")
-        return redirect(url_for("auth_views.dashboard"))
-
-    # ─────────── Mostra formulário (GET) ─────────
-    if request.method == "GET":
-        return render_template("compatibility.html")
+# Cache da compatibilidade, salvo com `fresh=1` no formulário
+def compat_cache():
+    return None if request.values.get("fresh") == "1" else COMPAT_PROMPT_VERSION
 
-    # ─────────── POST: valida campos ────────────
-    name_1            = request.form.get("name_1")
-    birth_1           = request.form.get("birth_1")
-    birth_time_1      = request.form.get("birth_time_1")
-    birth_city_1      = request.form.get("birth_city_1")
-    birth_country_1   = request.form.get("birth_country_1")
+def preparar_compatibilidade(form):
+    name_1            = form.get("name_1")
+    birth_1           = form.get("birth_1")
+    birth_time_1      = form.get("birth_time_1")
+    birth_city_1      = form.get("birth_city_1")
+    birth_country_1   = form.get("birth_country_1")
 
-    name_2            = request.form.get("name_2")
-    birth_2           = request.form.get("birth_2")
-    birth_time_2      = request.form.get("birth_time_2")
-    birth_city_2      = request.form.get("birth_city_2")
-    birth_country_2   = request.form.get("birth_country_2")
+    name_2            = form.get("name_2")
+    birth_2           = form.get("birth_2")
+    birth_time_2      = form.get("birth_time_2")
+    birth_city_2      = form.get("birth_city_2")
+    birth_country_2   = form.get("birth_country_2")
 
     if not all([
         name_1, birth_1, birth_time_1, birth_city_1, birth_country_1,
         name_2, birth_2, birth_time_2, birth_city_2, birth_country_2
     ]):
-        flash("Por favor, completa todos los campos para ambas personas.", "warning")
-        return render_template("compatibility.html")
-
-    try:
-        # ── Calcula astrologia / numerologia ──
-        from app.services.astrology_service import get_astrological_signs
-        from app.services.numerology_service import get_numerology
-
-        astro_1 = get_astrological_signs(birth_1, birth_time_1, birth_city_1, birth_country_1)
-        if isinstance(astro_1, tuple):
-            astro_1 = {"positions": {"SUN": {"sign": astro_1[0]},
-                                      "MOON": {"sign": astro_1[1]},
-                                      "ASC": {"sign": astro_1[2]}}}
-        num_1   = get_numerology(name_1, birth_1)
-
-        astro_2 = get_astrological_signs(birth_2, birth_time_2, birth_city_2, birth_country_2)
-        if isinstance(astro_2, tuple):
-            astro_2 = {"positions": {"SUN": {"sign": astro_2[0]},
-                                      "MOON": {"sign": astro_2[1]},
-                                      "ASC": {"sign": astro_2[2]}}}
-        num_2   = get_numerology(name_2, birth_2)
+        return None
+
+    pessoa_1 = {"name": name_1, "birth_date": birth_1, "birth_time": birth_time_1,
+                "birth_city": birth_city_1, "birth_country": birth_country_1}
+    pessoa_2 = {"name": name_2, "birth_date": birth_2, "birth_time": birth_time_2,
+                "birth_city": birth_city_2, "birth_country": birth_country_2}
+    nomes = (name_1, name_2)   # exibidos na ordem do formulário
+
+    # Ordem canônica no prompt: A × B e B × A viram o mesmo texto (mesma entrada no `llm_cache`)
+    def ordem(p):
+        return tuple(" ".join(p[k].split()).casefold()
+                     for k in ("birth_date", "birth_time", "name", "birth_city", "birth_country"))
+    if ordem(pessoa_2) < ordem(pessoa_1):
+        pessoa_1, pessoa_2 = pessoa_2, pessoa_1
+    name_1, name_2 = pessoa_1["name"], pessoa_2["name"]
+
+    # ── Astrologia + numerologia das duas pessoas, em paralelo ──
+    res_1, res_2, timings = compatibility_service.compute_pair(
+        pessoa_1, pessoa_2, app=current_app._get_current_object(),
+    )
+    astro_1, num_1 = res_1["astro"], res_1["numerology"]
+    astro_2, num_2 = res_2["astro"], res_2["numerology"]
 
-        # ── Gera análise via OpenAI ──
-        from openai import OpenAI
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    # ── Sinastria (aspectos cruzados A × B + pontuação) ──
+    t0 = time.perf_counter()
+    synastry = synastry_service.synastry(astro_1, astro_2)
+    synastry_block = synastry_service.format_synastry(synastry, limit=12)
+    timings["synastry_ms"] = round((time.perf_counter() - t0) * 1000, 1)
 
-        prompt = f"""
+    # ── Prompt para OpenAI ──
+    prompt = f"""
 Eres el Guru SkyAI, experto en compatibilidad astrológica y numerológica.
 Responde **exclusivamente en español de México (es-MX)**. **No saludes**; entrega SOLO el informe.
 
@@ -580,33 +710,75 @@ PERSONA B
 • Número de Anhelo del Alma: {num_2['soul_urge']}  
 • Número de Expresión: {num_2['expression']}
 
+SINASTRÍA (aspectos entre los planetas de A y los de B; los más fuertes primero)  
+{synastry_block}
+
 Escribe 400–600 palabras.  
 → Sé directo, claro y totalmente anclado en los datos anteriores.  
+→ Apóyate en los aspectos de sinastría para fortalezas (armónicos) y desafíos (tensos).  
 → Habla solo de tendencias presentes y potenciales futuras; evita referencias al pasado salvo que se te pida explícitamente.
 """
+    mensagens = [
+        {"role": "system", "content": "Eres el Guru SkyAI, maestro en compatibilidad. Responde en español de México (es-MX)."},
+        {"role": "user", "content": prompt}
+    ]
+    return nomes[0], nomes[1], mensagens, timings
+
+# 🔹 Salva o resultado e marca o uso (mesma gravação nos dois caminhos)
+def salvar_compatibilidade(user_id, name_1, name_2, result_text, timings, t_start):
+    t0 = time.perf_counter()
+    user = db.session.get(User, user_id)
+    match = GuruQuestion(
+        user_id = user.id,
+        question = f"Compatibility {name_1} × {name_2}",
+        answer   = result_text
+    )
+    db.session.add(match)
+
+    user.compatibility_used = True      # bloqueia novo teste grátis
+    db.session.commit()                 # grava e gera match.id
+    timings["db_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    timings["total_ms"] = round((time.perf_counter() - t_start) * 1000, 1)
+    current_app.logger.info(
+        "[COMPATIBILITY ⏱] " + " ".join(f"{k}={v}" for k, v in timings.items())
+    )
+    return match
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Eres el Guru SkyAI, maestro en compatibilidad. Responde en español de México (es-MX)."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.85,
-            max_tokens=1300
-        )
+@user_bp.route("/compatibility", methods=["GET", "POST"])
+def compatibility():
+    # ─────────── Requer login ───────────
+    if "user_id" not in session:
+        flash("Inicia sesión para continuar.", "error")
+        return redirect(url_for("auth_views.login_view"))
 
-        result_text = response.choices[0].message.content.strip()
+    user = User.query.get(session["user_id"])
 
-               # ─────────── Salva resultado e marca uso ───────────
-        match = GuruQuestion(
-            user_id = user.id,
-            question = f"Compatibility {name_1} × {name_2}",
-            answer   = result_text
-        )
-        db.session.add(match)
+    # ─────────── Bloqueio se já usado ───────────
+    if user.compatibility_used:
+        flash("Ya usaste tu prueba de Compatibilidad. Compra nuevamente para desbloquear una nueva.", "info")
+        return redirect(url_for("auth_views.dashboard"))
+
+    # ─────────── Mostra formulário (GET) ─────────
+    if request.method == "GET":
+        return render_template("compatibility.html")
+
+    try:
+        t_start = time.perf_counter()
+        preparado = preparar_compatibilidade(request.form)
+        if preparado is None:
+            flash("Por favor, completa todos los campos para ambas personas.", "warning")
+            return render_template("compatibility.html")
+        name_1, name_2, mensagens, timings = preparado
+
+        # ── Gera análise via OpenAI ──
+        t0 = time.perf_counter()
+        result_text = llm_gateway.complete(
+            mensagens, user_email=user.email, cache=compat_cache(), **COMPAT_LLM
+        ).text
+        timings["openai_ms"] = round((time.perf_counter() - t0) * 1000, 1)
 
-        user.compatibility_used = True      # bloqueia novo teste grátis
-        db.session.commit()                 # grava e gera match.id
+        # ─────────── Salva resultado e marca uso ───────────
+        match = salvar_compatibilidade(user.id, name_1, name_2, result_text, timings, t_start)
 
         return render_template(
             "compatibility_result.html",
@@ -617,29 +789,69 @@ Escribe 400–600 palabras.
         )
 
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"[COMPATIBILITY ERROR] {e}")
         flash("Lo sentimos, no pudimos generar tu lectura de compatibilidad en este momento.", "danger")
         return render_template("compatibility.html")
 
-@user_bp.route("/ask-guru", methods=["POST"])
-def ask_guru():
-    # ─────────── Requer login ───────────
+# 🔹 Compatibilidade em streaming (SSE): tokens chegam ao navegador conforme o modelo gera
+@user_bp.route("/compatibility/stream", methods=["POST"])
+def compatibility_stream():
     if "user_id" not in session:
-        flash("Inicia sesión para preguntarle al Guru SkyAI.", "error")
-        return redirect(url_for("auth_views.login_view"))
+        return jsonify(error="Inicia sesión para continuar."), 401
 
     user = User.query.get(session["user_id"])
+    if user.compatibility_used:
+        return jsonify(
+            error="Ya usaste tu prueba de Compatibilidad. Compra nuevamente para desbloquear una nueva.",
+            url=url_for("auth_views.dashboard"),
+        ), 403
+
+    try:
+        t_start = time.perf_counter()
+        preparado = preparar_compatibilidade(request.form)
+    except Exception as e:
+        current_app.logger.error(f"[COMPATIBILITY ERROR] {e}")
+        return jsonify(error="Lo sentimos, no pudimos generar tu lectura de compatibilidad en este momento."), 500
+    if preparado is None:
+        return jsonify(error="Por favor, completa todos los campos para ambas personas."), 400
+    name_1, name_2, mensagens, timings = preparado
+    user_id, email, cache = user.id, user.email, compat_cache()
+    db.session.close()   # não segura conexão do pool enquanto o modelo escreve
+
+    def eventos():
+        partes = []
+        t0 = time.perf_counter()
+        try:
+            for chunk in llm_gateway.stream(mensagens, user_email=email, cache=cache, **COMPAT_LLM):
+                partes.append(chunk)
+                yield sse_event("token", chunk)
+            timings["openai_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            match = salvar_compatibilidade(user_id, name_1, name_2, "".join(partes).strip(), timings, t_start)
+            yield sse_event("done", {
+                "match_id": match.id,
+                "pdf_url": url_for("user.compatibility_pdf", match_id=match.id),
+            })
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"[COMPATIBILITY ERROR] {e}")
+            yield sse_event("failed", {"message": "Lo sentimos, no pudimos generar tu lectura de compatibilidad en este momento."})
+
+    return sse_response(eventos())
 
+# 🔹 Guru: limite, pergunta e mapa → (última sessão com relatório, None)
+#    ou (None, (mensagem, categoria, endpoint de destino))
+GURU_LLM = dict(model="gpt-4o-mini", temperature=0.65, max_tokens=700, purpose="guru")
+
+def verificar_guru(user, question):
     # ─────────── Limite de 4 perguntas ───────────
     if user.guru_questions_used >= 4:
-        flash("Has alcanzado tu límite de 4 preguntas para el Guru SkyAI. Compra nuevamente para restablecerlo.", "info")
-        return redirect(url_for("auth_views.dashboard"))
+        return None, ("Has alcanzado tu límite de 4 preguntas para el Guru SkyAI. Compra nuevamente para restablecerlo.",
+                      "info", "auth_views.dashboard")
 
     # ─────────── Validação da pergunta ───────────
-    question = request.form.get("question", "").strip()
     if len(question) < 5:
-        flash("Ingresa una pregunta válida.", "warning")
-        return redirect(url_for("auth_views.dashboard"))
+        return None, ("Ingresa una pregunta válida.", "warning", "auth_views.dashboard")
 
     # ─────────── Garante que o usuário tem mapa gerado ─────────
     last_session = (TestSession.query
@@ -648,9 +860,12 @@ def ask_guru():
                     .order_by(TestSession.created_at.desc())
                     .first())
     if not last_session:
-        flash("Primero genera una carta natal para que el Guru pueda darte una respuesta personalizada.", "info")
-        return redirect(url_for("user.preencher_dados"))
+        return None, ("Primero genera una carta natal para que el Guru pueda darte una respuesta personalizada.",
+                      "info", "user.preencher_dados")
+    return last_session, None
 
+# 🔹 Guru: mensagens para o modelo a partir do último mapa
+def guru_mensagens(last_session, question):
     # Extrai dados do último mapa
     data = json.loads(last_session.ai_result) if isinstance(last_session.ai_result, str) else last_session.ai_result
     sun  = data.get("sun_sign", "unknown")
@@ -660,6 +875,30 @@ def ask_guru():
     soul = data.get("soul_urge", "unknown")
     expr = data.get("expression", "unknown")
 
+    # Posições exatas do mapa salvo (sessões antigas: calcula e grava o blob)
+    try:
+        chart = compact_chart.session_chart(last_session)
+        if chart is not None and db.session.is_modified(last_session):
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning(f"[CompactChart WARNING] {e}")
+        chart = None
+    posiciones = ""
+    if chart is not None:
+        posiciones = "- Posiciones exactas: " + "; ".join(
+            f"{body} {p['sign']} {p['degree']:.1f}° (casa {p['house']})" + (" R" if p.get("speed", 0) < 0 else "")
+            for body, p in ((b, chart.position(b)) for b in compact_chart.CHART_BODIES)
+        ) + "\n"
+
+    # Próximos 90 dias do calendário global do céu (memória, sem custo por usuário)
+    try:
+        cielo = sky_calendar.format_events(sky_calendar.upcoming(90, limit=20))
+    except Exception as e:
+        current_app.logger.warning(f"[SkyCalendar WARNING] {e}")
+        cielo = ""
+    cielo_block = f"\nCIELO DE LOS PRÓXIMOS 90 DÍAS (fechas reales, UTC):\n{cielo}\n" if cielo else ""
+
     # ─────────── Monta prompt para OpenAI ───────────
     prompt = f"""
 Eres el Guru SkyAI — un asesor pragmático que DEBE fundamentar CADA respuesta en los datos natales del usuario y, si está disponible, en el pronóstico de **12 meses** más reciente entregado por SkyAI.
@@ -678,35 +917,48 @@ CONTEXTO del usuario:
 - Número de Camino de Vida: {life}
 - Número de Anhelo del Alma: {soul}
 - Número de Expresión: {expr}
-
+{posiciones}{cielo_block}
 REGLAS
 1. Empieza con una oración que responda directamente.
 2. Luego explica **por qué** — cita al menos un indicador natal O el pronóstico de 12 meses
-   (p. ej., “Júpiter cuadratura Saturno en feb {current_year + 1}”).
+   (p. ej., “Júpiter cuadratura Saturno en feb {current_year + 1}”). Si citas fechas del cielo,
+   usa solo las del bloque CIELO.
 3. Termina con una recomendación concreta que pueda aplicar en 7 días.
 4. Sin saludos ni relleno.
 """
+    return [
+        {"role": "system", "content": "Eres el Guru SkyAI, el asesor cósmico claro y práctico. Responde en español de México (es-MX)."},
+        {"role": "user", "content": prompt}
+    ]
+
+# 🔹 Guru: salva pergunta + incrementa uso
+def salvar_guru(user_id, question, answer):
+    user = db.session.get(User, user_id)
+    db.session.add(GuruQuestion(user_id=user.id, question=question, answer=answer))
+    user.guru_questions_used += 1
+    db.session.commit()
 
-    try:
-        from openai import OpenAI
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Eres el Guru SkyAI, el asesor cósmico claro y práctico. Responde en español de México (es-MX)."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.65,
-            max_tokens=700
-        )
+@user_bp.route("/ask-guru", methods=["POST"])
+def ask_guru():
+    # ─────────── Requer login ───────────
+    if "user_id" not in session:
+        flash("Inicia sesión para preguntarle al Guru SkyAI.", "error")
+        return redirect(url_for("auth_views.login_view"))
 
-        answer = response.choices[0].message.content.strip()
+    user = User.query.get(session["user_id"])
+    question = request.form.get("question", "").strip()
 
-        # ─────────── Salva pergunta + incrementa uso ───────────
-        db.session.add(GuruQuestion(user_id=user.id, question=question, answer=answer))
-        user.guru_questions_used += 1
-        db.session.commit()
+    last_session, problema = verificar_guru(user, question)
+    if problema:
+        mensagem, categoria, destino = problema
+        flash(mensagem, categoria)
+        return redirect(url_for(destino))
+
+    try:
+        answer = llm_gateway.complete(
+            guru_mensagens(last_session, question), user_email=user.email, **GURU_LLM
+        ).text
+        salvar_guru(user.id, question, answer)
 
         flash("✨ El Guru SkyAI ha respondido tu pregunta. ¡Ve la respuesta abajo en tu panel!", "success")
 
@@ -716,3 +968,81 @@ REGLAS
         flash("Lo sentimos, el Guru SkyAI no pudo responder tu pregunta en este momento.", "danger")
 
     return redirect(url_for("auth_views.dashboard"))
+
+# 🔹 Guru em streaming (SSE); a resposta é gravada igual ao /ask-guru quando o modelo termina
+@user_bp.route("/ask-guru/stream", methods=["POST"])
+def ask_guru_stream():
+    if "user_id" not in session:
+        return jsonify(error="Inicia sesión para preguntarle al Guru SkyAI."), 401
+
+    user = User.query.get(session["user_id"])
+    question = request.form.get("question", "").strip()
+
+    last_session, problema = verificar_guru(user, question)
+    if problema:
+        mensagem, _categoria, destino = problema
+        return jsonify(error=mensagem, url=url_for(destino)), 400
+
+    try:
+        mensagens = guru_mensagens(last_session, question)
+    except Exception as e:
+        current_app.logger.error(f"[GURU SKY ERROR] {e}")
+        return jsonify(error="Lo sentimos, el Guru SkyAI no pudo responder tu pregunta en este momento."), 500
+    user_id, email = user.id, user.email
+    db.session.close()   # não segura conexão do pool enquanto o modelo escreve
+
+    def eventos():
+        partes = []
+        try:
+            for chunk in llm_gateway.stream(mensagens, user_email=email, **GURU_LLM):
+                partes.append(chunk)
+                yield sse_event("token", chunk)
+            salvar_guru(user_id, question, "".join(partes).strip())
+            yield sse_event("done", {"url": url_for("auth_views.dashboard")})
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"[GURU SKY ERROR] {e}")
+            yield sse_event("failed", {"message": "Lo sentimos, el Guru SkyAI no pudo responder tu pregunta en este momento."})
+
+    return sse_response(eventos())
+
+
+# 🔹 Hora de nacimiento desconocida: signos posibles a lo largo del día local
+@user_bp.route("/unknown-time")
+def unknown_time():
+    if "user_id" not in session:
+        return jsonify(error="Inicia sesión para continuar."), 401
+
+    birth_date = request.args.get("birth_date", "").strip()
+    birth_city = request.args.get("birth_city", "").strip()
+    birth_country = request.args.get("birth_country", "").strip()
+    if not (birth_date and birth_city and birth_country):
+        return jsonify(error="Indica fecha, ciudad y país de nacimiento."), 400
+
+    try:
+        result = unknown_time_service.get_unknown_time_data(birth_date, birth_city, birth_country)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except (TimeoutError, RuntimeError) as e:   # fila do swe / OpenCage fora do ar
+        current_app.logger.warning(f"[UNKNOWN TIME] {e}")
+        return jsonify(error="Servicio ocupado, inténtalo de nuevo en unos segundos."), 503
+    return jsonify(result)
+
+
+# 🔹 Métricas dos caches de cálculo (por worker) — só administradores
+@user_bp.route("/admin/cache-stats")
+def cache_stats():
+    user = User.query.get(session["user_id"]) if "user_id" in session else None
+    if not user or not user.is_admin:
+        return jsonify(error="forbidden"), 403
+
+    return jsonify(
+        pid=os.getpid(),
+        chart_cache=chart_cache.stats(),
+        ephemeris=ephemeris_executor.stats(),
+        http=http_client.stats(),
+        chart_index=chart_index.stats(),
+        jobs=job_queue.stats(),
+        llm=llm_gateway.stats(),
+        llm_cache=llm_cache.stats(),
+    )
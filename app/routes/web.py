@@ -9,6 +9,7 @@ from sqlalchemy import func
 import json
 from sqlalchemy.exc import SQLAlchemyError
 from app.models import User, TestSession, GuruQuestion, Payment
+from app.services import sky_calendar
 
 
 # ⬇️  REMOVIDO:  from app.services.insights_service import get_past_insights
@@ -188,7 +189,19 @@ def dashboard():
         )
 
     # ─────────────────────────────────────────────────────────────
-    # 4. Render
+    # 4. Próximos eventos do céu (calendário global, em memória)
+    # ─────────────────────────────────────────────────────────────
+    try:
+        sky_events = [
+            {"date": e["date"], "text": sky_calendar.describe(e)}
+            for e in sky_calendar.upcoming(45, limit=6)
+        ]
+    except Exception as e:
+        current_app.logger.warning(f"[SkyCalendar WARNING] {e}")
+        sky_events = []
+
+    # ─────────────────────────────────────────────────────────────
+    # 5. Render
     # ─────────────────────────────────────────────────────────────
     return render_template(
     "dashboard.html",
@@ -201,6 +214,7 @@ def dashboard():
     remaining_questions=remaining_questions,
     limit_exceeded=limit_exceeded,
     guru_answers=guru_answers,
+    sky_events=sky_events,
     )
 
 # 🔹 Termos de uso
@@ -0,0 +1,136 @@
+# app/services/aspect_engine.py
+"""
+Motor vetorizado de aspectos (NumPy)
+====================================
+
+Calcula a matriz de separações angulares entre todos os corpos **uma vez**
+e testa todos os aspectos alvo num único *broadcast* contra uma matriz de
+orbes por par de corpos.
+
+• Mapa natal: pares i < j de um mesmo conjunto (mesma ordem do loop antigo).
+• Sinastria / trânsitos: grade cruzada A × B completa.
+• Lotes: as funções de baixo nível aceitam dimensões extras à esquerda,
+  ex. `(N, 11)` longitudes de N mapas contra um mapa `(11,)`.
+
+Orbes
+-----
+Cada corpo tem um orbe próprio (luminares mais largos, planetas lentos mais
+estreitos); o orbe de um par é a **média** dos dois (regra das "moieties").
+Com `ASPECT_ORB_PROFILE=legacy` (ou `orbs=LEGACY_ORB`) todo par usa os 6°
+fixos antigos e a saída é idêntica à do loop original.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+LEGACY_ORB = 6.0
+
+BODY_ORBS: Dict[str, float] = {
+    "SUN": 10.0,
+    "MOON": 10.0,
+    "MERCURY": 7.0,
+    "VENUS": 7.0,
+    "MARS": 7.0,
+    "JUPITER": 6.0,
+    "SATURN": 6.0,
+    "URANUS": 5.0,
+    "NEPTUNE": 5.0,
+    "PLUTO": 5.0,
+    "ASC": 6.0,
+}
+DEFAULT_BODY_ORB = 6.0
+
+ORB_PROFILE = os.getenv("ASPECT_ORB_PROFILE", "weighted").lower()
+
+Orbs = Union[None, float, Dict[str, float], np.ndarray]
+
+
+def default_orbs() -> Union[float, Dict[str, float]]:
+    """Orbes do perfil configurado: 6° fixos ("legacy") ou por corpo."""
+    return LEGACY_ORB if ORB_PROFILE == "legacy" else BODY_ORBS
+
+
+def orb_matrix(
+    names_a: Sequence[str],
+    names_b: Optional[Sequence[str]] = None,
+    orbs: Orbs = None,
+) -> np.ndarray:
+    """Matriz `(len(a), len(b))` com o orbe máximo de cada par."""
+    names_b = names_a if names_b is None else names_b
+    if orbs is None:
+        orbs = default_orbs()
+    if isinstance(orbs, np.ndarray):
+        return orbs
+    if isinstance(orbs, (int, float)):
+        return np.full((len(names_a), len(names_b)), float(orbs))
+
+    oa = np.array([orbs.get(n, DEFAULT_BODY_ORB) for n in names_a], dtype=float)
+    ob = np.array([orbs.get(n, DEFAULT_BODY_ORB) for n in names_b], dtype=float)
+    return (oa[:, None] + ob[None, :]) / 2.0
+
+
+def separation_matrix(lon_a: np.ndarray, lon_b: Optional[np.ndarray] = None) -> np.ndarray:
+    """Distância angular mínima (0–180°) entre cada par: `(..., n, m)`.
+
+    Mesma aritmética de `astrology_service._angle_distance`, elemento a elemento.
+    """
+    lon_a = np.asarray(lon_a, dtype=float)
+    lon_b = lon_a if lon_b is None else np.asarray(lon_b, dtype=float)
+    diff = np.abs(lon_a[..., :, None] - lon_b[..., None, :]) % 360.0
+    return np.where(diff <= 180.0, diff, 360.0 - diff)
+
+
+def match_aspects(
+    separation: np.ndarray,
+    orb_max: np.ndarray,
+    targets: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Testa todos os alvos de uma vez.
+
+    Devolve `(hits, orbs)`, ambos `(..., n, m, k)`: `hits` é booleano e
+    `orbs` é a distância ao ângulo exato de cada aspecto.
+    """
+    orbs = np.abs(separation[..., None] - np.asarray(targets, dtype=float))
+    hits = orbs <= np.asarray(orb_max)[..., None]
+    return hits, orbs
+
+
+def find_aspects(
+    lon_a: Sequence[float],
+    names_a: Sequence[str],
+    aspects: Sequence[Tuple[float, str]],
+    lon_b: Optional[Sequence[float]] = None,
+    names_b: Optional[Sequence[str]] = None,
+    orbs: Orbs = None,
+) -> List[Dict[str, object]]:
+    """Lista de aspectos no formato de `get_astrological_data()["aspects"]`.
+
+    Sem `lon_b`, considera os pares i < j de A (mapa natal); com `lon_b`,
+    todos os pares A × B (sinastria/trânsito).
+    """
+    targets = np.array([t for t, _ in aspects], dtype=float)
+    names = [n for _, n in aspects]
+
+    natal = lon_b is None
+    names_b = names_a if natal else names_b
+    sep = separation_matrix(np.asarray(lon_a, dtype=float), None if natal else np.asarray(lon_b, dtype=float))
+    hits, orb_vals = match_aspects(sep, orb_matrix(names_a, names_b, orbs), targets)
+    if natal:
+        hits &= np.triu(np.ones(sep.shape, dtype=bool), k=1)[..., None]
+
+    result: List[Dict[str, object]] = []
+    for i, j, k in zip(*np.nonzero(hits)):   # ordem C: i, j, alvo — igual ao loop
+        result.append(
+            {
+                "body1": names_a[i],
+                "body2": names_b[j],
+                "aspect": names[k],
+                "angle": round(float(sep[i, j]), 2),
+                "orb": round(float(orb_vals[i, j, k]), 2),
+            }
+        )
+    return result
@@ -4,7 +4,8 @@ Serviço de astrologia para Sky.AI
 
 • Cálculo de posições planetárias, ascendente e aspectos globais
   usando **Swiss Ephemeris** (pyswisseph).
-• Geocodificação via **OpenCage** e fuso‑horário com **timezonefinder** +
+• Geocodificação via **OpenCage** (com cache em memória + banco, ver
+  `geocoding_service`) e fuso‑horário com **timezonefinder** +
   base oficial *tzdata* (zoneinfo) do Python ≥ 3.9.
 
 Requisitos principais
@@ -18,20 +19,40 @@ Variáveis de ambiente esperadas
 -------------------------------
 SWISS_EPHEMERIS_DATA_PATH   → caminho para os arquivos .se1 …
 OPENCAGE_API_KEY            → chave de acesso ao serviço OpenCage
+OPENCAGE_URL                → endpoint (padrão o oficial; ex. `benchmarks/opencage_stub.py`)
+GAZETTEER_PATH              → índice offline (ver `gazetteer_service`); opcional
+GEOCODER_ONLINE_FALLBACK    → "0" desliga o OpenCage quando há gazetteer
 DEFAULT_TIMEZONE            → fallback, ex. "UTC" ou "America/Sao_Paulo"
+TZ_GRID_PATH                → grade de fusos (ver `timezone_service`); opcional
+HOUSE_SYSTEM                → sistema de casas do swe.houses (padrão "P", Placidus;
+                              ver `HOUSE_SYSTEMS`)
+EPHEMERIS_EXECUTOR          → como o swisseph é protegido entre threads (ver
+                              `ephemeris_executor`)
 """
 
 from __future__ import annotations
 
+import copy
+import logging
 import math
 import os
-import sys
+import time
 from datetime import datetime, timezone
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
 
-import requests
+import numpy as np
 import swisseph as swe
 
+from app.services import ephemeris_executor
+from app.services.aspect_engine import Orbs, default_orbs, find_aspects
+from app.services.chart_cache import cached_chart, version_stamp
+from app.services.gazetteer_service import get_gazetteer
+from app.services.geocoding_service import GeocodeNotFoundError, cached_coordinates
+from app.services.http_client import UpstreamError, get_client
+
+logger = logging.getLogger(__name__)
+
 # ── Efemérides ───────────────────────────────────────────
 EPH_PATH = os.getenv("SWISS_EPHEMERIS_DATA_PATH")
 if EPH_PATH:
@@ -40,6 +61,32 @@ if EPH_PATH:
 # 🔹 Para precisão máxima do algoritmo:
 SWIEPH_FLAG = swe.FLG_SWIEPH
 
+# Sistemas de casas aceitos (código do swe.houses → nome)
+HOUSE_SYSTEMS: Dict[str, str] = {
+    "P": "Placidus",
+    "K": "Koch",
+    "O": "Porphyry",
+    "R": "Regiomontanus",
+    "C": "Campanus",
+    "E": "Equal",
+    "W": "Whole Sign",
+    "B": "Alcabitius",
+    "M": "Morinus",
+    "T": "Topocentric",
+    "X": "Meridian",
+}
+# Sistemas que não existem acima do círculo polar caem em Porphyry
+POLAR_FALLBACK_HOUSE_SYSTEM = "O"
+
+# Sistema de casas padrão ("P" = Placidus, padrão do Swiss Ephemeris)
+HOUSE_SYSTEM = os.getenv("HOUSE_SYSTEM", "P").upper()
+
+# Suba ao mudar o formato do resultado de `compute_chart` (invalida o cache)
+# 3: mapas calculados fora da thread principal usavam Moshier (ver `ephemeris_executor`)
+# 4: `jd_from_utc` devolvia o JD em TT (≈ 1 min adiantado), não em UT
+# 5: velocidade dos corpos; signo/grau derivados da longitude arredondada
+CHART_SCHEMA_VERSION = 5
+
 # ── Signos ───────────────────────────────────────────────
 SIGNS: List[str] = [
     "Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
@@ -57,63 +104,73 @@ ASPECTS_LIST = [
 ]
 
 # ── Time‑zone utils ──────────────────────────────────────
-DEFAULT_TZ = os.getenv("DEFAULT_TIMEZONE", "UTC")
-
-try:
-    from zoneinfo import ZoneInfo  # Python ≥ 3.9
-except ImportError:  # pragma: no cover — fallback antigo
-    try:
-        from pytz import timezone as ZoneInfo  # type: ignore
-    except ImportError as err:  # pragma: no cover
-        sys.exit(
-            "✖ Nenhuma biblioteca de timezone disponível. Instale python ≥ 3.9 ou pytz."
-        )
-
-try:
-    from timezonefinder import TimezoneFinder  # slow import
-
-    _TF = TimezoneFinder()
-
-    def get_timezone(lat: float, lon: float) -> str:
-        """Resolve fuso‑horário IANA a partir da latitude/longitude."""
-        tz = _TF.timezone_at(lat=lat, lng=lon)
-        if tz is None:
-            raise ValueError("TimezoneFinder não encontrou fuso para as coordenadas.")
-        return tz
-
-except ImportError:
-
-    def get_timezone(lat: float, lon: float) -> str:  # type: ignore[override]
-        """Versão fallback: retorna DEFAULT_TZ e avisa."""
-        print("[WARN] TimezoneFinder não instalado – usando DEFAULT_TIMEZONE!", file=sys.stderr)
-        return DEFAULT_TZ
+# Grade memory‑mapped + TimezoneFinder sob demanda (ver `timezone_service`)
+from app.services.timezone_service import (  # noqa: E402
+    DEFAULT_TZ,
+    ZoneInfo,  # noqa: F401 — reexportado p/ código legado
+    get_timezone,
+    get_zoneinfo,
+)
 
 # ── Geocodificação via OpenCage ───────────────────────────
+GEOCODER_ONLINE_FALLBACK = os.getenv("GEOCODER_ONLINE_FALLBACK", "1") != "0"
+OPENCAGE_URL = os.getenv("OPENCAGE_URL", "https://api.opencagedata.com/geocode/v1/json")
 
 
-def get_coordinates(city: str, country: str) -> Dict[str, float]:
-    """Obtém latitude/longitude com OpenCage. Lança Erro se nada encontrado."""
+def geocode_opencage(city: str, country: str) -> Dict[str, float]:
+    """Obtém latitude/longitude com OpenCage (sem cache). Lança Erro se nada encontrado.
+
+    Passa pelo `http_client` (pool, retries, circuit breaker): serviço fora
+    do ar vira `UpstreamError`/`CircuitOpenError`.
+    """
 
     api_key = os.getenv("OPENCAGE_API_KEY")
     if not api_key:
         raise RuntimeError("OPENCAGE_API_KEY não configurada.")
 
     query = f"{city.strip()}, {country.strip()}"
-    url = (
-        "https://api.opencagedata.com/geocode/v1/json"
-        f"?q={query}&key={api_key}&limit=1&language=en"
+    payload = get_client("opencage").get_json(
+        OPENCAGE_URL,
+        params={"q": query, "key": api_key, "limit": 1, "language": "en", "no_annotations": 1},
     )
-    resp = requests.get(url, timeout=10)
-    resp.raise_for_status()
-    payload = resp.json()
 
     if not payload.get("results"):
-        raise ValueError(f"Sem resultados de geocodificação para '{query}'.")
+        raise GeocodeNotFoundError(f"Sem resultados de geocodificação para '{query}'.")
 
     geom = payload["results"][0]["geometry"]
     return {"lat": float(geom["lat"]), "lon": float(geom["lng"])}
 
 
+def _online_geocoding_enabled() -> bool:
+    return GEOCODER_ONLINE_FALLBACK and bool(os.getenv("OPENCAGE_API_KEY"))
+
+
+def get_coordinates(city: str, country: str) -> Dict[str, float]:
+    """Obtém latitude/longitude.
+
+    Ordem: gazetteer offline (exato) → cache (memória → banco) → OpenCage →
+    gazetteer aproximado (também quando o OpenCage falha). Sem `GAZETTEER_PATH` o comportamento é o antigo
+    (cache + OpenCage); sem chave do OpenCage, só o gazetteer é usado.
+    """
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return cached_coordinates(city, country, geocode_opencage)
+
+    place = gazetteer.lookup(city, country, fuzzy=False)
+    if place is not None:
+        return {"lat": place.lat, "lon": place.lon}
+
+    if _online_geocoding_enabled():
+        try:
+            return cached_coordinates(city, country, geocode_opencage)
+        except GeocodeNotFoundError:
+            pass
+        except UpstreamError as e:  # OpenCage degradado: o gazetteer responde
+            logger.warning("[GEOCODE] OpenCage indisponível (%s); usando gazetteer aproximado.", e)
+
+    return gazetteer.get_coordinates(city, country, fuzzy=True)
+
+
 # ── Funções auxiliares de aspectos ───────────────────────
 
 def _angle_distance(a: float, b: float) -> float:
@@ -136,39 +193,39 @@ def calc_orb(angle: float, target: float) -> float:
 
 def jd_from_utc(dt_utc: datetime) -> float:
     """Converte datetime **UTC** → Julian Day UT via helper nativo."""
-    jd_ut, _jd_tt = swe.utc_to_jd(
-        dt_utc.year,
-        dt_utc.month,
-        dt_utc.day,
-        dt_utc.hour,
-        dt_utc.minute,
-        dt_utc.second + dt_utc.microsecond / 1e6,
-        swe.GREG_CAL,
-    )
+    with ephemeris_executor.locked():   # ΔT/segundos intercalares: estado do swe
+        _jd_tt, jd_ut = swe.utc_to_jd(   # devolve (TT, UT1), nesta ordem
+            dt_utc.year,
+            dt_utc.month,
+            dt_utc.day,
+            dt_utc.hour,
+            dt_utc.minute,
+            dt_utc.second + dt_utc.microsecond / 1e6,
+            swe.GREG_CAL,
+        )
     return jd_ut
 
 
-# ── Função principal ─────────────────────────────────────
+# ── Etapas do cálculo ────────────────────────────────────
+# Separadas para que o lote (`chart_batch`) possa geocodificar no processo
+# principal e mandar só o trabalho do Swiss Ephemeris para os workers.
 
+BODIES: Dict[str, int] = {
+    "SUN": swe.SUN,
+    "MOON": swe.MOON,
+    "MERCURY": swe.MERCURY,
+    "VENUS": swe.VENUS,
+    "MARS": swe.MARS,
+    "JUPITER": swe.JUPITER,
+    "SATURN": swe.SATURN,
+    "URANUS": swe.URANUS,
+    "NEPTUNE": swe.NEPTUNE,
+    "PLUTO": swe.PLUTO,
+}
 
-def get_astrological_data(
-    birth_date: str,
-    birth_time: str,
-    birth_city: str,
-    birth_country: str,
-    debug: bool = False,
-) -> Dict[str, object]:
-    """Cálculo completo (posições, aspectos, ascendente).
-
-    Args:
-        birth_date: "AAAA-MM-DD".
-        birth_time: "HH:MM" ou "HH:MM:SS" no horário **local** da cidade.
-        birth_city: Cidade de nascimento.
-        birth_country: País de nascimento.
-        debug: Imprime detalhes de conversão tempo/JD se `True`.
-    """
 
-    # 1) Coordenadas & fuso‑horário ---------------------------------------
+def resolve_location(birth_city: str, birth_country: str) -> Tuple[Dict[str, float], str]:
+    """Coordenadas + fuso IANA (com fallback para DEFAULT_TZ)."""
     coords = get_coordinates(birth_city, birth_country)
 
     try:
@@ -176,9 +233,13 @@ def get_astrological_data(
     except ValueError:
         tz_str = DEFAULT_TZ  # fallback explícito
 
-    tzinfo = ZoneInfo(tz_str)
+    return coords, tz_str
+
+
+def local_to_utc(birth_date: str, birth_time: str, tz_str: str) -> Tuple[datetime, datetime]:
+    """Data/hora local da cidade → (datetime local, datetime UTC)."""
+    tzinfo = get_zoneinfo(tz_str)
 
-    # 2) Monta datetime local ---------------------------------------------
     dt_format = "%Y-%m-%d %H:%M:%S" if len(birth_time.split(":")) == 3 else "%Y-%m-%d %H:%M"
     naive_local = datetime.strptime(f"{birth_date} {birth_time}", dt_format)
 
@@ -187,75 +248,249 @@ def get_astrological_data(
     except Exception as e:
         raise ValueError(f"Falha ao aplicar timezone ({tz_str}): {e}")
 
-    # 3) Converte para UTC e JD -------------------------------------------
-    utc_dt = local_dt.astimezone(timezone.utc)
-    jd_ut = jd_from_utc(utc_dt)
+    return local_dt, local_dt.astimezone(timezone.utc)
+
+
+def _sign_fields(lon: float) -> Dict[str, float | str]:
+    lon = round(lon, 6) % 360.0   # signo/grau saem do valor gravado (ver `compact_chart`)
+    return {
+        "longitude": lon,
+        "sign": SIGNS[int(lon / 30.0) % 12],  # ✅ Usa int() estável p/ cusp
+        "degree": round(math.fmod(lon, 30.0), 4),  # ✅ Usa fmod para evitar erro float
+    }
+
+
+def validate_house_system(house_system: Optional[str]) -> str:
+    """Código do sistema de casas (padrão `HOUSE_SYSTEM`); ValueError se inválido."""
+    code = (house_system or HOUSE_SYSTEM).strip().upper()
+    if code not in HOUSE_SYSTEMS:
+        raise ValueError(
+            f"Sistema de casas inválido: {house_system!r}. Use um de {', '.join(HOUSE_SYSTEMS)}."
+        )
+    return code
+
+
+def _cusps_in_order(cusps: Sequence[float]) -> bool:
+    rel = [(c - cusps[0]) % 360.0 for c in cusps]
+    return all(a < b for a, b in zip(rel, rel[1:]))
 
-    # 4) Posições planetárias ---------------------------------------------
-    bodies = {
-        "SUN": swe.SUN,
-        "MOON": swe.MOON,
-        "MERCURY": swe.MERCURY,
-        "VENUS": swe.VENUS,
-        "MARS": swe.MARS,
-        "JUPITER": swe.JUPITER,
-        "SATURN": swe.SATURN,
-        "URANUS": swe.URANUS,
-        "NEPTUNE": swe.NEPTUNE,
-        "PLUTO": swe.PLUTO,
+
+def calc_houses(
+    jd_ut: float, lat: float, lon: float, house_system: str = HOUSE_SYSTEM
+) -> Tuple[Tuple[float, ...], Tuple[float, ...], str]:
+    """`swe.houses` → (12 cúspides, ascmc, sistema efetivamente usado).
+
+    Perto/acima do círculo polar Placidus/Koch falham e Topocêntrico devolve
+    cúspides fora de ordem; nesses casos usamos Porphyry.
+    """
+    try:
+        cusps, ascmc = swe.houses(jd_ut, lat, lon, house_system.encode())
+        if _cusps_in_order(cusps):
+            return cusps, ascmc, house_system
+    except swe.Error:
+        if house_system == POLAR_FALLBACK_HOUSE_SYSTEM:
+            raise
+    cusps, ascmc = swe.houses(jd_ut, lat, lon, POLAR_FALLBACK_HOUSE_SYSTEM.encode())
+    return cusps, ascmc, POLAR_FALLBACK_HOUSE_SYSTEM
+
+
+def assign_houses(longitudes: Sequence[float], cusps: Sequence[float]) -> np.ndarray:
+    """Casa (1–12) de cada longitude, numa única busca ordenada.
+
+    As cúspides crescem no zodíaco mas "dão a volta" em 0° Áries; girando
+    tudo para a cúspide 1 ficar em 0°, elas viram um vetor ordenado e o
+    `searchsorted` resolve todos os corpos de uma vez.
+    """
+    n = len(cusps)
+    rel = np.array([*cusps, *longitudes], dtype=float)   # uma conversão só
+    rel -= rel[0]
+    rel %= 360.0
+    return np.searchsorted(rel[:n], rel[n:], side="right")
+
+
+def _cusp_fields(house: int, lon: float) -> Dict[str, float | str]:
+    lon = round(lon, 6) % 360.0
+    return {
+        "house": house,
+        "longitude": lon,
+        "sign": SIGNS[int(lon / 30.0) % 12],
+        "degree": round(math.fmod(lon, 30.0), 4),
     }
 
+
+def compute_chart(
+    jd_ut: float,
+    lat: float,
+    lon: float,
+    orbs: Orbs = None,
+    debug: bool = False,
+    house_system: str = HOUSE_SYSTEM,
+    timings: Optional[Dict[str, float]] = None,
+) -> Tuple[Dict[str, Dict[str, float | str]], List[Dict[str, object]], Dict[str, object]]:
+    """Parte Swiss Ephemeris do cálculo: posições, ascendente, aspectos e casas.
+
+    `timings`, se dado, recebe o tempo de cada etapa em ms (`planets_ms`,
+    `houses_ms`, `aspects_ms`; ver `benchmarks/bench_chart.py`).
+    """
+    t0 = time.perf_counter()
+
+    # Posições planetárias
     positions: Dict[str, Dict[str, float | str]] = {}
 
-    for name, code in bodies.items():
-        lon, lat, dist = swe.calc_ut(jd_ut, code, SWIEPH_FLAG)[0][:3] # ✅ Usa flag Swiss Ephemeris real
-        lon = float(lon)
-        sign_idx = int(lon / 30.0) % 12  # ✅ Usa int() estável p/ cusp
-        degree = math.fmod(lon, 30.0)    # ✅ Usa fmod para evitar erro float
-
-        positions[name] = {
-            "longitude": round(lon, 6),
-            "sign": SIGNS[sign_idx],
-            "degree": round(degree, 4),
-        }
+    for name, code in BODIES.items():
+        xx = swe.calc_ut(jd_ut, code, SWIEPH_FLAG | swe.FLG_SPEED)[0]  # ✅ Usa flag Swiss Ephemeris real
+        positions[name] = {**_sign_fields(float(xx[0])), "speed": round(float(xx[3]), 6)}  # °/dia (< 0: retrógrado)
         if debug:
             print(f"[DEBUG] {name:7}: {positions[name]}")
 
-    # 5) Ascendente --------------------------------------------------------
-    house_cusps, ascmc = swe.houses(jd_ut, coords["lat"], coords["lon"])
-    asc_lon = float(ascmc[0])
-    asc_idx = int(asc_lon / 30.0) % 12
-    asc_degree = math.fmod(asc_lon, 30.0)
+    t1 = time.perf_counter()
 
-    positions["ASC"] = {
-        "longitude": round(asc_lon, 6),
-        "sign": SIGNS[asc_idx],
-        "degree": round(asc_degree, 4),
-    }
+    # Ascendente + cúspides
+    cusps, ascmc, house_system = calc_houses(jd_ut, lat, lon, house_system)
+    positions["ASC"] = _sign_fields(float(ascmc[0]))
     if debug:
         print(f"[DEBUG] ASC    : {positions['ASC']}")
 
-    # 6) Aspectos ----------------------------------------------------------
-    aspects: List[Dict[str, object]] = []
+    houses = {
+        "system": house_system,
+        "name": HOUSE_SYSTEMS[house_system],
+        "cusps": [_cusp_fields(i, c) for i, c in enumerate(cusps, 1)],
+    }
+
+    # Casa de cada corpo (inclui ASC) — uma busca vetorizada, sobre os mesmos
+    # valores arredondados devolvidos (ASC == cúspide 1 cai na casa 1)
     keys = list(positions.keys())
-    for i, body1 in enumerate(keys):
-        for body2 in keys[i + 1 :]:
-            a_lon = positions[body1]["longitude"]
-            b_lon = positions[body2]["longitude"]
-            angle = _angle_distance(a_lon, b_lon)
-            for target, asp_name in ASPECTS_LIST:
-                if is_aspect(angle, target, orb_max=6):
-                    aspects.append(
-                        {
-                            "body1": body1,
-                            "body2": body2,
-                            "aspect": asp_name,
-                            "angle": round(angle, 2),
-                            "orb": round(calc_orb(angle, target), 2),
-                        }
-                    )
-
-    # 7) Debug geral -------------------------------------------------------
+    longitudes = [positions[k]["longitude"] for k in keys]
+    cusp_lons = [c["longitude"] for c in houses["cusps"]]
+    for k, house in zip(keys, assign_houses(longitudes, cusp_lons)):
+        positions[k]["house"] = int(house)
+    if debug:
+        print(f"[DEBUG] Casas ({houses['name']}): {[c['longitude'] for c in houses['cusps']]}")
+
+    t2 = time.perf_counter()
+
+    # Aspectos (matriz de separações + orbes por par, ver `aspect_engine`)
+    aspects = find_aspects(longitudes, keys, ASPECTS_LIST, orbs=orbs)
+
+    if timings is not None:
+        timings["planets_ms"] = round((t1 - t0) * 1000, 3)
+        timings["houses_ms"] = round((t2 - t1) * 1000, 3)
+        timings["aspects_ms"] = round((time.perf_counter() - t2) * 1000, 3)
+    return positions, aspects, houses
+
+
+@lru_cache(maxsize=1)
+def chart_version() -> str:
+    """Carimbo de versão dos mapas cacheados (ver `chart_cache`).
+
+    Muda quando mudam SIGNS, ASPECTS_LIST, orbes configurados, corpos,
+    flags, a versão do swisseph ou os arquivos de efemérides.
+    """
+    eph_files = []
+    if EPH_PATH and os.path.isdir(EPH_PATH):
+        for name in sorted(os.listdir(EPH_PATH)):
+            if name.endswith(".se1"):
+                st = os.stat(os.path.join(EPH_PATH, name))
+                eph_files.append((name, st.st_size, int(st.st_mtime)))
+    return version_stamp(
+        CHART_SCHEMA_VERSION,
+        SIGNS,
+        ASPECTS_LIST,
+        sorted(BODIES.items()),
+        default_orbs(),
+        SWIEPH_FLAG,
+        swe.version,
+        eph_files,
+    )
+
+
+# ── Função principal ─────────────────────────────────────
+
+
+def get_astrological_data(
+    birth_date: str,
+    birth_time: str,
+    birth_city: str,
+    birth_country: str,
+    debug: bool = False,
+    orbs: Orbs = None,
+    use_cache: bool = True,
+    house_system: Optional[str] = None,
+    timeout: Optional[float] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, object]:
+    """Cálculo completo (posições, aspectos, ascendente, casas).
+
+    Args:
+        birth_date: "AAAA-MM-DD".
+        birth_time: "HH:MM" ou "HH:MM:SS" no horário **local** da cidade.
+        birth_city: Cidade de nascimento.
+        birth_country: País de nascimento.
+        debug: Imprime detalhes de conversão tempo/JD se `True`.
+        orbs: Orbes dos aspectos — `None` usa o perfil configurado, um número
+            aplica o mesmo orbe a todos os pares (`LEGACY_ORB` = 6°) e um
+            dict define o orbe por corpo.
+        use_cache: Usa o cache de mapas (`chart_cache`); desligado em `debug`.
+        house_system: Código do `swe.houses` (ver `HOUSE_SYSTEMS`); padrão
+            `HOUSE_SYSTEM`. Placidus/Koch caem em Porphyry acima do círculo polar.
+        timeout: Prazo (s) para o Swiss Ephemeris; padrão `EPHEMERIS_TIMEOUT`.
+            Estourado → `EphemerisTimeoutError`; fila cheia → `EphemerisBusyError`.
+        timings: Se dado, recebe o tempo de cada etapa em ms (`location_ms`,
+            `time_ms`, `chart_ms`).
+    """
+    house_system = validate_house_system(house_system)
+
+    t0 = time.perf_counter()
+
+    # 1) Coordenadas & fuso‑horário ---------------------------------------
+    coords, tz_str = resolve_location(birth_city, birth_country)
+    t1 = time.perf_counter()
+
+    # 2) Monta datetime local e converte para UTC -------------------------
+    local_dt, utc_dt = local_to_utc(birth_date, birth_time, tz_str)
+
+    # 3) JD ----------------------------------------------------------------
+    jd_ut = jd_from_utc(utc_dt)
+    t2 = time.perf_counter()
+
+    # 4) Posições, ascendente e aspectos (memoizados por JD/lat/lon) -----
+    if use_cache and not debug:
+        chart = cached_chart(
+            jd_ut,
+            coords["lat"],
+            coords["lon"],
+            house_system,
+            chart_version(),
+            compute=lambda jd, lat, lon: dict(
+                zip(
+                    ("positions", "aspects", "houses"),
+                    ephemeris_executor.run(
+                        compute_chart, jd, lat, lon, orbs=orbs, house_system=house_system, timeout=timeout
+                    ),
+                )
+            ),
+            orbs=orbs,
+        )
+        chart = copy.deepcopy(chart)  # o cache é compartilhado; o chamador pode alterar
+        positions, aspects, houses = chart["positions"], chart["aspects"], chart["houses"]
+    else:
+        positions, aspects, houses = ephemeris_executor.run(
+            compute_chart,
+            jd_ut,
+            coords["lat"],
+            coords["lon"],
+            orbs=orbs,
+            debug=debug,
+            house_system=house_system,
+            timeout=timeout,
+        )
+
+    if timings is not None:
+        timings["location_ms"] = round((t1 - t0) * 1000, 3)
+        timings["time_ms"] = round((t2 - t1) * 1000, 3)
+        timings["chart_ms"] = round((time.perf_counter() - t2) * 1000, 3)
+
+    # 5) Debug geral -------------------------------------------------------
     if debug:
         print("==== DEBUG ASTRAL ====")
         print(f"Local datetime: {local_dt.isoformat()}")
@@ -267,6 +502,7 @@ def get_astrological_data(
     return {
         "positions": positions,
         "aspects": aspects,
+        "houses": houses,
         "coords": coords,
         "timezone": tz_str,
         "jd_ut": jd_ut,
@@ -292,6 +528,7 @@ if __name__ == "__main__":
     parser.add_argument("city", help="Cidade")
     parser.add_argument("country", help="País")
     parser.add_argument("--debug", action="store_true", help="Exibe debug detalhado")
+    parser.add_argument("--houses", default=None, help=f"Sistema de casas ({', '.join(HOUSE_SYSTEMS)})")
 
     args = parser.parse_args()
 
@@ -301,6 +538,7 @@ if __name__ == "__main__":
         args.city,
         args.country,
         debug=args.debug,
+        house_system=args.houses,
     )
 
     import json
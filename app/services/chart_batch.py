@@ -0,0 +1,200 @@
+# app/services/chart_batch.py
+"""
+Cálculo de mapas em lote para Sky.AI
+====================================
+
+`get_astrological_data_many` recebe um iterável (pode ser um gerador de
+centenas de milhares de registros) e devolve, **em streaming e na mesma
+ordem**, o mesmo dicionário de `get_astrological_data` para cada registro —
+ou `{"error": ...}` quando aquele registro falhar.
+
+Como funciona, bloco a bloco (`chunk_size` registros por vez):
+
+1. geocodificação + fuso **uma vez por local distinto** (no processo
+   principal, passando pelos caches de `geocoding_service`);
+2. datas locais → JD no processo principal (barato);
+3. registros agrupados por local viram tarefas `(lat, lon, [JDs])` e o
+   Swiss Ephemeris roda num **pool de processos** — o `swisseph` tem estado
+   global e não é thread‑safe, então cada worker tem a sua própria cópia.
+   JD e coordenadas passam antes por `chart_cache.canonical_inputs`, a
+   mesma quantização do caminho com cache de `get_astrological_data`: os
+   dois devolvem exatamente os mesmos valores (`jd_ut`/`coords` seguem os
+   originais, como lá).
+
+A memória fica limitada a um bloco, qualquer que seja o tamanho da entrada.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+from app.services import astrology_service as astro
+from app.services import chart_cache, ephemeris_executor
+from app.services.aspect_engine import Orbs
+from app.services.geocoding_service import place_key
+
+BirthRecord = Union[Mapping[str, str], Sequence[str]]
+
+_FIELDS = ("birth_date", "birth_time", "birth_city", "birth_country")
+_TASK_SIZE = 64   # mapas por tarefa enviada a um worker
+
+
+def _fields(record: BirthRecord) -> Tuple[str, str, str, str]:
+    """Aceita dict com as chaves de `user_data` ou tupla na ordem da função."""
+    if isinstance(record, Mapping):
+        return tuple(str(record.get(f) or "") for f in _FIELDS)  # type: ignore[return-value]
+    date, time_, city, country = record
+    return str(date), str(time_), str(city), str(country)
+
+
+def _init_worker(eph_path: Optional[str]) -> None:
+    if eph_path:
+        astro.swe.set_ephe_path(eph_path)
+
+
+def _compute_group(args) -> List[object]:
+    """Roda no worker: todos os mapas de um mesmo local."""
+    lat, lon, jds, orbs, house_system = args
+    out: List[object] = []
+    for jd in jds:
+        try:
+            out.append(astro.compute_chart(jd, lat, lon, orbs=orbs, house_system=house_system))
+        except Exception as e:  # um registro ruim não derruba o grupo
+            out.append(e)
+    return out
+
+
+def get_astrological_data_many(
+    records: Iterable[BirthRecord],
+    workers: Optional[int] = None,
+    chunk_size: int = 2000,
+    orbs: Orbs = None,
+    house_system: Optional[str] = None,
+) -> Iterator[Dict[str, object]]:
+    """Gera um resultado por registro, na ordem de entrada.
+
+    Args:
+        records: dicts (`birth_date`, `birth_time`, `birth_city`,
+            `birth_country`) ou tuplas nessa ordem.
+        workers: processos do pool (padrão: nº de CPUs). `0` ou `1` calcula
+            no próprio processo, sem pool.
+        chunk_size: registros por bloco (limita a memória).
+        orbs: repassado a `compute_chart`.
+        house_system: código do `swe.houses` (padrão `HOUSE_SYSTEM`).
+    """
+    house_system = astro.validate_house_system(house_system)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    pool = (
+        ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(astro.EPH_PATH,))
+        if workers > 1
+        else None
+    )
+    locations: Dict[str, object] = {}   # cache de locais entre blocos
+
+    try:
+        it = iter(records)
+        while True:
+            chunk = list(islice(it, chunk_size))
+            if not chunk:
+                break
+            yield from _run_chunk(chunk, pool, locations, orbs, house_system)
+            if len(locations) > 50 * chunk_size:
+                locations.clear()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def resolve_births(
+    records: Sequence[BirthRecord],
+    locations: Optional[Dict[str, object]] = None,
+) -> List[Union[Tuple[float, Dict[str, float], str], Exception]]:
+    """`(JD UT, coords, fuso)` de cada registro, ou a exceção daquele registro.
+
+    Geocodifica **uma vez por local distinto**; `locations` guarda esses
+    locais entre chamadas (passe o mesmo dict em todos os blocos). Só erros
+    definitivos (`ValueError`, ex. `GeocodeNotFoundError`) ficam guardados;
+    falhas transitórias (upstream, circuito aberto, timeout) derrubam só o
+    registro e o próximo do mesmo local tenta de novo.
+    """
+    locations = {} if locations is None else locations
+    out: List[Union[Tuple[float, Dict[str, float], str], Exception]] = []
+    for record in records:
+        try:
+            date, time_, city, country = _fields(record)
+            key = place_key(city, country)
+            loc = locations.get(key)
+            if loc is None:
+                try:
+                    loc = astro.resolve_location(city, country)
+                except ValueError as e:   # local inexistente/ambíguo: não adianta repetir
+                    loc = e
+                locations[key] = loc
+            if isinstance(loc, Exception):
+                raise loc
+            coords, tz_str = loc
+            _local_dt, utc_dt = astro.local_to_utc(date, time_, tz_str)
+            out.append((astro.jd_from_utc(utc_dt), coords, tz_str))
+        except Exception as e:
+            out.append(e)
+    return out
+
+
+def _run_chunk(
+    chunk: List[BirthRecord],
+    pool: Optional[ProcessPoolExecutor],
+    locations: Dict[str, object],
+    orbs: Orbs,
+    house_system: str,
+) -> Iterator[Dict[str, object]]:
+    results: List[Optional[Dict[str, object]]] = [None] * len(chunk)
+    pending: List[Tuple[int, float, Dict[str, float], str]] = []
+
+    # 1–2) Local (deduplicado) e JD, no processo principal
+    for idx, moment in enumerate(resolve_births(chunk, locations)):
+        if isinstance(moment, Exception):
+            results[idx] = {"error": str(moment)}
+        else:
+            pending.append((idx, *moment))
+
+    # 3) Agrupa por local (quantizado, como no `chart_cache`) e distribui o Swiss Ephemeris
+    groups: Dict[Tuple[float, float], List[Tuple[int, float, Dict[str, float], str]]] = {}
+    for item in pending:
+        _jd, lat, lon = chart_cache.canonical_inputs(item[1], item[2]["lat"], item[2]["lon"])
+        groups.setdefault((lat, lon), []).append(item)
+
+    # Locais muito populares são fatiados para manter todos os workers ocupados
+    slices = [
+        (place, items[i : i + _TASK_SIZE])
+        for place, items in groups.items()
+        for i in range(0, len(items), _TASK_SIZE)
+    ]
+    tasks = [
+        (lat, lon, [chart_cache.canonical_inputs(jd, lat, lon)[0] for _, jd, _, _ in s], orbs, house_system)
+        for (lat, lon), s in slices
+    ]
+    if pool:
+        outputs = pool.map(_compute_group, tasks, chunksize=4)
+    else:  # no próprio processo: passa pelo executor (pode ser chamado de outra thread)
+        outputs = (ephemeris_executor.run(_compute_group, t, timeout=0) for t in tasks)
+
+    for (_place, items), charts in zip(slices, outputs):
+        for (idx, jd, coords, tz_str), chart in zip(items, charts):
+            if isinstance(chart, Exception):
+                results[idx] = {"error": str(chart)}
+                continue
+            positions, aspects, houses = chart
+            results[idx] = {
+                "positions": positions,
+                "aspects": aspects,
+                "houses": houses,
+                "coords": coords,
+                "timezone": tz_str,
+                "jd_ut": jd,
+            }
+
+    yield from results  # type: ignore[misc]
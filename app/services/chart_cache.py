@@ -0,0 +1,194 @@
+# app/services/chart_cache.py
+"""
+Memoização de mapas natais para Sky.AI
+======================================
+
+O mesmo mapa é recalculado no relatório, de novo em `/compatibility` e a
+cada reenvio do formulário. Este cache guarda o resultado de
+`astrology_service.compute_chart` por uma **impressão digital canônica**:
+
+    jd=<JD_UT com 5 casas>|lat=<4 casas>|lon=<4 casas>|hs=<sistema de casas>|orbs=<…>
+
+(5 casas no JD ≈ 0,9 s; 4 casas nas coordenadas ≈ 11 m.) O cálculo é
+sempre feito com os valores já quantizados, então um *hit* devolve
+exatamente o que um *miss* calcularia.
+
+Níveis: LRU em memória → tabela `chart_cache` (só dentro de app context).
+Cada linha guarda o **carimbo de versão** de quem a gerou (SIGNS,
+ASPECTS_LIST, orbes, arquivos de efemérides, versão do swisseph…); se algo
+mudar, o carimbo muda e as linhas antigas são ignoradas (ver `purge_stale`).
+
+Variáveis de ambiente
+---------------------
+CHART_CACHE_LRU_SIZE  → mapas no LRU em memória (padrão 2048)
+CHART_CACHE_DB        → "0" desliga o nível de banco
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from app.services.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+CHART_CACHE_LRU_SIZE = int(os.getenv("CHART_CACHE_LRU_SIZE", "2048"))
+CHART_CACHE_DB = os.getenv("CHART_CACHE_DB", "1") != "0"
+
+JD_DECIMALS = 5
+COORD_DECIMALS = 4
+
+_LRU = LRUCache(maxsize=CHART_CACHE_LRU_SIZE)
+_STATS = {"memory_hits": 0, "db_hits": 0, "misses": 0, "db_errors": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _STATS_LOCK:
+        _STATS[name] += 1
+
+
+def stats() -> Dict[str, float]:
+    """Contadores do processo atual (+ taxa de acerto)."""
+    with _STATS_LOCK:
+        out: Dict[str, float] = dict(_STATS)
+    total = out["memory_hits"] + out["db_hits"] + out["misses"]
+    out["hit_ratio"] = round((out["memory_hits"] + out["db_hits"]) / total, 4) if total else 0.0
+    out["memory_entries"] = len(_LRU)
+    return out
+
+
+# ── Impressão digital & versão ────────────────────────────
+
+def version_stamp(*parts: object) -> str:
+    """Hash curto e estável de tudo que influencia o resultado."""
+    blob = json.dumps(parts, sort_keys=True, default=repr, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def canonical_inputs(jd_ut: float, lat: float, lon: float) -> Tuple[float, float, float]:
+    return round(jd_ut, JD_DECIMALS), round(lat, COORD_DECIMALS), round(lon, COORD_DECIMALS)
+
+
+def fingerprint(jd_ut: float, lat: float, lon: float, house_system: str, orbs: object = None) -> str:
+    jd_ut, lat, lon = canonical_inputs(jd_ut, lat, lon)
+    orbs_part = "default" if orbs is None else version_stamp(orbs)
+    return (
+        f"jd={jd_ut:.{JD_DECIMALS}f}|lat={lat:.{COORD_DECIMALS}f}|"
+        f"lon={lon:.{COORD_DECIMALS}f}|hs={house_system}|orbs={orbs_part}"
+    )
+
+
+# ── Nível de banco ────────────────────────────────────────
+
+def _db_enabled() -> bool:
+    if not CHART_CACHE_DB:
+        return False
+    from flask import has_app_context
+
+    return has_app_context()
+
+
+def _db_get(key: str, version: str) -> Optional[dict]:
+    from sqlalchemy import select
+    from app.main import db
+    from app.models import ChartCache
+
+    table = ChartCache.__table__
+    try:
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                select(table.c.payload).where(
+                    table.c.fingerprint == key, table.c.version == version
+                )
+            ).first()
+    except Exception as e:
+        _count("db_errors")
+        logger.warning("[CHART CACHE] Falha ao ler cache: %s", e)
+        return None
+    return json.loads(row.payload) if row else None
+
+
+def _db_put(key: str, version: str, payload: dict) -> None:
+    from sqlalchemy import insert, update
+    from sqlalchemy.exc import IntegrityError
+    from app.main import db
+    from app.models import ChartCache
+
+    table = ChartCache.__table__
+    values = {
+        "version": version,
+        "payload": json.dumps(payload, ensure_ascii=False),
+        "created_at": datetime.utcnow(),
+    }
+    try:
+        with db.engine.begin() as conn:
+            res = conn.execute(update(table).where(table.c.fingerprint == key).values(**values))
+            if res.rowcount == 0:
+                conn.execute(insert(table).values(fingerprint=key, **values))
+    except IntegrityError:
+        pass
+    except Exception as e:
+        _count("db_errors")
+        logger.warning("[CHART CACHE] Falha ao gravar cache: %s", e)
+
+
+def purge_stale(version: str) -> int:
+    """Apaga do banco as linhas geradas por outra versão. Devolve quantas."""
+    from sqlalchemy import delete
+    from app.main import db
+    from app.models import ChartCache
+
+    table = ChartCache.__table__
+    with db.engine.begin() as conn:
+        return conn.execute(delete(table).where(table.c.version != version)).rowcount
+
+
+# ── API pública ───────────────────────────────────────────
+
+def cached_chart(
+    jd_ut: float,
+    lat: float,
+    lon: float,
+    house_system: str,
+    version: str,
+    compute: Callable[[float, float, float], dict],
+    orbs: object = None,
+) -> dict:
+    """Devolve o mapa do cache ou calcula com `compute(jd, lat, lon)`.
+
+    `compute` recebe as entradas já quantizadas e deve devolver um dict
+    serializável em JSON. O chamador não deve modificar o dict devolvido.
+    """
+    key = fingerprint(jd_ut, lat, lon, house_system, orbs)
+    lru_key = (version, key)
+
+    payload = _LRU.get(lru_key)
+    if payload is not None:
+        _count("memory_hits")
+        return payload
+
+    use_db = _db_enabled()
+    if use_db:
+        payload = _db_get(key, version)
+        if payload is not None:
+            _count("db_hits")
+            _LRU.set(lru_key, payload)
+            return payload
+
+    _count("misses")
+    payload = compute(*canonical_inputs(jd_ut, lat, lon))
+    _LRU.set(lru_key, payload)
+    if use_db:
+        _db_put(key, version, payload)
+    return payload
+
+
+def clear_memory_cache() -> None:
+    _LRU.clear()
@@ -0,0 +1,499 @@
+# app/services/chart_index.py
+"""
+Índice de mapas parecidos (vizinhos mais próximos) para Sky.AI
+==============================================================
+
+"Pessoas com um mapa parecido com o seu" e *matching* em massa sem
+recalcular mapas a partir das `TestSession`: cada relatório gerado grava as
+11 longitudes (SUN … PLUTO, ASC) na tabela `chart_vectors` e este módulo
+faz a busca.
+
+Distância circular
+------------------
+Cada longitude λ vira `√w · (cos λ, sin λ)` (22 dimensões, `w` = peso do
+corpo de `synastry_service.BODY_WEIGHTS`). A distância euclidiana² entre dois
+vetores é `Σ w · (2 − 2·cos Δλ)`: respeita o círculo (359° está a 2° de
+1°). Como todos os vetores têm a mesma norma, o mais próximo é o de
+**maior produto escalar**. `similarity = 1 − d² / (4·Σw)` vai de 0 a 1.
+
+Estrutura (IVF em disco, `CHART_INDEX_PATH`)
+-------------------------------------------
+• *k‑means* (NumPy) em `nlist ≈ √N` centróides; os vetores ficam
+  **ordenados por lista** em `vectors.npy` (float32, memory‑mapped), com
+  `offsets.npy` marcando onde cada lista começa;
+• consulta: centróides mais próximos → varre só `nprobe` listas
+  (contíguas no arquivo) → top‑k. Se os filtros deixarem menos de k
+  candidatos, `nprobe` dobra até achar (ou varrer tudo);
+• filtros: `exclude_user_id`, `sun_sign`, `birth_years=(de, até)`;
+• **delta**: linhas de `chart_vectors` com `session_id` maior que o último
+  indexado são buscadas por força bruta (recarregadas a cada
+  `CHART_INDEX_DELTA_TTL` s; `add_chart` já entra na hora no processo atual).
+  Mapas antigos incluídos depois (backfill) só aparecem após reconstruir.
+
+Reconstrução: `python build_chart_index.py` (grava num diretório temporário
+e troca atomicamente; os workers recarregam ao ver o `meta.json` novo).
+
+Variáveis de ambiente
+---------------------
+CHART_INDEX_PATH       → diretório do índice (sem ele, só o delta/banco é usado)
+CHART_INDEX_NPROBE     → listas varridas por consulta (padrão 32)
+CHART_INDEX_DELTA_TTL  → segundos entre recargas do delta (padrão 30)
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from app.services.astrology_service import SIGNS
+from app.services.synastry_service import BODY_WEIGHTS, SYNASTRY_BODIES, chart_longitudes
+
+logger = logging.getLogger(__name__)
+
+CHART_INDEX_PATH = os.getenv("CHART_INDEX_PATH")
+CHART_INDEX_NPROBE = int(os.getenv("CHART_INDEX_NPROBE", "32"))
+CHART_INDEX_DELTA_TTL = float(os.getenv("CHART_INDEX_DELTA_TTL", "30"))
+
+INDEX_BODIES: List[str] = list(SYNASTRY_BODIES)
+_SQRT_W = np.sqrt(np.array([BODY_WEIGHTS[b] for b in INDEX_BODIES], dtype=np.float64))
+_TOTAL_W = float((_SQRT_W ** 2).sum())
+DIM = 2 * len(INDEX_BODIES)
+NO_SIGN = -1
+
+
+# ── Vetores ───────────────────────────────────────────────
+
+def chart_features(longitudes) -> np.ndarray:
+    """Longitudes `(…, 11)` → vetores `(…, 22)` float32 (cos/sin ponderados)."""
+    rad = np.radians(np.asarray(longitudes, dtype=np.float64))
+    out = np.empty(rad.shape[:-1] + (DIM,), dtype=np.float32)
+    out[..., 0::2] = np.cos(rad) * _SQRT_W
+    out[..., 1::2] = np.sin(rad) * _SQRT_W
+    return out
+
+
+def _similarity(dots: np.ndarray) -> np.ndarray:
+    # d² = 2·Σw − 2·(q·x)  →  1 − d²/(4·Σw)
+    return 0.5 + 0.5 * dots / _TOTAL_W
+
+
+def sign_index(sign: Optional[str]) -> int:
+    return SIGNS.index(sign) if sign in SIGNS else NO_SIGN
+
+
+# ── Construção ────────────────────────────────────────────
+
+def _assign(x: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    """Centróide mais próximo de cada linha (L2), em blocos."""
+    c_norm = (centroids.astype(np.float64) ** 2).sum(axis=1).astype(np.float32)
+    out = np.empty(len(x), dtype=np.int32)
+    for s in range(0, len(x), chunk):
+        scores = x[s : s + chunk] @ centroids.T
+        scores *= 2.0
+        scores -= c_norm
+        out[s : s + chunk] = scores.argmax(axis=1)
+    return out
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = 15, seed: int = 0) -> np.ndarray:
+    """Lloyd simples em float32; clusters vazios são re‑semeados."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(x, centroids)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros((k, x.shape[1]), dtype=np.float64)
+        np.add.at(sums, labels, x)
+        empty = counts == 0
+        centroids[~empty] = (sums[~empty] / counts[~empty, None]).astype(np.float32)
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+    return centroids
+
+
+def build_index(
+    out_dir: str,
+    session_ids: np.ndarray,
+    longitudes: np.ndarray,
+    user_ids: Optional[np.ndarray] = None,
+    sun_signs: Optional[np.ndarray] = None,
+    birth_years: Optional[np.ndarray] = None,
+    nlist: Optional[int] = None,
+    seed: int = 0,
+) -> Dict[str, object]:
+    """Treina o IVF e grava o índice em `out_dir` (troca atômica do diretório)."""
+    n = len(session_ids)
+    if n == 0:
+        raise ValueError("Nenhum mapa para indexar.")
+    x = chart_features(longitudes)
+    nlist = int(nlist or max(1, min(4096, round(np.sqrt(n)))))
+    nlist = min(nlist, n)
+
+    rng = np.random.default_rng(seed)
+    train = x if n <= 256 * nlist else x[rng.choice(n, size=256 * nlist, replace=False)]
+    centroids = kmeans(train, nlist, seed=seed)
+    labels = _assign(x, centroids)
+    order = np.argsort(labels, kind="stable")
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=nlist), out=offsets[1:])
+
+    def col(values, dtype, fill):
+        return np.full(n, fill, dtype=dtype) if values is None else np.asarray(values, dtype=dtype)
+
+    tmp = f"{out_dir.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "centroids.npy"), centroids)
+    np.save(os.path.join(tmp, "offsets.npy"), offsets)
+    np.save(os.path.join(tmp, "vectors.npy"), x[order])
+    np.save(os.path.join(tmp, "session_ids.npy"), np.asarray(session_ids, dtype=np.int64)[order])
+    np.save(os.path.join(tmp, "user_ids.npy"), col(user_ids, np.int64, -1)[order])
+    np.save(os.path.join(tmp, "sun_signs.npy"), col(sun_signs, np.int8, NO_SIGN)[order])
+    np.save(os.path.join(tmp, "birth_years.npy"), col(birth_years, np.int16, 0)[order])
+    meta = {
+        "n": n,
+        "nlist": nlist,
+        "dim": DIM,
+        "bodies": INDEX_BODIES,
+        "weights": [BODY_WEIGHTS[b] for b in INDEX_BODIES],
+        "max_session_id": int(np.max(session_ids)),
+        "built_at": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    old = f"{out_dir.rstrip(os.sep)}.old-{os.getpid()}"
+    if os.path.isdir(out_dir):
+        os.replace(out_dir, old)   # quem já tem os arquivos mapeados continua lendo
+    os.replace(tmp, out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+# ── Consulta ──────────────────────────────────────────────
+
+Filters = Tuple[Optional[int], int, Optional[Tuple[int, int]]]
+
+
+def _mask(user_ids, sun_signs, birth_years, filters: Filters) -> Optional[np.ndarray]:
+    exclude_user_id, sun, years = filters
+    mask = None
+    if exclude_user_id is not None:
+        mask = user_ids != exclude_user_id
+    if sun != NO_SIGN:
+        m = sun_signs == sun
+        mask = m if mask is None else mask & m
+    if years is not None:
+        m = (birth_years >= years[0]) & (birth_years <= years[1])
+        mask = m if mask is None else mask & m
+    return mask
+
+
+def _top(dots: np.ndarray, k: int) -> np.ndarray:
+    if len(dots) <= k:
+        return np.argsort(-dots, kind="stable")
+    idx = np.argpartition(-dots, k - 1)[:k]
+    return idx[np.argsort(-dots[idx], kind="stable")]
+
+
+class ChartIndex:
+    """Índice IVF memory‑mapped (ver docstring do módulo)."""
+
+    def __init__(self, path: str) -> None:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta["bodies"] != INDEX_BODIES or self.meta["weights"] != [BODY_WEIGHTS[b] for b in INDEX_BODIES]:
+            raise ValueError("Índice gerado com outros corpos/pesos; reconstrua.")
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")  # noqa: E731
+        self.centroids = np.load(os.path.join(path, "centroids.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.vectors = load("vectors")
+        self.session_ids = load("session_ids")
+        self.user_ids = load("user_ids")
+        self.sun_signs = load("sun_signs")
+        self.birth_years = load("birth_years")
+        self.max_session_id = int(self.meta["max_session_id"])
+        self._c_norm = (self.centroids.astype(np.float64) ** 2).sum(axis=1)
+
+    def __len__(self) -> int:
+        return int(self.meta["n"])
+
+    def search(self, q: np.ndarray, k: int, filters: Filters, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """`(session_ids, produtos escalares)` dos k melhores, em ordem."""
+        order = np.argsort(self._c_norm - 2.0 * (self.centroids @ q))
+        nlist = len(order)
+        probed = 0
+        ids_parts: List[np.ndarray] = []
+        dot_parts: List[np.ndarray] = []
+        found = 0
+        nprobe = max(1, nprobe)
+        while probed < nlist:
+            lists = order[probed : probed + nprobe]
+            probed += len(lists)
+            for c in lists:
+                a, b = int(self.offsets[c]), int(self.offsets[c + 1])
+                if a == b:
+                    continue
+                dots = np.asarray(self.vectors[a:b]) @ q
+                mask = _mask(self.user_ids[a:b], self.sun_signs[a:b], self.birth_years[a:b], filters)
+                rows = np.arange(a, b) if mask is None else np.arange(a, b)[mask]
+                if mask is not None:
+                    dots = dots[mask]
+                if len(dots) > k:   # só os k melhores de cada lista sobem
+                    sel = np.argpartition(-dots, k - 1)[:k]
+                    rows, dots = rows[sel], dots[sel]
+                ids_parts.append(self.session_ids[rows])
+                dot_parts.append(dots)
+                found += len(dots)
+            if found >= k:
+                break
+            nprobe *= 2   # filtros muito restritivos: abre mais listas
+        if not ids_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        ids, dots = np.concatenate(ids_parts), np.concatenate(dot_parts)
+        top = _top(dots, k)
+        return ids[top], dots[top]
+
+
+# ── Delta (banco) ─────────────────────────────────────────
+
+class _Delta:
+    """Mapas ainda fora do índice: `session_id > max_session_id` (força bruta)."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.after = -1          # maior session_id já no índice
+        self.loaded_max = -1     # maior session_id já lido do banco
+        self.loaded_at = 0.0
+        self.rows: Dict[int, Tuple[int, int, int, np.ndarray]] = {}
+        self._arrays: Optional[Tuple[np.ndarray, ...]] = None
+
+    def reset(self, after: int) -> None:
+        with self.lock:
+            self.after, self.loaded_at, self.rows, self._arrays = after, 0.0, {}, None
+            self.loaded_max = after
+
+    def add(self, session_id: int, user_id: int, sun: int, year: int, vec: np.ndarray) -> None:
+        with self.lock:
+            if session_id > self.after:
+                self.rows[session_id] = (user_id, sun, year, vec)
+                self._arrays = None
+
+    def arrays(self) -> Optional[Tuple[np.ndarray, ...]]:
+        with self.lock:
+            if self._arrays is None and self.rows:
+                ids = np.fromiter(self.rows, dtype=np.int64, count=len(self.rows))
+                meta = np.array([r[:3] for r in self.rows.values()], dtype=np.int64)
+                vecs = np.stack([r[3] for r in self.rows.values()])
+                self._arrays = (ids, meta[:, 0], meta[:, 1], meta[:, 2], vecs)
+            return self._arrays
+
+
+_INDEX: Optional[ChartIndex] = None
+_INDEX_MTIME: Optional[float] = None
+_INDEX_CHECKED = 0.0
+_INDEX_LOCK = threading.Lock()
+_DELTA = _Delta()
+
+
+def _db_enabled() -> bool:
+    from flask import has_app_context
+
+    return has_app_context()
+
+
+def _row_values(row) -> Tuple[int, int, int, int, np.ndarray]:
+    lon = np.array(json.loads(row.longitudes), dtype=np.float64)
+    return (
+        int(row.session_id),
+        -1 if row.user_id is None else int(row.user_id),
+        sign_index(row.sun_sign),
+        int(row.birth_year or 0),
+        chart_features(lon),
+    )
+
+
+def _refresh_delta(force: bool = False) -> None:
+    if not _db_enabled():
+        return
+    now = time.monotonic()
+    if not force and now - _DELTA.loaded_at < CHART_INDEX_DELTA_TTL:
+        return
+    from sqlalchemy import select
+    from app.main import db
+    from app.models import ChartVector
+
+    table = ChartVector.__table__
+    try:
+        with db.engine.connect() as conn:
+            rows = conn.execute(
+                select(table).where(table.c.session_id > max(_DELTA.after, _DELTA.loaded_max))
+            ).fetchall()
+    except Exception as e:
+        logger.warning("[CHART INDEX] Falha ao ler o delta: %s", e)
+        _DELTA.loaded_at = now   # não martela o banco a cada consulta
+        return
+    for row in rows:
+        sid, uid, sun, year, vec = _row_values(row)
+        _DELTA.add(sid, uid, sun, year, vec)
+        _DELTA.loaded_max = max(_DELTA.loaded_max, sid)
+    _DELTA.loaded_at = now
+
+
+def get_index() -> Optional[ChartIndex]:
+    """Índice do disco; recarrega se `meta.json` mudou (checado a cada TTL)."""
+    global _INDEX, _INDEX_MTIME, _INDEX_CHECKED
+    if not CHART_INDEX_PATH:
+        return None
+    now = time.monotonic()
+    if _INDEX is not None and now - _INDEX_CHECKED < CHART_INDEX_DELTA_TTL:
+        return _INDEX
+    with _INDEX_LOCK:
+        _INDEX_CHECKED = now
+        try:
+            mtime = os.stat(os.path.join(CHART_INDEX_PATH, "meta.json")).st_mtime
+        except OSError:
+            return _INDEX
+        if mtime != _INDEX_MTIME:
+            try:
+                _INDEX = ChartIndex(CHART_INDEX_PATH)
+                _INDEX_MTIME = mtime
+                _DELTA.reset(_INDEX.max_session_id)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("[CHART INDEX] Índice indisponível em %s: %s", CHART_INDEX_PATH, e)
+    return _INDEX
+
+
+# ── API pública ───────────────────────────────────────────
+
+def add_chart(
+    session_id: int,
+    user_id: Optional[int],
+    astro: Mapping[str, object],
+    birth_year: Optional[int] = None,
+) -> None:
+    """Grava o mapa em `chart_vectors` (upsert) e já o inclui no delta local."""
+    lon = chart_longitudes(astro)
+    sun = astro["positions"]["SUN"]["sign"]
+    _DELTA.add(int(session_id), -1 if user_id is None else int(user_id), sign_index(sun),
+               int(birth_year or 0), chart_features(lon))
+    if not _db_enabled():
+        return
+
+    from sqlalchemy import insert, update
+    from sqlalchemy.exc import IntegrityError
+    from app.main import db
+    from app.models import ChartVector
+
+    table = ChartVector.__table__
+    values = {
+        "user_id": user_id,
+        "birth_year": birth_year,
+        "sun_sign": sun,
+        "longitudes": json.dumps([round(float(v), 6) for v in lon]),
+        "created_at": datetime.utcnow(),
+    }
+    try:
+        with db.engine.begin() as conn:
+            res = conn.execute(update(table).where(table.c.session_id == session_id).values(**values))
+            if res.rowcount == 0:
+                conn.execute(insert(table).values(session_id=session_id, **values))
+    except IntegrityError:
+        pass
+    except Exception as e:
+        logger.warning("[CHART INDEX] Falha ao gravar vetor da sessão %s: %s", session_id, e)
+
+
+def similar_charts(
+    astro_or_lon,
+    k: int = 10,
+    exclude_user_id: Optional[int] = None,
+    sun_sign: Optional[str] = None,
+    birth_years: Optional[Tuple[int, int]] = None,
+    nprobe: Optional[int] = None,
+) -> List[Dict[str, object]]:
+    """Os `k` mapas guardados mais parecidos (índice + delta), do mais parecido ao menos.
+
+    `astro_or_lon`: saída de `get_astrological_data` ou longitudes `(11,)`.
+    Cada item: `session_id`, `similarity` (0–1) e `distance` (graus‑equivalentes
+    de √(d²/Σw), só para leitura humana).
+    """
+    lon = chart_longitudes(astro_or_lon) if isinstance(astro_or_lon, Mapping) else np.asarray(astro_or_lon)
+    q = chart_features(lon)
+    filters: Filters = (exclude_user_id, sign_index(sun_sign) if sun_sign else NO_SIGN, birth_years)
+
+    ids_parts, dot_parts = [], []
+    index = get_index()
+    if index is not None:
+        ids, dots = index.search(q, k, filters, nprobe or CHART_INDEX_NPROBE)
+        ids_parts.append(ids)
+        dot_parts.append(dots)
+
+    _refresh_delta()
+    delta = _DELTA.arrays()
+    if delta is not None:
+        d_ids, d_users, d_suns, d_years, d_vecs = delta
+        dots = d_vecs @ q
+        mask = _mask(d_users, d_suns, d_years, filters)
+        if mask is not None:
+            d_ids, dots = d_ids[mask], dots[mask]
+        ids_parts.append(d_ids)
+        dot_parts.append(dots)
+
+    if not ids_parts:
+        return []
+    ids, dots = np.concatenate(ids_parts), np.concatenate(dot_parts).astype(np.float64)
+    top = _top(dots, k)
+    sim = _similarity(dots[top])
+    dist = np.degrees(np.arccos(np.clip(2.0 * sim - 1.0, -1.0, 1.0)))   # cos Δ médio ponderado → °
+    return [
+        {"session_id": int(ids[i]), "similarity": round(float(s), 4), "distance": round(float(d), 2)}
+        for i, s, d in zip(top, sim, dist)
+    ]
+
+
+def iter_vectors(batch: int = 10000) -> Iterator[Tuple[int, int, int, int, np.ndarray]]:
+    """Todas as linhas de `chart_vectors` (para a reconstrução), em lotes."""
+    from sqlalchemy import select
+    from app.main import db
+    from app.models import ChartVector
+
+    table = ChartVector.__table__
+    last = -1
+    while True:
+        with db.engine.connect() as conn:
+            rows = conn.execute(
+                select(table).where(table.c.session_id > last).order_by(table.c.session_id).limit(batch)
+            ).fetchall()
+        if not rows:
+            return
+        for row in rows:
+            lon = np.array(json.loads(row.longitudes), dtype=np.float64)
+            yield (
+                int(row.session_id),
+                -1 if row.user_id is None else int(row.user_id),
+                sign_index(row.sun_sign),
+                int(row.birth_year or 0),
+                lon,
+            )
+        last = int(rows[-1].session_id)
+
+
+def stats() -> Dict[str, object]:
+    index = get_index()
+    _refresh_delta()
+    delta = _DELTA.arrays()
+    return {
+        "indexed": len(index) if index is not None else 0,
+        "nlist": int(index.meta["nlist"]) if index is not None else 0,
+        "built_at": index.meta["built_at"] if index is not None else None,
+        "delta": 0 if delta is None else len(delta[0]),
+    }
@@ -0,0 +1,234 @@
+# app/services/compact_chart.py
+"""
+Mapa natal compacto (arrays + binário) para Sky.AI
+==================================================
+
+`get_astrological_data` devolve dicts aninhados por corpo, bons para o
+prompt e caros de guardar. `CompactChart` é o mesmo mapa em arrays NumPy
+na ordem de `CHART_BODIES` (SUN … PLUTO, ASC):
+
+• `longitudes` (float64), `speeds` (float64, °/dia; ASC = 0),
+  `houses` (int8, 1–12), `cusps` (float64, 12);
+• `jd_ut`, `lat`, `lon`, `timezone`, `house_system` como metadados
+  (`__slots__`, sem `__dict__` por instância).
+
+`to_astro()` reconstrói **exatamente** o dict de `get_astrological_data`
+(signo/grau saem da longitude arredondada, os aspectos são recalculados
+com os orbes padrão), então Guru, compatibilidade, re‑render e análises
+usam o mapa do relatório sem recalcular nem geocodificar de novo.
+
+Formato binário (little‑endian, versão 1, ~330 bytes)
+-----------------------------------------------------
+    "SKYC" | versão u8 | sistema de casas (1 byte ASCII) | nº de corpos u8 |
+    tamanho do fuso u8 | jd, lat, lon (3 × f64) |
+    longitudes (n × f64) | velocidades (n × f64) | casas (n × i8) |
+    cúspides (12 × f64) | fuso (UTF‑8)
+
+Gravado em `TestSession.chart_blob`. Um novo layout exige nova versão;
+`from_bytes` continua lendo as anteriores.
+"""
+
+from __future__ import annotations
+
+import struct
+from typing import Dict, List, Mapping, Optional
+
+import numpy as np
+
+from app.services.aspect_engine import Orbs, find_aspects
+from app.services.astrology_service import (
+    ASPECTS_LIST,
+    BODIES,
+    HOUSE_SYSTEMS,
+    SIGNS,
+    _cusp_fields,
+    _sign_fields,
+)
+
+CHART_BODIES: List[str] = [*BODIES, "ASC"]
+FORMAT_VERSION = 1
+
+_MAGIC = b"SKYC"
+_HEADER = struct.Struct("<4sBcBB3d")
+_N = len(CHART_BODIES)
+
+
+class CompactChart:
+    """Mapa natal em arrays (ver docstring do módulo)."""
+
+    __slots__ = ("longitudes", "speeds", "houses", "cusps", "jd_ut", "lat", "lon", "timezone", "house_system")
+
+    def __init__(
+        self,
+        longitudes,
+        speeds,
+        houses,
+        cusps,
+        jd_ut: float,
+        lat: float,
+        lon: float,
+        timezone: str,
+        house_system: str,
+    ) -> None:
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.speeds = np.asarray(speeds, dtype=np.float64)
+        self.houses = np.asarray(houses, dtype=np.int8)
+        self.cusps = np.asarray(cusps, dtype=np.float64)
+        self.jd_ut = float(jd_ut)
+        self.lat = float(lat)
+        self.lon = float(lon)
+        self.timezone = timezone
+        self.house_system = house_system
+
+    # ── dict ↔ arrays ─────────────────────────────────────
+
+    @classmethod
+    def from_astro(cls, astro: Mapping[str, object]) -> "CompactChart":
+        """A partir da saída de `get_astrological_data`."""
+        positions = astro["positions"]
+        return cls(
+            [positions[b]["longitude"] for b in CHART_BODIES],
+            [positions[b].get("speed", 0.0) for b in CHART_BODIES],
+            [positions[b].get("house", 0) for b in CHART_BODIES],
+            [c["longitude"] for c in astro["houses"]["cusps"]],
+            astro["jd_ut"],
+            astro["coords"]["lat"],
+            astro["coords"]["lon"],
+            astro["timezone"],
+            astro["houses"]["system"],
+        )
+
+    def position(self, body: str) -> Dict[str, object]:
+        """Dict do corpo como em `get_astrological_data` (`longitude`, `sign`, …)."""
+        j = CHART_BODIES.index(body)
+        out: Dict[str, object] = _sign_fields(float(self.longitudes[j]))
+        if body != "ASC":
+            out["speed"] = float(self.speeds[j])
+        if self.houses[j]:
+            out["house"] = int(self.houses[j])
+        return out
+
+    def to_astro(self, orbs: Orbs = None) -> Dict[str, object]:
+        """Reconstrói o dict de `get_astrological_data` (aspectos recalculados)."""
+        positions = {b: self.position(b) for b in CHART_BODIES}
+        aspects = find_aspects(
+            [positions[b]["longitude"] for b in CHART_BODIES], CHART_BODIES, ASPECTS_LIST, orbs=orbs
+        )
+        return {
+            "positions": positions,
+            "aspects": aspects,
+            "houses": {
+                "system": self.house_system,
+                "name": HOUSE_SYSTEMS.get(self.house_system, self.house_system),
+                "cusps": [_cusp_fields(i, float(c)) for i, c in enumerate(self.cusps, 1)],
+            },
+            "coords": {"lat": self.lat, "lon": self.lon},
+            "timezone": self.timezone,
+            "jd_ut": self.jd_ut,
+        }
+
+    # ── Consultas ─────────────────────────────────────────
+
+    def sign_indices(self) -> np.ndarray:
+        return (self.longitudes // 30.0).astype(np.int64) % 12
+
+    def sign(self, body: str) -> str:
+        return SIGNS[int(self.sign_indices()[CHART_BODIES.index(body)])]
+
+    @property
+    def retrograde(self) -> np.ndarray:
+        return self.speeds < 0
+
+    # ── Binário ───────────────────────────────────────────
+
+    def to_bytes(self) -> bytes:
+        tz = self.timezone.encode("utf-8")
+        header = _HEADER.pack(
+            _MAGIC, FORMAT_VERSION, self.house_system.encode("ascii"), _N, len(tz), self.jd_ut, self.lat, self.lon
+        )
+        return b"".join(
+            (
+                header,
+                self.longitudes.astype("<f8").tobytes(),
+                self.speeds.astype("<f8").tobytes(),
+                self.houses.astype("i1").tobytes(),
+                self.cusps.astype("<f8").tobytes(),
+                tz,
+            )
+        )
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "CompactChart":
+        """Lê `to_bytes`; ValueError se o blob não for um mapa válido."""
+        blob = bytes(blob)
+        if len(blob) < _HEADER.size:
+            raise ValueError("Blob de mapa truncado.")
+        magic, version, hsys, n, tz_len, jd, lat, lon = _HEADER.unpack_from(blob)
+        if magic != _MAGIC:
+            raise ValueError("Blob não é um mapa Sky.AI.")
+        if version != FORMAT_VERSION or n != _N:
+            raise ValueError(f"Formato de mapa não suportado (versão {version}, {n} corpos).")
+        off = _HEADER.size
+        if len(blob) != off + n * 17 + 12 * 8 + tz_len:
+            raise ValueError("Blob de mapa com tamanho inválido.")
+
+        def take(dtype: str, count: int) -> np.ndarray:
+            nonlocal off
+            arr = np.frombuffer(blob, dtype=dtype, count=count, offset=off)
+            off += arr.nbytes
+            return arr.copy()
+
+        longitudes = take("<f8", n)
+        speeds = take("<f8", n)
+        houses = take("i1", n)
+        cusps = take("<f8", 12)
+        tz = blob[off : off + tz_len].decode("utf-8")
+        return cls(longitudes, speeds, houses, cusps, jd, lat, lon, tz, hsys.decode("ascii"))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CompactChart):
+            return NotImplemented
+        return self.to_bytes() == other.to_bytes()
+
+    def __repr__(self) -> str:
+        signs = self.sign_indices()
+        return (
+            f"<CompactChart jd={self.jd_ut:.5f} SUN={SIGNS[signs[0]]} "
+            f"MOON={SIGNS[signs[1]]} ASC={SIGNS[signs[-1]]}>"
+        )
+
+
+# ── Sessões ───────────────────────────────────────────────
+
+def encode(astro: Mapping[str, object]) -> bytes:
+    """Saída de `get_astrological_data` → bytes para `TestSession.chart_blob`."""
+    return CompactChart.from_astro(astro).to_bytes()
+
+
+def session_chart(sessao, compute: bool = True) -> Optional[CompactChart]:
+    """Mapa exato de uma `TestSession`.
+
+    Lê o `chart_blob`; se a sessão for anterior a ele e `compute=True`,
+    recalcula (cache de mapas) e preenche o campo — o commit fica com o
+    chamador. Devolve None se não houver como obter o mapa.
+    """
+    blob = getattr(sessao, "chart_blob", None)
+    if blob:
+        try:
+            return CompactChart.from_bytes(blob)
+        except ValueError:
+            pass
+    if not compute or not (sessao.birth_date and sessao.birth_time):
+        return None
+
+    from app.services.astrology_service import get_astrological_data
+
+    astro = get_astrological_data(
+        sessao.birth_date.strftime("%Y-%m-%d"),
+        sessao.birth_time.strftime("%H:%M"),
+        sessao.birth_city,
+        sessao.birth_country,
+    )
+    chart = CompactChart.from_astro(astro)
+    sessao.chart_blob = chart.to_bytes()
+    return chart
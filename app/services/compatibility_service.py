@@ -0,0 +1,123 @@
+# app/services/compatibility_service.py
+"""
+Pipeline de compatibilidade (dois mapas) para Sky.AI
+====================================================
+
+`/compatibility` precisa, para cada pessoa, de geocodificação + fuso +
+Swiss Ephemeris e da numerologia. Antes era tudo em série dentro do
+request; aqui as **duas pessoas rodam em paralelo** num pool de threads
+pequeno e compartilhado, sob um **prazo único** (`COMPATIBILITY_TIMEOUT`):
+
+• a espera pelas duas pessoas usa o tempo que sobra do prazo;
+• o mesmo prazo vai para `get_astrological_data(timeout=…)`, então a fila
+  do Swiss Ephemeris (`ephemeris_executor`) não passa dele;
+• a geocodificação é I/O (cache no banco / OpenCage) e ganha de verdade
+  com o paralelismo; o cálculo do mapa é serializado pelo executor.
+
+Cada worker roda dentro de um app context (caches no banco). O resultado
+traz o `get_astrological_data` completo de cada pessoa e o tempo de cada
+etapa em ms (`timings`), que a rota loga.
+
+Variáveis de ambiente
+---------------------
+COMPATIBILITY_TIMEOUT  → prazo total dos dois mapas, em segundos (padrão 20)
+COMPATIBILITY_WORKERS  → threads do pool compartilhado (padrão 4)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Dict, Mapping, Optional, Tuple
+
+from app.services.astrology_service import get_astrological_data
+from app.services.numerology_service import get_numerology
+
+COMPATIBILITY_TIMEOUT = float(os.getenv("COMPATIBILITY_TIMEOUT", "20"))
+COMPATIBILITY_WORKERS = int(os.getenv("COMPATIBILITY_WORKERS", "4"))
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_PID = 0
+_POOL_LOCK = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _POOL, _POOL_PID
+    if _POOL is None or _POOL_PID != os.getpid():   # threads não sobrevivem ao fork
+        with _POOL_LOCK:
+            if _POOL is None or _POOL_PID != os.getpid():
+                _POOL = ThreadPoolExecutor(max_workers=COMPATIBILITY_WORKERS, thread_name_prefix="compat")
+                _POOL_PID = os.getpid()
+    return _POOL
+
+
+def _ms(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+def person_pipeline(person: Mapping[str, str], deadline: float, app=None) -> Dict[str, object]:
+    """Mapa completo + numerologia de uma pessoa, com tempos por etapa.
+
+    `person`: `name`, `birth_date`, `birth_time`, `birth_city`, `birth_country`.
+    """
+    if app is not None:
+        with app.app_context():
+            return person_pipeline(person, deadline)
+
+    timings: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    astro = get_astrological_data(
+        person["birth_date"],
+        person["birth_time"],
+        person["birth_city"],
+        person["birth_country"],
+        timeout=max(0.001, deadline - time.monotonic()),
+        timings=timings,
+    )
+    timings["astro_ms"] = _ms(t0)
+
+    t0 = time.perf_counter()
+    numerology = get_numerology(person["name"], person["birth_date"])
+    timings["numerology_ms"] = _ms(t0)
+    return {"astro": astro, "numerology": numerology, "timings": timings}
+
+
+def compute_pair(
+    person_a: Mapping[str, str],
+    person_b: Mapping[str, str],
+    timeout: Optional[float] = None,
+    app=None,
+) -> Tuple[Dict[str, object], Dict[str, object], Dict[str, float]]:
+    """Roda as duas pessoas em paralelo sob um prazo único.
+
+    Devolve `(resultado_a, resultado_b, timings)`; `timings` tem as etapas
+    de cada pessoa (`a_location_ms`, `a_chart_ms`, `b_numerology_ms`, …) e
+    `pair_ms` (parede).
+    Lança `TimeoutError` se o prazo estourar, ou a exceção da pessoa que
+    falhou primeiro. Passe `app` (Flask) para os caches no banco.
+    """
+    timeout = COMPATIBILITY_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    t0 = time.perf_counter()
+
+    futures = [_pool().submit(person_pipeline, p, deadline, app) for p in (person_a, person_b)]
+    done, pending = wait(futures, timeout=timeout, return_when=FIRST_EXCEPTION)
+    for f in done:
+        if f.exception() is not None:
+            for p in pending:
+                p.cancel()
+            raise f.exception()
+    if pending:
+        for p in pending:
+            p.cancel()
+        raise TimeoutError(f"Mapas de compatibilidade não ficaram prontos em {timeout:g}s.")
+
+    result_a, result_b = futures[0].result(), futures[1].result()
+    timings: Dict[str, float] = {}
+    for prefix, result in (("a", result_a), ("b", result_b)):
+        for stage, ms in result["timings"].items():
+            timings[f"{prefix}_{stage}"] = ms
+    timings["pair_ms"] = _ms(t0)
+    return result_a, result_b, timings
@@ -0,0 +1,361 @@
+# app/services/ephemeris_executor.py
+"""
+Execução thread‑safe do Swiss Ephemeris para Sky.AI
+===================================================
+
+O `swisseph` é uma biblioteca C com **estado global** (caminho das
+efemérides, arquivos `.se1` abertos, posições em cache). Chamadas
+simultâneas de threads diferentes — requests do gunicorn `gthread` e a
+`threading.Thread` de `processando_relatorio` — podem trocar esse estado no
+meio de um cálculo e devolver posições erradas sem nenhum erro. Além disso,
+o pyswisseph guarda esse estado **por thread**: o `swe.set_ephe_path` feito
+no import só vale para a thread principal, e as demais caem caladas no
+Moshier (arcos‑segundos de diferença). O executor configura o caminho em
+cada thread antes do primeiro cálculo (`prepare_thread`).
+
+Todo cálculo pesado passa por `run(fn, *args)`, em um de três modos:
+
+• serial  → (padrão) um único lock por processo, com fila **limitada**:
+            se já houver `EPHEMERIS_MAX_WAITING` esperando, a chamada é
+            recusada na hora (`EphemerisBusyError`) em vez de acumular;
+• process → pool de `EPHEMERIS_WORKERS` processos, cada um com a sua
+            própria cópia do swisseph (usa vários núcleos). `fn` e os
+            argumentos precisam ser serializáveis (funções de módulo);
+• off     → chama direto, sem proteção (scripts de uma thread só e os
+            workers de `chart_batch`, que já são processos isolados).
+
+Chamadas curtas feitas fora de `run` (ex. `swe.utc_to_jd`) usam
+`with locked():`, que sempre protege o swisseph do próprio processo.
+
+Cada chamada tem um prazo (`timeout`, padrão `EPHEMERIS_TIMEOUT`): estourou
+esperando a vez → `EphemerisTimeoutError`. No modo `process` o cálculo já
+iniciado não é interrompido, só abandonado. As chamadas são reentrantes:
+um `run` dentro de outro (na mesma thread ou dentro de um worker) roda
+direto, sem novo lock.
+
+Workers do gunicorn: `sync`/`gthread` funcionam com qualquer modo; com
+`gevent`/`eventlet` use `serial` (o lock é trocado pelo do monkey‑patch e
+cada greenlet espera a sua vez). Depois de um `fork` (ex. `--preload`) o
+lock e o pool são recriados no processo filho.
+
+Métricas (`stats()`, em `/admin/cache-stats`): chamadas, recusas, prazos
+estourados, fila atual/pico e tempos de espera (média, p95, máx.) e de
+execução.
+
+Variáveis de ambiente
+---------------------
+EPHEMERIS_EXECUTOR     → "serial" (padrão), "process" ou "off"
+EPHEMERIS_WORKERS      → processos no modo "process" (padrão 2)
+EPHEMERIS_MAX_WAITING  → chamadas na fila antes de recusar (padrão 32)
+EPHEMERIS_TIMEOUT      → prazo padrão em segundos (padrão 10; 0 = sem prazo)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+EPHEMERIS_EXECUTOR = os.getenv("EPHEMERIS_EXECUTOR", "serial").lower()
+EPHEMERIS_WORKERS = int(os.getenv("EPHEMERIS_WORKERS", "2"))
+EPHEMERIS_MAX_WAITING = int(os.getenv("EPHEMERIS_MAX_WAITING", "32"))
+EPHEMERIS_TIMEOUT = float(os.getenv("EPHEMERIS_TIMEOUT", "10"))
+
+MODES = ("serial", "process", "off")
+_SAMPLES = 1024   # últimas esperas guardadas para o p95
+
+T = TypeVar("T")
+
+
+class EphemerisBusyError(RuntimeError):
+    """Fila do Swiss Ephemeris cheia (back‑pressure)."""
+
+
+class EphemerisTimeoutError(TimeoutError):
+    """O prazo da chamada estourou antes do resultado."""
+
+
+# ── Estado por thread / worker ────────────────────────────
+
+_IN_WORKER = False
+_THREAD = threading.local()
+
+
+def prepare_thread() -> None:
+    """Aponta o swisseph desta thread para `SWISS_EPHEMERIS_DATA_PATH` (uma vez)."""
+    if getattr(_THREAD, "ready", False):
+        return
+    eph_path = os.getenv("SWISS_EPHEMERIS_DATA_PATH")
+    if eph_path:
+        import swisseph as swe
+
+        swe.set_ephe_path(eph_path)
+    _THREAD.ready = True
+
+
+def _init_worker(eph_path: Optional[str]) -> None:
+    global _IN_WORKER
+    _IN_WORKER = True
+    if eph_path:
+        import swisseph as swe
+
+        swe.set_ephe_path(eph_path)
+
+
+# ── Executor ──────────────────────────────────────────────
+
+class EphemerisExecutor:
+    """Serializa (ou distribui em processos) as chamadas ao swisseph."""
+
+    def __init__(
+        self,
+        mode: str = "serial",
+        workers: int = 2,
+        max_waiting: int = 32,
+        timeout: float = 10.0,
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"EPHEMERIS_EXECUTOR inválido: {mode!r} (use {', '.join(MODES)})")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_waiting = max(0, max_waiting)
+        self.timeout = timeout
+        self._meta = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._owner: Optional[int] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._waiting = 0
+        self._waits: Deque[float] = deque(maxlen=_SAMPLES)
+        self._stats: Dict[str, float] = {
+            "calls": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "peak_waiting": 0,
+            "wait_total_s": 0.0,
+            "wait_max_s": 0.0,
+            "run_total_s": 0.0,
+        }
+
+    def _check_fork(self) -> None:
+        if self._pid != os.getpid():   # processo filho herdou lock/pool do pai
+            with self._meta:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    # ── Prazo & fila ─────────────────────────────────────
+
+    def _deadline(self, timeout: Optional[float]) -> Optional[float]:
+        if timeout is None:
+            timeout = self.timeout
+        return time.monotonic() + timeout if timeout and timeout > 0 else None
+
+    def _enter_queue(self, limit: int) -> None:
+        with self._meta:
+            self._stats["calls"] += 1
+            if self._waiting >= limit:
+                self._stats["rejected"] += 1
+                raise EphemerisBusyError(
+                    f"Swiss Ephemeris ocupado: {self._waiting} chamadas na fila."
+                )
+            self._waiting += 1
+            self._stats["peak_waiting"] = max(self._stats["peak_waiting"], self._waiting)
+
+    def _leave_queue(self, waited: float, timed_out: bool = False) -> None:
+        with self._meta:
+            self._waiting -= 1
+            if timed_out:
+                self._stats["timeouts"] += 1
+            else:
+                self._waits.append(waited)
+                self._stats["wait_total_s"] += waited
+                self._stats["wait_max_s"] = max(self._stats["wait_max_s"], waited)
+
+    def _finish(self, elapsed: float, ok: bool) -> None:
+        with self._meta:
+            self._stats["completed" if ok else "failed"] += 1
+            self._stats["run_total_s"] += elapsed
+
+    # ── Lock do processo ─────────────────────────────────
+
+    @contextmanager
+    def locked(self, timeout: Optional[float] = None) -> Iterator[None]:
+        """Lock do swisseph deste processo (reentrante, com prazo e fila)."""
+        self._check_fork()
+        me = threading.get_ident()
+        if self._owner == me or _IN_WORKER:
+            yield
+            return
+
+        deadline = self._deadline(timeout)
+        self._enter_queue(self.max_waiting)
+        t0 = time.monotonic()
+        wait = -1 if deadline is None else max(0.0, deadline - t0)
+        acquired = False
+        try:
+            acquired = self._lock.acquire(timeout=wait)
+        finally:
+            self._leave_queue(time.monotonic() - t0, timed_out=not acquired)
+        if not acquired:
+            raise EphemerisTimeoutError("Prazo esgotado aguardando o Swiss Ephemeris.")
+
+        self._owner = me
+        try:
+            prepare_thread()
+            yield
+        finally:
+            self._owner = None
+            self._lock.release()
+
+    # ── Execução ─────────────────────────────────────────
+
+    def run(self, fn: Callable[..., T], *args, timeout: Optional[float] = None, **kwargs) -> T:
+        """Executa `fn(*args, **kwargs)` com o swisseph protegido.
+
+        `timeout` (s) limita a espera pelo resultado; `None` usa o padrão
+        do executor e `0` espera sem limite.
+        """
+        if self.mode == "off" or _IN_WORKER:
+            prepare_thread()
+            return fn(*args, **kwargs)
+        if self.mode == "process":
+            return self._run_process(fn, args, kwargs, timeout)
+
+        with self.locked(timeout):
+            t0 = time.monotonic()
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                self._finish(time.monotonic() - t0, ok)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._meta:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    initargs=(os.getenv("SWISS_EPHEMERIS_DATA_PATH"),),
+                )
+            return self._pool
+
+    def _run_process(self, fn, args, kwargs, timeout: Optional[float]):
+        self._check_fork()
+        deadline = self._deadline(timeout)
+        # Além dos que estão calculando, até `max_waiting` aguardam um worker
+        self._enter_queue(self.max_waiting + self.workers)
+        t0 = time.monotonic()
+        ok = timed_out = False
+        try:
+            future = self._get_pool().submit(fn, *args, **kwargs)
+            wait = None if deadline is None else max(0.0, deadline - t0)
+            try:
+                result = future.result(timeout=wait)
+            except FutureTimeoutError:
+                future.cancel()
+                timed_out = True
+                raise EphemerisTimeoutError("Prazo esgotado aguardando o Swiss Ephemeris.") from None
+            except BrokenProcessPool:
+                logger.error("[EPHEMERIS] Pool de processos quebrado; será recriado.")
+                self.shutdown(wait=False)
+                raise
+            ok = True
+            return result
+        finally:
+            elapsed = time.monotonic() - t0
+            self._leave_queue(elapsed, timed_out=timed_out)
+            if not timed_out:
+                self._finish(elapsed, ok)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._meta:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    # ── Métricas ─────────────────────────────────────────
+
+    def stats(self) -> Dict[str, object]:
+        """Contadores do processo atual (tempos em ms)."""
+        with self._meta:
+            s = dict(self._stats)
+            waits = sorted(self._waits)
+            waiting = self._waiting
+        done = s["completed"] + s["failed"]
+        return {
+            "mode": self.mode,
+            "workers": self.workers if self.mode == "process" else 1,
+            "max_waiting": self.max_waiting,
+            "waiting": waiting,
+            "peak_waiting": int(s["peak_waiting"]),
+            "calls": int(s["calls"]),
+            "completed": int(s["completed"]),
+            "failed": int(s["failed"]),
+            "rejected": int(s["rejected"]),
+            "timeouts": int(s["timeouts"]),
+            "wait_avg_ms": round(1000 * s["wait_total_s"] / len(waits), 3) if waits else 0.0,
+            "wait_p95_ms": round(1000 * waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+            "wait_max_ms": round(1000 * s["wait_max_s"], 3),
+            "run_avg_ms": round(1000 * s["run_total_s"] / done, 3) if done else 0.0,
+        }
+
+
+# ── API de módulo ─────────────────────────────────────────
+
+_EXECUTOR: Optional[EphemerisExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_executor() -> EphemerisExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = EphemerisExecutor(
+                    EPHEMERIS_EXECUTOR, EPHEMERIS_WORKERS, EPHEMERIS_MAX_WAITING, EPHEMERIS_TIMEOUT
+                )
+    return _EXECUTOR
+
+
+def configure(**kwargs) -> EphemerisExecutor:
+    """Troca o executor do processo (scripts/benchmarks). Mesmos args da classe."""
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        old, _EXECUTOR = _EXECUTOR, EphemerisExecutor(
+            kwargs.pop("mode", EPHEMERIS_EXECUTOR),
+            kwargs.pop("workers", EPHEMERIS_WORKERS),
+            kwargs.pop("max_waiting", EPHEMERIS_MAX_WAITING),
+            kwargs.pop("timeout", EPHEMERIS_TIMEOUT),
+            **kwargs,
+        )
+    if old is not None:
+        old.shutdown(wait=False)
+    return _EXECUTOR
+
+
+def run(fn: Callable[..., T], *args, timeout: Optional[float] = None, **kwargs) -> T:
+    return get_executor().run(fn, *args, timeout=timeout, **kwargs)
+
+
+def locked(timeout: Optional[float] = None):
+    return get_executor().locked(timeout)
+
+
+def stats() -> Dict[str, object]:
+    return get_executor().stats()
@@ -0,0 +1,280 @@
+# app/services/ephemeris_tables.py
+"""
+Tabelas de efemérides pré‑calculadas (modo rápido) para Sky.AI
+==============================================================
+
+Para varreduras de trânsitos e jobs em lote, que precisam de milhões de
+posições, amostramos o Swiss Ephemeris uma única vez (`build_ephemeris_tables.py`)
+e interpolamos com NumPy:
+
+• Sol, Mercúrio … Plutão → 1 amostra/dia
+• Lua                    → 1 amostra/hora
+• intervalo 1800‑01‑01 … 2400‑01‑01 (cobertura do `sepl_18.se1`)
+
+Só a longitude (float64) é guardada. A interpolação é um polinômio de
+**Lagrange cúbico de 4 pontos** (amostras i‑1 … i+2), com a longitude
+desenrolada no ±180° para atravessar 0° Áries sem salto; a velocidade
+(°/dia) é a derivada desse polinômio. Não usamos a velocidade do swe como
+derivada (Hermite): perto da conjunção com o Sol ela varia bruscamente.
+
+Layout (diretório `EPHEMERIS_TABLES_PATH`, arquivos abertos com memory‑map):
+
+meta.json        → jd_start, jd_end, passos, corpos, flags
+planets_lon.npy  → float64[dias, 9]
+moon_lon.npy     → float64[horas]
+
+Erro máximo × Swiss Ephemeris
+-----------------------------
+Garantido por `python check_ephemeris.py --validate-tables` (ver
+`MAX_ERROR_ARCSEC` e `MAX_ERROR_NEAR_SUN_ARCSEC`):
+
+• Sol e Lua: < 0,01″.
+• Planetas a mais de 5° do Sol: < 0,05″ (Mercúrio: < 1″).
+• Planetas a menos de 5° do Sol: < 20″ (≈ 0,006°). O swe aplica a
+  deflexão gravitacional da luz pelo Sol, um efeito de poucas horas perto
+  da conjunção que amostras diárias não resolvem.
+
+Tudo bem abaixo do que importa para signos/aspectos (orbes em graus).
+Fora do intervalo, ou sem tabelas, `body_positions` cai no `swe.calc_ut`.
+
+Variáveis de ambiente
+---------------------
+EPHEMERIS_TABLES_PATH → diretório das tabelas (opcional)
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import swisseph as swe
+
+from app.services import ephemeris_executor
+
+logger = logging.getLogger(__name__)
+
+EPHEMERIS_TABLES_PATH = os.getenv("EPHEMERIS_TABLES_PATH")
+
+JD_1800 = 2378496.5   # 1800‑01‑01 00:00 UT
+JD_2400 = 2597641.5   # 2400‑01‑01 00:00 UT
+MOON_STEP = 1.0 / 24.0
+PLANET_STEP = 1.0
+
+PLANETS: Dict[str, int] = {
+    "SUN": swe.SUN,
+    "MERCURY": swe.MERCURY,
+    "VENUS": swe.VENUS,
+    "MARS": swe.MARS,
+    "JUPITER": swe.JUPITER,
+    "SATURN": swe.SATURN,
+    "URANUS": swe.URANUS,
+    "NEPTUNE": swe.NEPTUNE,
+    "PLUTO": swe.PLUTO,
+}
+ALL_BODIES: Dict[str, int] = {"MOON": swe.MOON, **PLANETS}
+
+FLAGS = swe.FLG_SWIEPH | swe.FLG_SPEED
+
+# Limites garantidos pela validação (segundos de arco)
+MAX_ERROR_ARCSEC: Dict[str, float] = {
+    "SUN": 0.01,
+    "MOON": 0.01,
+    "MERCURY": 1.0,
+    "VENUS": 0.05,
+    "MARS": 0.05,
+    "JUPITER": 0.05,
+    "SATURN": 0.05,
+    "URANUS": 0.05,
+    "NEPTUNE": 0.05,
+    "PLUTO": 0.05,
+}
+NEAR_SUN_DEG = 5.0
+MAX_ERROR_NEAR_SUN_ARCSEC = 20.0
+
+
+# ── Construção ────────────────────────────────────────────
+
+def _sample(code: int, jds: np.ndarray) -> np.ndarray:
+    lon = np.empty(len(jds), dtype=np.float64)
+    for i, jd in enumerate(jds):
+        lon[i] = swe.calc_ut(float(jd), code, FLAGS)[0][0]
+    return lon
+
+
+def build_tables(
+    out_dir: str,
+    jd_start: float = JD_1800,
+    jd_end: float = JD_2400,
+    progress=None,
+) -> Dict[str, int]:
+    """Amostra o Swiss Ephemeris e grava as tabelas. Devolve nº de amostras.
+
+    Uma amostra extra em cada ponta dá ao interpolador de 4 pontos
+    vizinhos válidos em todo o intervalo [jd_start, jd_end].
+    """
+    first = jd_start - PLANET_STEP
+    n_days = int(np.ceil((jd_end - jd_start) / PLANET_STEP)) + 3
+    n_hours = int(np.ceil((jd_end - jd_start) / MOON_STEP)) + 3
+    day_jds = first + np.arange(n_days) * PLANET_STEP
+    hour_jds = jd_start - MOON_STEP + np.arange(n_hours) * MOON_STEP
+
+    os.makedirs(out_dir, exist_ok=True)
+    p_lon = np.lib.format.open_memmap(
+        os.path.join(out_dir, "planets_lon.npy"), mode="w+", dtype=np.float64, shape=(n_days, len(PLANETS))
+    )
+    for j, (name, code) in enumerate(PLANETS.items()):
+        p_lon[:, j] = _sample(code, day_jds)
+        if progress:
+            progress(name)
+    p_lon.flush()
+    del p_lon
+
+    np.save(os.path.join(out_dir, "moon_lon.npy"), _sample(swe.MOON, hour_jds))
+    if progress:
+        progress("MOON")
+
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "jd_start": jd_start,
+                "jd_end": float(first + (n_days - 3) * PLANET_STEP),
+                "planet_t0": float(day_jds[0]),
+                "moon_t0": float(hour_jds[0]),
+                "planet_step": PLANET_STEP,
+                "moon_step": MOON_STEP,
+                "planets": list(PLANETS),
+                "flags": FLAGS,
+                "swe_version": swe.version,
+            },
+            f,
+        )
+    return {"planet_samples": n_days * len(PLANETS), "moon_samples": n_hours}
+
+
+# ── Interpolação ──────────────────────────────────────────
+
+def _wrap(delta: np.ndarray) -> np.ndarray:
+    return (delta + 180.0) % 360.0 - 180.0
+
+
+def _lagrange4(lon: np.ndarray, t0: float, step: float, jd: np.ndarray, cols=None):
+    """Lagrange cúbico nos nós i‑1, i, i+1, i+2 em torno de `jd`.
+
+    `lon` tem forma (n,) ou (n, corpos); `cols` escolhe colunas.
+    Devolve (longitude °, velocidade °/dia).
+    """
+    x = (jd - t0) / step
+    i = np.clip(np.floor(x).astype(np.int64), 1, len(lon) - 3)
+    u = x - i
+    if lon.ndim > 1:
+        u = u[:, None]
+
+    pick = (lambda a: a[:, cols]) if cols is not None else (lambda a: a)  # noqa: E731
+    p1 = pick(lon[i])
+    d0 = _wrap(pick(lon[i - 1]) - p1)     # tudo relativo ao nó i (desenrolado)
+    d2 = _wrap(pick(lon[i + 1]) - p1)
+    d3 = _wrap(pick(lon[i + 2]) - p1)
+
+    uu = u * u
+    value = (
+        -u * (u - 1) * (u - 2) / 6 * d0
+        - (u + 1) * u * (u - 2) / 2 * d2
+        + (u + 1) * u * (u - 1) / 6 * d3
+    )
+    deriv = (
+        -(3 * uu - 6 * u + 2) / 6 * d0
+        - (3 * uu - 2 * u - 2) / 2 * d2
+        + (3 * uu - 1) / 6 * d3
+    )
+    return (p1 + value) % 360.0, deriv / step
+
+
+class EphemerisTables:
+    """Tabelas memory‑mapped + interpolação vetorizada."""
+
+    def __init__(self, path: str) -> None:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.jd_start = float(meta["jd_start"])
+        self.jd_end = float(meta["jd_end"])
+        self.planet_t0 = float(meta["planet_t0"])
+        self.moon_t0 = float(meta["moon_t0"])
+        self.planet_step = float(meta["planet_step"])
+        self.moon_step = float(meta["moon_step"])
+        self.planets = list(meta["planets"])
+        self._p_lon = np.load(os.path.join(path, "planets_lon.npy"), mmap_mode="r")
+        self._m_lon = np.load(os.path.join(path, "moon_lon.npy"), mmap_mode="r")
+
+    def covers(self, jd: np.ndarray) -> bool:
+        jd = np.asarray(jd)
+        return bool(jd.size) and float(jd.min()) >= self.jd_start and float(jd.max()) <= self.jd_end
+
+    def positions(self, jd, bodies: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Longitude (°) e velocidade (°/dia): arrays `(len(jd), len(bodies))`."""
+        jd = np.atleast_1d(np.asarray(jd, dtype=np.float64))
+        lon = np.empty((len(jd), len(bodies)))
+        speed = np.empty((len(jd), len(bodies)))
+
+        planet_idx = [j for j, b in enumerate(bodies) if b != "MOON"]
+        if planet_idx:
+            cols = [self.planets.index(bodies[j]) for j in planet_idx]
+            lon[:, planet_idx], speed[:, planet_idx] = _lagrange4(
+                self._p_lon, self.planet_t0, self.planet_step, jd, cols
+            )
+        if "MOON" in bodies:
+            j = list(bodies).index("MOON")
+            lon[:, j], speed[:, j] = _lagrange4(self._m_lon, self.moon_t0, self.moon_step, jd)
+        return lon, speed
+
+
+_TABLES: Optional[EphemerisTables] = None
+_LOADED = False
+_LOCK = threading.Lock()
+
+
+def get_tables() -> Optional[EphemerisTables]:
+    global _TABLES, _LOADED
+    if not _LOADED:
+        with _LOCK:
+            if not _LOADED:
+                if EPHEMERIS_TABLES_PATH:
+                    try:
+                        _TABLES = EphemerisTables(EPHEMERIS_TABLES_PATH)
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.warning("[EPH TABLES] Tabelas indisponíveis em %s: %s", EPHEMERIS_TABLES_PATH, e)
+                _LOADED = True
+    return _TABLES
+
+
+def _swe_positions(jd: np.ndarray, bodies: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    lon = np.empty((len(jd), len(bodies)))
+    speed = np.empty((len(jd), len(bodies)))
+    for j, name in enumerate(bodies):
+        code = ALL_BODIES[name]
+        for i, t in enumerate(jd):
+            xx = swe.calc_ut(float(t), code, FLAGS)[0]
+            lon[i, j], speed[i, j] = xx[0], xx[3]
+    return lon, speed
+
+
+def swe_positions(jd, bodies: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Mesma saída de `EphemerisTables.positions`, direto do Swiss Ephemeris."""
+    jd = np.atleast_1d(np.asarray(jd, dtype=np.float64))
+    return ephemeris_executor.run(_swe_positions, jd, list(bodies))
+
+
+def body_positions(jd, bodies: Sequence[str], fast: Optional[bool] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Posições vetorizadas: tabelas quando disponíveis/cobertas, senão swe.
+
+    `fast=False` força o Swiss Ephemeris; `fast=True` exige as tabelas.
+    """
+    tables = get_tables() if fast is not False else None
+    if tables is not None and tables.covers(jd):
+        return tables.positions(jd, bodies)
+    if fast:
+        raise RuntimeError("Tabelas de efemérides indisponíveis para o intervalo pedido.")
+    return swe_positions(jd, bodies)
@@ -0,0 +1,358 @@
+# app/services/gazetteer_service.py
+"""
+Geocodificador offline (gazetteer) para Sky.AI
+==============================================
+
+Resolve cidade+país → lat/lon sem rede, a partir de um dump no formato
+**GeoNames** (`cities500.txt`, `cities1000.txt`, `allCountries.txt` …),
+convertido uma única vez por `build_gazetteer.py` num índice compacto.
+
+Layout do índice (diretório `GAZETTEER_PATH`)
+---------------------------------------------
+keys.bin        → chaves "cc\\tnome" normalizadas, concatenadas (UTF‑8) e ordenadas
+offsets.npy     → uint32[N+1]  início de cada chave em `keys.bin`
+by_name.npy     → uint32[N]    permutação ordenada só pelo nome (busca sem país)
+lat.npy/lon.npy → float32[N]
+population.npy  → uint32[N]
+countries.json  → nome/ISO2/ISO3 normalizado → ISO2
+
+Tudo é aberto com *memory‑map*: os workers forkados compartilham as mesmas
+páginas do page cache e o carregamento é instantâneo.
+
+A ordenação das chaves é um **trie implícito**: todas as chaves com um
+mesmo prefixo formam um intervalo contíguo, localizado por busca binária.
+Isso dá busca exata, autocompletar por prefixo e busca aproximada
+(Levenshtein limitado, com poda por prefixo) sem estruturas extras.
+
+Variáveis de ambiente
+---------------------
+GAZETTEER_PATH  → diretório do índice; sem ele o geocodificador offline fica desligado
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import mmap
+import os
+import sys
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.services.geocoding_service import GeocodeNotFoundError, fold_text
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH")
+
+_SEP = b"\t"
+
+# Colunas do dump GeoNames (tab‑separated, sem cabeçalho)
+_GN_NAME, _GN_ASCII, _GN_ALT, _GN_LAT, _GN_LON = 1, 2, 3, 4, 5
+_GN_COUNTRY, _GN_POPULATION = 8, 14
+
+
+class Place(NamedTuple):
+    name: str
+    country_code: str
+    lat: float
+    lon: float
+    population: int
+    distance: int = 0   # distância de edição (0 = correspondência exata)
+
+
+def _max_edits(name: str) -> int:
+    """Tolerância a erros de digitação conforme o tamanho do nome."""
+    n = len(name)
+    return 0 if n <= 3 else 1 if n <= 7 else 2
+
+
+# ── Construção do índice ──────────────────────────────────
+
+def _read_country_info(path: str) -> Dict[str, str]:
+    """Lê `countryInfo.txt` do GeoNames → {nome/ISO2/ISO3 normalizado: ISO2}."""
+    aliases: Dict[str, str] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 5 or not cols[0]:
+                continue
+            iso2, iso3, name = cols[0], cols[1], cols[4]
+            for alias in (iso2, iso3, name):
+                if alias:
+                    aliases[fold_text(alias)] = iso2.upper()
+    return aliases
+
+
+def build_index(
+    dump_path: str,
+    out_dir: str,
+    country_info: Optional[str] = None,
+    min_population: int = 0,
+    alternates: bool = False,
+) -> int:
+    """Converte um dump GeoNames no índice memory‑mapped. Devolve nº de chaves.
+
+    Para chaves repetidas (ex.: vários "San Jose" nos EUA) fica a de maior
+    população — é a que o usuário quase sempre quis dizer.
+    """
+    csv.field_size_limit(sys.maxsize)
+    best: Dict[bytes, Tuple[int, float, float]] = {}
+
+    with open(dump_path, encoding="utf-8", newline="") as f:
+        for cols in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if len(cols) <= _GN_POPULATION:
+                continue
+            population = int(cols[_GN_POPULATION] or 0)
+            if population < min_population:
+                continue
+            cc = cols[_GN_COUNTRY].upper()
+            lat, lon = float(cols[_GN_LAT]), float(cols[_GN_LON])
+
+            names = {cols[_GN_NAME], cols[_GN_ASCII]}
+            if alternates and cols[_GN_ALT]:
+                names.update(cols[_GN_ALT].split(","))
+
+            for name in names:
+                folded = fold_text(name)
+                if not folded:
+                    continue
+                key = cc.encode() + _SEP + folded.encode("utf-8")
+                prev = best.get(key)
+                if prev is None or population > prev[0]:
+                    best[key] = (population, lat, lon)
+
+    keys = sorted(best)
+    lengths = np.fromiter((len(k) for k in keys), dtype=np.uint64, count=len(keys))
+    offsets = np.zeros(len(keys) + 1, dtype=np.uint64)
+    np.cumsum(lengths, out=offsets[1:])
+    if offsets[-1] > np.iinfo(np.uint32).max:
+        raise ValueError("Dump grande demais para offsets de 32 bits.")
+
+    names_only = [k.split(_SEP, 1)[1] for k in keys]
+    by_name = np.array(sorted(range(len(keys)), key=names_only.__getitem__), dtype=np.uint32)
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "keys.bin"), "wb") as f:
+        for k in keys:
+            f.write(k)
+    np.save(os.path.join(out_dir, "offsets.npy"), offsets.astype(np.uint32))
+    np.save(os.path.join(out_dir, "by_name.npy"), by_name)
+    np.save(os.path.join(out_dir, "lat.npy"), np.array([best[k][1] for k in keys], dtype=np.float32))
+    np.save(os.path.join(out_dir, "lon.npy"), np.array([best[k][2] for k in keys], dtype=np.float32))
+    np.save(
+        os.path.join(out_dir, "population.npy"),
+        np.array([min(best[k][0], 2**32 - 1) for k in keys], dtype=np.uint32),
+    )
+
+    countries = _read_country_info(country_info) if country_info else {}
+    for k in keys:
+        cc = k.split(_SEP, 1)[0].decode()
+        countries.setdefault(fold_text(cc), cc)
+    with open(os.path.join(out_dir, "countries.json"), "w", encoding="utf-8") as f:
+        json.dump(countries, f, ensure_ascii=False, sort_keys=True)
+
+    return len(keys)
+
+
+# ── Índice em tempo de execução ───────────────────────────
+
+class Gazetteer:
+    """Índice memory‑mapped com busca exata, por prefixo e aproximada."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(os.path.join(path, "keys.bin"), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._keys = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) if size else b""
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode="r")  # noqa: E731
+        self._offsets = load("offsets.npy")
+        self._by_name = load("by_name.npy")
+        self._lat = load("lat.npy")
+        self._lon = load("lon.npy")
+        self._population = load("population.npy")
+        with open(os.path.join(path, "countries.json"), encoding="utf-8") as f:
+            self._countries: Dict[str, str] = json.load(f)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    # ── primitivas ──
+    def _key(self, i: int) -> bytes:
+        return self._keys[int(self._offsets[i]) : int(self._offsets[i + 1])]
+
+    def _name(self, i: int) -> bytes:
+        return self._key(i).split(_SEP, 1)[1]
+
+    def _lower_bound(self, target: bytes, lo: int = 0, hi: Optional[int] = None, key=None) -> int:
+        key = key or self._key
+        hi = len(self) if hi is None else hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _prefix_range(self, prefix: bytes, lo: int = 0, hi: Optional[int] = None, key=None) -> Tuple[int, int]:
+        """Intervalo [a, b) das chaves que começam com `prefix` (nó do trie)."""
+        start = self._lower_bound(prefix, lo, hi, key)
+        end = self._lower_bound(prefix + b"\xff", start, hi, key)
+        return start, end
+
+    def _place(self, i: int, distance: int = 0) -> Place:
+        cc, name = self._key(i).split(_SEP, 1)
+        return Place(
+            name=name.decode("utf-8"),
+            country_code=cc.decode(),
+            lat=round(float(self._lat[i]), 5),
+            lon=round(float(self._lon[i]), 5),
+            population=int(self._population[i]),
+            distance=distance,
+        )
+
+    def _most_populous(self, indices: Iterable[int]) -> Optional[int]:
+        best, best_pop = None, -1
+        for i in indices:
+            pop = int(self._population[i])
+            if pop > best_pop:
+                best, best_pop = i, pop
+        return best
+
+    def country_code(self, country: str) -> Optional[str]:
+        return self._countries.get(fold_text(country))
+
+    # ── buscas ──
+    def lookup(self, city: str, country: str = "", fuzzy: bool = True) -> Optional[Place]:
+        """Melhor correspondência para cidade+país (país opcional/desconhecido)."""
+        name = fold_text(city).encode("utf-8")
+        if not name:
+            return None
+        cc = self.country_code(country) if country else None
+
+        if cc:
+            target = cc.encode() + _SEP + name
+            i = self._lower_bound(target)
+            if i < len(self) and self._key(i) == target:
+                return self._place(i)
+        else:
+            # País não reconhecido: procura o nome em todos os países
+            by_name = lambda j: self._name(int(self._by_name[j]))  # noqa: E731
+            a = b = self._lower_bound(name, key=by_name)
+            while b < len(self) and by_name(b) == name:
+                b += 1
+            best = self._most_populous(int(self._by_name[j]) for j in range(a, b))
+            if best is not None:
+                return self._place(best)
+
+        if not fuzzy:
+            return None
+        matches = self.fuzzy(city, country, limit=1)
+        return matches[0] if matches else None
+
+    def complete(self, prefix: str, country: str = "", limit: int = 10) -> List[Place]:
+        """Autocompletar: cidades que começam com `prefix`, por população."""
+        cc = self.country_code(country) if country else None
+        if not cc:
+            return []
+        a, b = self._prefix_range(cc.encode() + _SEP + fold_text(prefix).encode("utf-8"))
+        order = sorted(range(a, b), key=lambda i: -int(self._population[i]))
+        return [self._place(i) for i in order[:limit]]
+
+    def fuzzy(
+        self,
+        city: str,
+        country: str = "",
+        max_edits: Optional[int] = None,
+        limit: int = 5,
+    ) -> List[Place]:
+        """Busca aproximada (Levenshtein) percorrendo o trie implícito.
+
+        Cada nó do trie é um intervalo de chaves com prefixo comum; um ramo é
+        podado assim que a menor distância possível excede `max_edits`.
+        Restrito ao país quando ele é reconhecido.
+        """
+        query = fold_text(city).encode("utf-8")
+        if not query:
+            return []
+        max_edits = _max_edits(fold_text(city)) if max_edits is None else max_edits
+        if max_edits <= 0:
+            return []
+
+        cc = self.country_code(country) if country else None
+        if cc:
+            lo, hi = self._prefix_range(cc.encode() + _SEP)
+            roots = [(lo, hi, len(cc) + 1)]
+        else:
+            roots, pos = [], 0
+            while pos < len(self):
+                head = self._key(pos).split(_SEP, 1)[0] + _SEP
+                _, end = self._prefix_range(head, pos)
+                roots.append((pos, end, len(head)))
+                pos = end
+
+        found: List[Tuple[int, int]] = []   # (distância, índice)
+        first_row = list(range(len(query) + 1))
+        for lo, hi, depth in roots:
+            self._walk(query, lo, hi, depth, first_row, max_edits, found)
+
+        found.sort(key=lambda t: (t[0], -int(self._population[t[1]])))
+        return [self._place(i, d) for d, i in found[:limit]]
+
+    def _walk(self, query: bytes, lo: int, hi: int, depth: int, row: List[int],
+              max_edits: int, found: List[Tuple[int, int]]) -> None:
+        pos = lo
+        while pos < hi:
+            key = self._key(pos)
+            if len(key) == depth:          # chave termina neste nó
+                if row[-1] <= max_edits:
+                    found.append((row[-1], pos))
+                pos += 1
+                continue
+
+            byte = key[depth]
+            _, end = self._prefix_range(key[: depth + 1], pos, hi)
+
+            new_row = [row[0] + 1]
+            for j in range(1, len(query) + 1):
+                cost = 0 if query[j - 1] == byte else 1
+                new_row.append(min(new_row[j - 1] + 1, row[j] + 1, row[j - 1] + cost))
+            if min(new_row) <= max_edits:
+                self._walk(query, pos, end, depth + 1, new_row, max_edits, found)
+            pos = end
+
+    # ── resolver compatível com `astrology_service.get_coordinates` ──
+    def get_coordinates(self, city: str, country: str, fuzzy: bool = True) -> Dict[str, float]:
+        place = self.lookup(city, country, fuzzy=fuzzy)
+        if place is None:
+            raise GeocodeNotFoundError(
+                f"Sem resultados no gazetteer para '{city.strip()}, {country.strip()}'."
+            )
+        return {"lat": place.lat, "lon": place.lon}
+
+
+_GAZETTEER: Optional[Gazetteer] = None
+_LOADED = False
+_LOCK = threading.Lock()
+
+
+def get_gazetteer() -> Optional[Gazetteer]:
+    """Índice global (carregado uma vez por processo) ou `None` se desligado."""
+    global _GAZETTEER, _LOADED
+    if _LOADED:
+        return _GAZETTEER
+    with _LOCK:
+        if not _LOADED:
+            if GAZETTEER_PATH:
+                try:
+                    _GAZETTEER = Gazetteer(GAZETTEER_PATH)
+                except (OSError, ValueError) as e:
+                    logger.warning("[GAZETTEER] Índice indisponível em %s: %s", GAZETTEER_PATH, e)
+            _LOADED = True
+    return _GAZETTEER
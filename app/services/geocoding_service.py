@@ -0,0 +1,240 @@
+# app/services/geocoding_service.py
+"""
+Cache de geocodificação para Sky.AI
+===================================
+
+Fica na frente do OpenCage (`astrology_service.geocode_opencage`) com dois
+níveis:
+
+1. **LRU em memória** — por worker, sem I/O.
+2. **Tabela `geocode_cache`** — compartilhada entre workers/deploys,
+   chaveada por cidade+país normalizados (sem acentos, sem caixa).
+
+Resultados "sem resultados" também são guardados (*negative caching*) com
+TTL menor, para não repetir a chamada a cada tentativa do usuário.
+Erros HTTP/timeout **não** são cacheados.
+
+O nível de banco só é usado dentro de um *app context* do Flask; fora dele
+(CLI `astrology_service`, scripts) o cache fica só em memória.
+
+Variáveis de ambiente
+---------------------
+GEOCODE_CACHE_TTL_DAYS      → validade de um resultado positivo (padrão 180)
+GEOCODE_NEGATIVE_TTL_HOURS  → validade de um "sem resultados" (padrão 24)
+GEOCODE_LRU_SIZE            → entradas no LRU em memória (padrão 4096)
+GEOCODE_DB_CACHE            → "0" desliga o nível de banco
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from app.services.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+GEOCODE_TTL = timedelta(days=float(os.getenv("GEOCODE_CACHE_TTL_DAYS", "180")))
+GEOCODE_NEGATIVE_TTL = timedelta(hours=float(os.getenv("GEOCODE_NEGATIVE_TTL_HOURS", "24")))
+GEOCODE_LRU_SIZE = int(os.getenv("GEOCODE_LRU_SIZE", "4096"))
+GEOCODE_DB_CACHE = os.getenv("GEOCODE_DB_CACHE", "1") != "0"
+
+Fetcher = Callable[[str, str], Dict[str, float]]
+
+# Valor guardado no cache: (lat, lon) ou `None` para "sem resultados"
+_Entry = Optional[Tuple[float, float]]
+
+_LRU = LRUCache(maxsize=GEOCODE_LRU_SIZE)
+_MISS = object()
+
+
+class GeocodeNotFoundError(ValueError):
+    """O geocodificador respondeu, mas não encontrou a cidade."""
+
+
+# ── Normalização da chave ─────────────────────────────────
+
+_PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def fold_text(text: str) -> str:
+    """Remove acentos/pontuação, ignora caixa e colapsa espaços."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _PUNCT_RE.sub(" ", text.casefold())
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def place_key(city: str, country: str) -> str:
+    """Chave canônica: `"sao paulo|brasil"` para "São Paulo", "BRASIL"."""
+    return f"{fold_text(city)}|{fold_text(country)}"
+
+
+# ── Nível de banco ────────────────────────────────────────
+
+def _db_enabled() -> bool:
+    if not GEOCODE_DB_CACHE:
+        return False
+    from flask import has_app_context
+
+    return has_app_context()
+
+
+def _db_get(key: str) -> object:
+    """Lê a tabela; devolve `_MISS` se ausente/expirado ou em caso de erro."""
+    from sqlalchemy import select
+    from app.main import db
+    from app.models import GeocodeCache
+
+    table = GeocodeCache.__table__
+    try:
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                select(table.c.lat, table.c.lon, table.c.found, table.c.updated_at)
+                .where(table.c.place_key == key)
+            ).first()
+    except Exception as e:  # cache nunca deve derrubar o cálculo
+        logger.warning("[GEOCACHE] Falha ao ler cache (%s): %s", key, e)
+        return _MISS
+
+    if row is None:
+        return _MISS
+    ttl = GEOCODE_TTL if row.found else GEOCODE_NEGATIVE_TTL
+    if row.updated_at + ttl <= datetime.utcnow():
+        return _MISS
+    return (row.lat, row.lon) if row.found else None
+
+
+def _db_put(key: str, city: str, country: str, entry: _Entry) -> None:
+    from sqlalchemy import insert, update
+    from sqlalchemy.exc import IntegrityError
+    from app.main import db
+    from app.models import GeocodeCache
+
+    table = GeocodeCache.__table__
+    values = {
+        "city": city.strip()[:100],
+        "country": country.strip()[:100],
+        "lat": entry[0] if entry else None,
+        "lon": entry[1] if entry else None,
+        "found": entry is not None,
+        "updated_at": datetime.utcnow(),
+    }
+    try:
+        # Conexão própria: não interfere na `db.session` da requisição.
+        with db.engine.begin() as conn:
+            res = conn.execute(update(table).where(table.c.place_key == key).values(**values))
+            if res.rowcount == 0:
+                conn.execute(insert(table).values(place_key=key, **values))
+    except IntegrityError:
+        pass  # outro worker gravou a mesma chave ao mesmo tempo
+    except Exception as e:
+        logger.warning("[GEOCACHE] Falha ao gravar cache (%s): %s", key, e)
+
+
+# ── API pública ───────────────────────────────────────────
+
+def _remember(key: str, entry: _Entry, ttl: timedelta) -> None:
+    _LRU.set(key, entry, ttl=ttl.total_seconds())
+
+
+def _as_result(entry: _Entry, city: str, country: str) -> Dict[str, float]:
+    if entry is None:
+        raise GeocodeNotFoundError(
+            f"Sem resultados de geocodificação para '{city.strip()}, {country.strip()}'."
+        )
+    return {"lat": entry[0], "lon": entry[1]}
+
+
+def lookup_cached(city: str, country: str) -> object:
+    """Consulta só os caches. Devolve `(lat, lon)`, `None` (negativo) ou `_MISS`."""
+    key = place_key(city, country)
+    entry = _LRU.get(key, _MISS)
+    if entry is not _MISS:
+        return entry
+
+    if _db_enabled():
+        entry = _db_get(key)
+        if entry is not _MISS:
+            _remember(key, entry, GEOCODE_TTL if entry else GEOCODE_NEGATIVE_TTL)
+            return entry
+    return _MISS
+
+
+def store(city: str, country: str, entry: _Entry) -> None:
+    """Grava um resultado (ou `None` = sem resultados) nos dois níveis."""
+    key = place_key(city, country)
+    _remember(key, entry, GEOCODE_TTL if entry else GEOCODE_NEGATIVE_TTL)
+    if _db_enabled():
+        _db_put(key, city, country, entry)
+
+
+def cached_coordinates(city: str, country: str, fetch: Fetcher) -> Dict[str, float]:
+    """Resolve coordenadas passando pelo LRU → banco → `fetch`.
+
+    `fetch` deve lançar `GeocodeNotFoundError` quando não houver resultados;
+    qualquer outra exceção é propagada sem ser cacheada.
+    """
+    entry = lookup_cached(city, country)
+    if entry is not _MISS:
+        return _as_result(entry, city, country)
+
+    try:
+        coords = fetch(city, country)
+    except GeocodeNotFoundError:
+        store(city, country, None)
+        raise
+
+    entry = (float(coords["lat"]), float(coords["lon"]))
+    store(city, country, entry)
+    return _as_result(entry, city, country)
+
+
+def clear_memory_cache() -> None:
+    _LRU.clear()
+
+
+def warm_cache(
+    pairs: Iterable[Tuple[str, str]],
+    fetch: Fetcher,
+    delay: float = 0.0,
+) -> Dict[str, int]:
+    """Pré‑aquece o cache com pares (cidade, país); ignora chaves já válidas.
+
+    `delay` (segundos) entre chamadas externas respeita o rate‑limit do
+    provedor. Devolve contadores por desfecho.
+    """
+    stats = {"seen": 0, "cached": 0, "fetched": 0, "not_found": 0, "errors": 0}
+    done = set()
+
+    for city, country in pairs:
+        if not city or not country:
+            continue
+        key = place_key(city, country)
+        if key in done:
+            continue
+        done.add(key)
+        stats["seen"] += 1
+
+        if lookup_cached(city, country) is not _MISS:
+            stats["cached"] += 1
+            continue
+
+        try:
+            cached_coordinates(city, country, fetch)
+            stats["fetched"] += 1
+        except GeocodeNotFoundError:
+            stats["not_found"] += 1
+        except Exception as e:
+            stats["errors"] += 1
+            logger.warning("[GEOCACHE] Falha ao aquecer '%s, %s': %s", city, country, e)
+        if delay:
+            time.sleep(delay)
+
+    return stats
@@ -0,0 +1,269 @@
+# app/services/http_client.py
+"""
+Cliente HTTP de saída para Sky.AI
+=================================
+
+Chamadas a APIs externas (hoje: OpenCage) passam por aqui em vez de um
+`requests.get` solto:
+
+• **pool keep‑alive por host** — uma `requests.Session` por serviço, com
+  `HTTP_POOL_SIZE` conexões reaproveitadas (sem novo handshake TLS a cada
+  chamada); recriada depois de um `fork`;
+• **query codificada** — parâmetros vão em `params=` (acentos, `&`, `#`…);
+• **timeouts separados** — `(conexão, leitura)`;
+• **retries com jitter** — só em erros transitórios (conexão, timeout,
+  429, 5xx), com backoff exponencial *full jitter* e respeitando
+  `Retry-After`;
+• **circuit breaker** — depois de `HTTP_BREAKER_FAILURES` falhas seguidas o
+  circuito abre e as chamadas falham na hora (`CircuitOpenError`) por
+  `HTTP_BREAKER_COOLDOWN` segundos; depois disso uma única chamada de teste
+  decide se fecha de novo. Um OpenCage degradado deixa de prender os
+  workers do gunicorn em timeouts.
+
+Respostas 4xx (exceto 429) não são repetidas nem contam como falha do
+serviço; viram `UpstreamError` com o `status`.
+
+Para testes locais, `benchmarks/opencage_stub.py` sobe um servidor que
+imita o OpenCage (latência, erros e 429 configuráveis).
+
+Variáveis de ambiente
+---------------------
+HTTP_CONNECT_TIMEOUT    → segundos para conectar (padrão 3.05)
+HTTP_READ_TIMEOUT       → segundos para ler a resposta (padrão 10)
+HTTP_MAX_RETRIES        → novas tentativas após a primeira (padrão 2)
+HTTP_BACKOFF            → base do backoff em segundos (padrão 0.5)
+HTTP_BACKOFF_MAX        → teto de cada espera, inclusive `Retry-After` (padrão 4)
+HTTP_POOL_SIZE          → conexões keep‑alive por host (padrão 10)
+HTTP_BREAKER_FAILURES   → falhas seguidas que abrem o circuito (padrão 5)
+HTTP_BREAKER_COOLDOWN   → segundos com o circuito aberto (padrão 30)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "4"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+HTTP_BREAKER_FAILURES = int(os.getenv("HTTP_BREAKER_FAILURES", "5"))
+HTTP_BREAKER_COOLDOWN = float(os.getenv("HTTP_BREAKER_COOLDOWN", "30"))
+
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+USER_AGENT = "SkyAI/1.0"
+
+
+class UpstreamError(RuntimeError):
+    """Falha ao falar com um serviço externo (depois dos retries)."""
+
+    def __init__(self, message: str, status: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(UpstreamError):
+    """Circuito aberto: o serviço está degradado, a chamada nem foi feita."""
+
+
+# ── Circuit breaker ───────────────────────────────────────
+
+class CircuitBreaker:
+    """closed → (N falhas seguidas) → open → (cooldown) → half‑open → closed/open."""
+
+    def __init__(self, failures: int, cooldown: float) -> None:
+        self.failures = max(1, failures)
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        """Pode chamar? No half‑open só a primeira thread passa (chamada de teste)."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+
+    def failure(self) -> bool:
+        """Registra uma falha; devolve `True` se o circuito abriu agora."""
+        with self._lock:
+            self._consecutive += 1
+            reopened = self._probing
+            self._probing = False
+            if reopened or (self._opened_at is None and self._consecutive >= self.failures):
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+
+# ── Cliente ───────────────────────────────────────────────
+
+class HttpClient:
+    """Session com pool, timeouts, retries com jitter e circuit breaker."""
+
+    def __init__(
+        self,
+        name: str,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = HTTP_READ_TIMEOUT,
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff: float = HTTP_BACKOFF,
+        backoff_max: float = HTTP_BACKOFF_MAX,
+        pool_size: int = HTTP_POOL_SIZE,
+        breaker_failures: int = HTTP_BREAKER_FAILURES,
+        breaker_cooldown: float = HTTP_BREAKER_COOLDOWN,
+    ) -> None:
+        self.name = name
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.breaker = CircuitBreaker(breaker_failures, breaker_cooldown)
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._pid = 0
+        self._stats: Dict[str, int] = {
+            "requests": 0,
+            "attempts": 0,
+            "retries": 0,
+            "failures": 0,
+            "short_circuited": 0,
+            "circuit_opened": 0,
+        }
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None or self._pid != os.getpid():   # após fork: sockets do pai
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    s = requests.Session()
+                    # Sem retries do urllib3: quem decide é `request` (jitter + breaker)
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=0)
+                    s.mount("https://", adapter)
+                    s.mount("http://", adapter)
+                    s.headers["User-Agent"] = USER_AGENT
+                    self._session, self._pid = s, os.getpid()
+        return self._session
+
+    def _sleep_before_retry(self, attempt: int, resp: Optional[requests.Response]) -> None:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))   # full jitter
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, min(self.backoff_max, float(retry_after)))
+            except ValueError:
+                pass   # formato de data HTTP: fica o jitter
+        time.sleep(delay)
+
+    def request(self, method: str, url: str, params: Optional[Mapping[str, object]] = None, **kwargs) -> requests.Response:
+        """Faz a chamada com retries; devolve a resposta 2xx/3xx.
+
+        Lança `CircuitOpenError` (sem chamar), ou `UpstreamError` com o
+        `status` da última resposta (None em erro de rede/timeout).
+        """
+        self._count("requests")
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise CircuitOpenError(f"{self.name}: circuito aberto (serviço degradado).")
+
+        kwargs.setdefault("timeout", self.timeout)
+        error: Optional[UpstreamError] = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("retries")
+            self._count("attempts")
+            resp = None
+            try:
+                resp = self.session.request(method, url, params=params, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = UpstreamError(f"{self.name}: {type(e).__name__}: {e}")
+            except requests.RequestException as e:   # URL inválida etc.: não é culpa do serviço
+                self.breaker.success()
+                raise UpstreamError(f"{self.name}: {type(e).__name__}: {e}") from e
+            else:
+                if resp.status_code < 400:
+                    self.breaker.success()
+                    return resp
+                error = UpstreamError(f"{self.name}: HTTP {resp.status_code}", status=resp.status_code)
+                if resp.status_code not in RETRY_STATUS:
+                    self.breaker.success()   # o serviço respondeu; o erro é da chamada
+                    raise error
+            if attempt < self.max_retries:
+                self._sleep_before_retry(attempt, resp)
+
+        self._count("failures")
+        if self.breaker.failure():
+            self._count("circuit_opened")
+            logger.warning("[HTTP] %s: circuito aberto por %.0fs após falhas seguidas", self.name, self.breaker.cooldown)
+        assert error is not None
+        raise error
+
+    def get_json(self, url: str, params: Optional[Mapping[str, object]] = None, **kwargs) -> object:
+        resp = self.request("GET", url, params=params, **kwargs)
+        try:
+            return resp.json()
+        except ValueError as e:
+            raise UpstreamError(f"{self.name}: resposta não é JSON ({e})", status=resp.status_code) from e
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            out: Dict[str, object] = dict(self._stats)
+        out["circuit"] = self.breaker.state
+        return out
+
+
+# ── Registro por serviço ──────────────────────────────────
+
+_CLIENTS: Dict[str, HttpClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(name: str, **kwargs) -> HttpClient:
+    """Cliente compartilhado do serviço `name` (criado na primeira chamada)."""
+    client = _CLIENTS.get(name)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(name)
+            if client is None:
+                client = _CLIENTS[name] = HttpClient(name, **kwargs)
+    return client
+
+
+def stats() -> Dict[str, Dict[str, object]]:
+    return {name: client.stats() for name, client in list(_CLIENTS.items())}
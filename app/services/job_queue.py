@@ -0,0 +1,396 @@
+# app/services/job_queue.py
+"""
+Fila de jobs persistente (tabela `report_jobs`) para Sky.AI
+===========================================================
+
+A geração do relatório saiu do `threading.Thread` dentro do worker do
+gunicorn: se o processo fosse reciclado (timeout de 120 s, deploy, OOM) o
+job sumia e a sessão ficava com `ai_result = NULL` para sempre. Agora o
+job é uma linha no banco, gravada na **mesma transação** da `TestSession`,
+e quem executa é um processo à parte (`python worker.py`, linha `worker:`
+do Procfile), que escala independente dos web workers e entre máquinas.
+
+Ciclo de vida
+-------------
+    queued ──claim──▶ running ──ok──▶ done
+       ▲                 │ erro / lease vencido
+       └──backoff────────┤
+                         └── tentativas esgotadas ──▶ dead (dead‑letter)
+
+• **claim**: `SELECT … FOR UPDATE SKIP LOCKED` (PostgreSQL) pega até N jobs
+  prontos sem disputar linha com outros workers; o `UPDATE` seguinte ainda
+  confere o status, então no SQLite (sem SKIP LOCKED) dois workers também
+  nunca pegam o mesmo job. Cada claim conta uma tentativa.
+• **lease + heartbeat**: o job fica do worker até `lease_until`; enquanto
+  roda, o worker renova o lease a cada `JOB_LEASE_SECONDS / 3`. Worker
+  morto → o lease vence e outro worker retoma o job.
+• **retry**: erro → volta para `queued` com `run_after` = agora + backoff
+  exponencial com jitter (`JOB_BACKOFF_BASE · 2^(tentativa‑1)`, até
+  `JOB_BACKOFF_MAX`).
+• **dead‑letter**: depois de `JOB_MAX_ATTEMPTS` tentativas o job vira
+  `dead` com o último erro; `python worker.py --requeue-dead` devolve à fila.
+• **progresso**: enquanto roda, o handler pode gravar o texto já gerado
+  (`progress`) em `partial_text`; o SSE do relatório lê com
+  `progress_for_session` e repassa ao navegador. Some no fim do job e a
+  cada nova tentativa.
+
+Handlers são registrados por tipo (`register("report", fn)`); `fn(session_id)`
+roda dentro de um app context e sinaliza falha levantando exceção.
+
+Variáveis de ambiente
+---------------------
+JOB_CONCURRENCY    → jobs simultâneos por processo worker (padrão 2)
+JOB_LEASE_SECONDS  → duração do lease (padrão 120)
+JOB_MAX_ATTEMPTS   → tentativas antes do dead‑letter (padrão 5)
+JOB_BACKOFF_BASE   → segundos de espera após a 1ª falha (padrão 30)
+JOB_BACKOFF_MAX    → teto do backoff em segundos (padrão 3600)
+JOB_POLL_SECONDS   → intervalo de polling com a fila vazia (padrão 2)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_CONCURRENCY = max(1, int(os.getenv("JOB_CONCURRENCY", "2")))
+JOB_LEASE_SECONDS = max(10, int(os.getenv("JOB_LEASE_SECONDS", "120")))
+JOB_MAX_ATTEMPTS = max(1, int(os.getenv("JOB_MAX_ATTEMPTS", "5")))
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", "30"))
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "3600"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+
+QUEUED, RUNNING, DONE, DEAD = "queued", "running", "done", "dead"
+
+Handler = Callable[[int], None]
+_HANDLERS: Dict[str, Handler] = {}
+
+
+def register(kind: str, handler: Handler) -> None:
+    """Associa o tipo de job à função que o executa (`handler(session_id)`)."""
+    _HANDLERS[kind] = handler
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Espera antes da próxima tentativa (exponencial, com jitter de ±20%)."""
+    delay = min(JOB_BACKOFF_MAX, JOB_BACKOFF_BASE * 2 ** max(0, attempt - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _table():
+    from app.models import ReportJob
+
+    return ReportJob.__table__
+
+
+# ── Produtor ──────────────────────────────────────────────
+
+def enqueue(session_id: int, kind: str = "report", use_cache: bool = True):
+    """Adiciona o job à `db.session` atual — o commit fica com o chamador.
+
+    Idempotente: se a sessão já tem job desse tipo ainda vivo, devolve‑o.
+    `use_cache=False` pede resposta nova do LLM (ignora o `llm_cache`).
+    """
+    from app.main import db
+    from app.models import ReportJob
+
+    job = ReportJob.query.filter(
+        ReportJob.session_id == session_id, ReportJob.kind == kind, ReportJob.status != DEAD
+    ).first()
+    if job is None:
+        job = ReportJob(session_id=session_id, kind=kind, max_attempts=JOB_MAX_ATTEMPTS, use_cache=use_cache)
+        db.session.add(job)
+    return job
+
+
+def job_for_session(session_id: int, kind: str = "report"):
+    """Job mais recente da sessão (ou None)."""
+    from app.models import ReportJob
+
+    return (
+        ReportJob.query.filter_by(session_id=session_id, kind=kind)
+        .order_by(ReportJob.id.desc())
+        .first()
+    )
+
+
+def progress_for_session(session_id: int, kind: str = "report") -> Optional[Dict[str, object]]:
+    """Status e texto parcial do job mais recente da sessão (Core: sempre fresco)."""
+    from sqlalchemy import select
+    from app.main import db
+
+    t = _table()
+    with db.engine.connect() as conn:
+        row = conn.execute(
+            select(t.c.status, t.c.attempts, t.c.partial_text)
+            .where(t.c.session_id == session_id, t.c.kind == kind)
+            .order_by(t.c.id.desc())
+            .limit(1)
+        ).first()
+    if row is None:
+        return None
+    return {"status": row.status, "attempts": row.attempts, "text": row.partial_text or ""}
+
+
+# ── Transições (Core, transações curtas) ─────────────────
+
+def claim(worker_id: str, limit: int) -> List[Dict[str, object]]:
+    """Pega até `limit` jobs prontos (fila ou lease vencido) para `worker_id`."""
+    from sqlalchemy import and_, or_, select, update
+    from app.main import db
+
+    t = _table()
+    now = datetime.utcnow()
+    ready = or_(
+        and_(t.c.status == QUEUED, t.c.run_after <= now),
+        and_(t.c.status == RUNNING, t.c.lease_until < now),
+    )
+    claimed = []
+    with db.engine.begin() as conn:
+        rows = conn.execute(
+            select(t.c.id, t.c.session_id, t.c.kind, t.c.attempts, t.c.max_attempts, t.c.status)
+            .where(ready)
+            .order_by(t.c.run_after, t.c.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).fetchall()
+        for r in rows:
+            if r.status == RUNNING and r.attempts >= r.max_attempts:
+                # Morreu com o worker em todas as tentativas: não insiste
+                conn.execute(
+                    update(t)
+                    .where(t.c.id == r.id, ready)
+                    .values(status=DEAD, locked_by=None, lease_until=None, finished_at=now,
+                            last_error="Lease vencido na última tentativa (worker reciclado?)")
+                )
+                logger.error("[JOBS] Job %s (sessão %s) → dead: lease vencido", r.id, r.session_id)
+                continue
+            done = conn.execute(
+                update(t)
+                .where(t.c.id == r.id, ready)
+                .values(
+                    status=RUNNING,
+                    attempts=t.c.attempts + 1,
+                    locked_by=worker_id,
+                    lease_until=now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    heartbeat_at=now,
+                    started_at=now,
+                    partial_text=None,
+                )
+            )
+            if done.rowcount == 1:
+                claimed.append({"id": r.id, "session_id": r.session_id, "kind": r.kind, "attempt": r.attempts + 1})
+    return claimed
+
+
+def heartbeat(job_ids: List[int], worker_id: str) -> int:
+    """Renova o lease dos jobs ainda nossos; devolve quantos foram renovados."""
+    if not job_ids:
+        return 0
+    from sqlalchemy import update
+    from app.main import db
+
+    t = _table()
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        res = conn.execute(
+            update(t)
+            .where(t.c.id.in_(job_ids), t.c.locked_by == worker_id, t.c.status == RUNNING)
+            .values(lease_until=now + timedelta(seconds=JOB_LEASE_SECONDS), heartbeat_at=now)
+        )
+    return res.rowcount
+
+
+def progress(session_id: int, text: str, kind: str = "report") -> None:
+    """Grava o texto já gerado no job em execução da sessão (chamado pelo handler)."""
+    from sqlalchemy import update
+    from app.main import db
+
+    t = _table()
+    with db.engine.begin() as conn:
+        conn.execute(
+            update(t)
+            .where(t.c.session_id == session_id, t.c.kind == kind, t.c.status == RUNNING)
+            .values(partial_text=text)
+        )
+
+
+def complete(job_id: int, worker_id: str) -> bool:
+    from sqlalchemy import update
+    from app.main import db
+
+    t = _table()
+    with db.engine.begin() as conn:
+        res = conn.execute(
+            update(t)
+            .where(t.c.id == job_id, t.c.locked_by == worker_id, t.c.status == RUNNING)
+            .values(status=DONE, locked_by=None, lease_until=None, finished_at=datetime.utcnow(),
+                    last_error=None, partial_text=None)
+        )
+    return res.rowcount == 1
+
+
+def fail(job_id: int, worker_id: str, error: str) -> Optional[str]:
+    """Registra a falha: volta à fila com backoff ou vai para o dead‑letter.
+
+    Devolve o novo status (None se o job já não era deste worker).
+    """
+    from sqlalchemy import select, update
+    from app.main import db
+
+    t = _table()
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        row = conn.execute(select(t.c.attempts, t.c.max_attempts).where(t.c.id == job_id)).first()
+        if row is None:
+            return None
+        if row.attempts >= row.max_attempts:
+            values = {"status": DEAD, "finished_at": now}
+        else:
+            values = {"status": QUEUED, "run_after": now + timedelta(seconds=backoff_seconds(row.attempts))}
+        res = conn.execute(
+            update(t)
+            .where(t.c.id == job_id, t.c.locked_by == worker_id, t.c.status == RUNNING)
+            .values(locked_by=None, lease_until=None, last_error=error[:2000], partial_text=None, **values)
+        )
+    return values["status"] if res.rowcount == 1 else None
+
+
+def requeue_dead(job_ids: Optional[List[int]] = None) -> int:
+    """Devolve jobs `dead` à fila com tentativas zeradas (todos, se `job_ids` for None)."""
+    from sqlalchemy import update
+    from app.main import db
+
+    t = _table()
+    stmt = update(t).where(t.c.status == DEAD)
+    if job_ids:
+        stmt = stmt.where(t.c.id.in_(job_ids))
+    with db.engine.begin() as conn:
+        res = conn.execute(stmt.values(status=QUEUED, attempts=0, run_after=datetime.utcnow(), finished_at=None))
+    return res.rowcount
+
+
+def stats() -> Dict[str, object]:
+    """Jobs por status e idade do job pronto mais antigo (s)."""
+    from flask import has_app_context
+    from sqlalchemy import func, select
+    from app.main import db
+
+    if not has_app_context():
+        return {}
+    t = _table()
+    try:
+        with db.engine.connect() as conn:
+            counts = dict(conn.execute(select(t.c.status, func.count()).group_by(t.c.status)).fetchall())
+            oldest = conn.execute(
+                select(func.min(t.c.run_after)).where(t.c.status == QUEUED, t.c.run_after <= datetime.utcnow())
+            ).scalar()
+    except Exception as e:
+        logger.warning("[JOBS] Falha ao ler a fila: %s", e)
+        return {"error": str(e)}
+    return {
+        **{s: int(counts.get(s, 0)) for s in (QUEUED, RUNNING, DONE, DEAD)},
+        "oldest_ready_s": round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else 0.0,
+    }
+
+
+# ── Worker ────────────────────────────────────────────────
+
+class Worker:
+    """Pool limitado de threads consumindo a fila (um por processo `worker.py`)."""
+
+    def __init__(self, app, concurrency: int = JOB_CONCURRENCY, poll: float = JOB_POLL_SECONDS) -> None:
+        self.app = app
+        self.concurrency = concurrency
+        self.poll = poll
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.stopping = threading.Event()
+        self._drained = threading.Event()   # pool encerrado: nenhum job rodando
+        self._running: Dict[int, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+
+    # Cada job roda no seu app context (sessão SQLAlchemy própria por thread)
+    def _execute(self, job: Dict[str, object]) -> None:
+        with self.app.app_context():
+            from app.main import db
+
+            t0 = time.perf_counter()
+            try:
+                handler = _HANDLERS.get(job["kind"])
+                if handler is None:
+                    raise RuntimeError(f"Sem handler para jobs '{job['kind']}'.")
+                handler(job["session_id"])
+                complete(job["id"], self.worker_id)
+                logger.info("[JOBS] Job %s (sessão %s) ok em %.1fs", job["id"], job["session_id"], time.perf_counter() - t0)
+            except Exception as e:
+                db.session.rollback()
+                status = fail(job["id"], self.worker_id, f"{type(e).__name__}: {e}")
+                log = logger.error if status == DEAD else logger.warning
+                log("[JOBS] Job %s (sessão %s, tentativa %s) falhou → %s: %s",
+                    job["id"], job["session_id"], job["attempt"], status, e)
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._running.pop(job["id"], None)
+
+    def _heartbeats(self) -> None:
+        interval = JOB_LEASE_SECONDS / 3.0
+        # Espera o intervalo mesmo depois do stop(): os jobs em andamento seguem com lease
+        while not self._drained.wait(interval):
+            with self._lock:
+                ids = list(self._running)
+            if not ids:
+                continue
+            with self.app.app_context():
+                try:
+                    renewed = heartbeat(ids, self.worker_id)
+                    if renewed < len(ids):
+                        logger.warning("[JOBS] %d lease(s) perdidos (outro worker retomou?)", len(ids) - renewed)
+                except Exception as e:
+                    logger.warning("[JOBS] Heartbeat falhou: %s", e)
+
+    def stop(self, *_args) -> None:
+        if not self.stopping.is_set():
+            logger.info("[JOBS] Parando: sem novos claims; esperando %d job(s)", len(self._running))
+        self.stopping.set()
+
+    def run(self, once: bool = False) -> int:
+        """Loop principal; `once=True` esvazia a fila e sai. Devolve jobs executados."""
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            if threading.current_thread() is threading.main_thread():
+                signal.signal(sig, self.stop)
+        threading.Thread(target=self._heartbeats, name="job-heartbeat", daemon=True).start()
+        executed = 0
+        logger.info("[JOBS] Worker %s com %d slots", self.worker_id, self.concurrency)
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job") as pool:
+            while not self.stopping.is_set():
+                free = self.concurrency - len(self._running)
+                jobs = []
+                if free > 0:
+                    with self.app.app_context():
+                        try:
+                            jobs = claim(self.worker_id, free)
+                        except Exception as e:
+                            logger.warning("[JOBS] Claim falhou: %s", e)
+                for job in jobs:
+                    with self._lock:
+                        self._running[job["id"]] = job
+                    pool.submit(self._execute, job)
+                executed += len(jobs)
+                if once and not jobs and not self._running:
+                    break
+                if not jobs:
+                    self.stopping.wait(self.poll if free > 0 else 0.2)
+        self.stopping.set()
+        self._drained.set()
+        return executed
@@ -0,0 +1,233 @@
+# app/services/llm_cache.py
+"""
+Cache de respostas do LLM para Sky.AI
+=====================================
+
+Duas pessoas com os mesmos dados de nascimento e cidade — ou a mesma
+pessoa reenviando o formulário — geravam um relatório GPT‑4 inteiro de
+novo, com o mesmo preâmbulo de valores precomputados. Aqui a resposta fica
+guardada na tabela `llm_cache`, endereçada pelo **conteúdo**:
+
+    sha256(versão do template | finalidade | modelo | temperatura | max_tokens | mensagens)
+
+As mensagens já carregam os valores precomputados (signos, graus,
+aspectos, numerologia, trânsitos) e o mês corrente do relatório; as
+janelas de trânsitos e do calendário do céu começam no dia 1º do mês
+(`perfil_service.build_report_context`), então a chave muda sozinha quando
+muda o mapa ou o mês das projeções. A **versão
+do template** (`REPORT_PROMPT_VERSION`, `COMPAT_PROMPT_VERSION`) cobre o
+resto — pós‑processamento, formato esperado: suba a versão e as respostas
+antigas deixam de ser usadas.
+
+Quem usa é o `llm_gateway.stream(..., cache=<versão>)`: *hit* devolve o
+texto na hora (registrado no ledger com status `cached`), *miss* chama o
+modelo e grava a resposta se ela chegou inteira. `cache=None` desliga por
+chamada (opt‑out por pedido: `fresh=1` na compatibilidade,
+`ReportJob.use_cache=False` no relatório). Respostas que o chamador
+rejeitar depois (JSON inválido, seção vazia) saem com `forget`.
+
+Evicção (`evict`): por idade (`LLM_CACHE_MAX_AGE_DAYS`, pela criação) e
+por tamanho (`LLM_CACHE_MAX_MB`, removendo as menos usadas recentemente).
+Roda a cada `LLM_CACHE_EVICT_EVERY` gravações do processo e via
+`python worker.py --evict-llm-cache`.
+
+Variáveis de ambiente
+---------------------
+LLM_CACHE              → "0" desliga o cache
+LLM_CACHE_MAX_AGE_DAYS → idade máxima de uma resposta, em dias (padrão 60)
+LLM_CACHE_MAX_MB       → tamanho máximo das respostas guardadas (padrão 256)
+LLM_CACHE_EVICT_EVERY  → gravações entre evicções automáticas (padrão 100)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_MAX_AGE_DAYS = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "60"))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+LLM_CACHE_EVICT_EVERY = max(1, int(os.getenv("LLM_CACHE_EVICT_EVERY", "100")))
+
+_STATS = {"hits": 0, "misses": 0, "puts": 0, "forgets": 0, "evicted": 0, "db_errors": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _STATS_LOCK:
+        _STATS[name] += n
+
+
+def _table():
+    from app.models import LLMCacheEntry
+
+    return LLMCacheEntry.__table__
+
+
+def enabled() -> bool:
+    if not LLM_CACHE:
+        return False
+    from flask import has_app_context
+
+    return has_app_context()
+
+
+def cache_key(
+    version: str,
+    purpose: str,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    messages: List[Mapping[str, str]],
+) -> str:
+    blob = json.dumps(
+        [version, purpose, model, round(float(temperature), 4), max_tokens,
+         [[m["role"], m["content"]] for m in messages]],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# ── Leitura / gravação ────────────────────────────────────
+
+def get(key: str) -> Optional[str]:
+    """Resposta guardada (dentro da idade máxima) ou None; conta o acesso."""
+    from sqlalchemy import select, update
+    from app.main import db
+
+    t = _table()
+    now = datetime.utcnow()
+    try:
+        with db.engine.begin() as conn:
+            row = conn.execute(
+                select(t.c.response).where(
+                    t.c.cache_key == key,
+                    t.c.created_at >= now - timedelta(days=LLM_CACHE_MAX_AGE_DAYS),
+                )
+            ).first()
+            if row is not None:
+                conn.execute(
+                    update(t).where(t.c.cache_key == key).values(hits=t.c.hits + 1, last_hit_at=now)
+                )
+    except Exception as e:
+        _count("db_errors")
+        logger.warning("[LLM CACHE] Falha ao ler cache: %s", e)
+        return None
+    _count("hits" if row is not None else "misses")
+    return row.response if row is not None else None
+
+
+def put(key: str, *, purpose: str, version: str, model: str, text: str) -> None:
+    from sqlalchemy import insert, update
+    from sqlalchemy.exc import IntegrityError
+    from app.main import db
+
+    t = _table()
+    values = {
+        "purpose": purpose,
+        "prompt_version": version,
+        "model": model,
+        "response": text,
+        "size_bytes": len(text.encode("utf-8")),
+        "hits": 0,
+        "created_at": datetime.utcnow(),
+        "last_hit_at": None,
+    }
+    try:
+        with db.engine.begin() as conn:
+            res = conn.execute(update(t).where(t.c.cache_key == key).values(**values))   # entrada vencida
+            if res.rowcount == 0:
+                conn.execute(insert(t).values(cache_key=key, **values))
+    except IntegrityError:   # outro processo gravou a mesma chave
+        return
+    except Exception as e:
+        _count("db_errors")
+        logger.warning("[LLM CACHE] Falha ao gravar cache: %s", e)
+        return
+    with _STATS_LOCK:
+        _STATS["puts"] += 1
+        due = _STATS["puts"] % LLM_CACHE_EVICT_EVERY == 0
+    if due:
+        try:
+            evict()
+        except Exception as e:
+            logger.warning("[LLM CACHE] Evicção falhou: %s", e)
+
+
+def forget(key: Optional[str]) -> None:
+    """Remove uma resposta que o chamador rejeitou (não deve ser servida de novo)."""
+    if not key or not enabled():
+        return
+    from sqlalchemy import delete
+    from app.main import db
+
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(delete(_table()).where(_table().c.cache_key == key))
+        _count("forgets")
+    except Exception as e:
+        _count("db_errors")
+        logger.warning("[LLM CACHE] Falha ao apagar entrada: %s", e)
+
+
+# ── Evicção ───────────────────────────────────────────────
+
+def evict(max_age_days: Optional[float] = None, max_mb: Optional[float] = None) -> Dict[str, int]:
+    """Apaga entradas velhas e, acima do limite de tamanho, as menos usadas recentemente."""
+    from sqlalchemy import delete, func, select
+    from app.main import db
+
+    max_age_days = LLM_CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    max_bytes = int((LLM_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024)
+    t = _table()
+    with db.engine.begin() as conn:
+        expired = conn.execute(
+            delete(t).where(t.c.created_at < datetime.utcnow() - timedelta(days=max_age_days))
+        ).rowcount
+
+        total = conn.execute(select(func.coalesce(func.sum(t.c.size_bytes), 0))).scalar()
+        victims: List[str] = []
+        if total > max_bytes:
+            recency = func.coalesce(t.c.last_hit_at, t.c.created_at)
+            for key, size in conn.execute(select(t.c.cache_key, t.c.size_bytes).order_by(recency.asc())):
+                if total <= max_bytes:
+                    break
+                victims.append(key)
+                total -= size
+            for i in range(0, len(victims), 500):
+                conn.execute(delete(t).where(t.c.cache_key.in_(victims[i:i + 500])))
+    _count("evicted", expired + len(victims))
+    if expired or victims:
+        logger.info("[LLM CACHE] Evicção: %d por idade, %d por tamanho", expired, len(victims))
+    return {"expired": expired, "over_size": len(victims)}
+
+
+def stats() -> Dict[str, object]:
+    """Contadores do processo + tamanho da tabela."""
+    with _STATS_LOCK:
+        out: Dict[str, object] = dict(_STATS)
+    lookups = out["hits"] + out["misses"]
+    out["hit_ratio"] = round(out["hits"] / lookups, 4) if lookups else 0.0
+    if not enabled():
+        return out
+    from sqlalchemy import func, select
+    from app.main import db
+
+    t = _table()
+    try:
+        with db.engine.connect() as conn:
+            entries, size, hits = conn.execute(
+                select(func.count(), func.coalesce(func.sum(t.c.size_bytes), 0), func.coalesce(func.sum(t.c.hits), 0))
+            ).one()
+    except Exception as e:
+        logger.warning("[LLM CACHE] Falha ao ler estatísticas: %s", e)
+        return out
+    out.update(entries=entries, size_mb=round(size / 1024 / 1024, 2), stored_hits=int(hits))
+    return out
@@ -0,0 +1,311 @@
+# app/services/llm_gateway.py
+"""
+Gateway das chamadas ao OpenAI para Sky.AI
+==========================================
+
+Relatório, compatibilidade e Guru passam por aqui em vez de criar um
+`OpenAI(api_key=...)` a cada chamada:
+
+• **um cliente por processo** — `httpx` com pool keep‑alive
+  (`OPENAI_POOL_SIZE` conexões; TLS reaproveitado), recriado depois de um
+  `fork`; timeouts e retries iguais para todo mundo;
+• **sempre em streaming** (`stream_options.include_usage`): mede o tempo
+  até o primeiro token (TTFT) e ainda recebe a contagem de tokens no fim;
+  `stream()` repassa os pedaços a quem quiser mostrar ao vivo,
+  `complete()` só junta o texto;
+• **ledger** — cada chamada (ok ou erro) vira uma linha em `prompt_logs`
+  (`PromptLog`): finalidade, modelo, temperatura, tokens de prompt e de
+  resposta, latência, TTFT, status e erro. Consultável por SQL; resumo das
+  últimas 24 h em `/admin/cache-stats`;
+• **cache de respostas** — com `cache=<versão do template>` a resposta é
+  procurada no `llm_cache` (chave = conteúdo do prompt + parâmetros) e,
+  se existir, devolvida na hora sem chamar o modelo (status `cached` no
+  ledger); senão a resposta completa é guardada lá.
+
+Variáveis de ambiente
+---------------------
+OPENAI_API_KEY          → chave (obrigatória)
+OPENAI_CONNECT_TIMEOUT  → segundos para conectar (padrão 5)
+OPENAI_READ_TIMEOUT     → segundos sem receber nada do stream (padrão 60)
+OPENAI_MAX_RETRIES      → retries do SDK em erros transitórios (padrão 2)
+OPENAI_POOL_SIZE        → conexões keep‑alive (padrão 10)
+LLM_LEDGER              → "0" desliga a gravação em `prompt_logs`
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Mapping, Optional
+
+from app.services import llm_cache
+
+logger = logging.getLogger(__name__)
+
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "60"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_POOL_SIZE = int(os.getenv("OPENAI_POOL_SIZE", "10"))
+LLM_LEDGER = os.getenv("LLM_LEDGER", "1") != "0"
+
+Message = Mapping[str, str]
+
+
+@dataclass
+class LLMResult:
+    """Resultado de uma chamada (também o que vai para o ledger)."""
+
+    text: str = ""
+    model: str = ""
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    latency_ms: Optional[float] = None
+    ttft_ms: Optional[float] = None
+    cached: bool = False
+    cache_key: Optional[str] = None      # para `llm_cache.forget` se o chamador rejeitar o texto
+
+
+# ── Cliente compartilhado ─────────────────────────────────
+
+_CLIENT = None
+_CLIENT_PID = 0
+_CLIENT_LOCK = threading.Lock()
+
+_STATS_LOCK = threading.Lock()
+_STATS: Dict[str, float] = {
+    "calls": 0, "errors": 0, "cache_hits": 0, "latency_ms": 0.0, "ttft_ms": 0.0, "tokens": 0,
+}
+
+
+def get_client():
+    """Cliente OpenAI do processo (pool keep‑alive, timeouts e retries padrão)."""
+    global _CLIENT, _CLIENT_PID
+    if _CLIENT is None or _CLIENT_PID != os.getpid():   # após fork: sockets do pai
+        with _CLIENT_LOCK:
+            if _CLIENT is None or _CLIENT_PID != os.getpid():
+                # Tipos do httpx reexportados pelo SDK (funciona com qualquer versão do httpx)
+                from openai import DEFAULT_CONNECTION_LIMITS, DefaultHttpxClient, OpenAI, Timeout
+
+                api_key = os.getenv("OPENAI_API_KEY")
+                if not api_key:
+                    raise RuntimeError("OPENAI_API_KEY not set.")
+                limits = type(DEFAULT_CONNECTION_LIMITS)(
+                    max_connections=OPENAI_POOL_SIZE, max_keepalive_connections=OPENAI_POOL_SIZE
+                )
+                _CLIENT = OpenAI(
+                    api_key=api_key,
+                    timeout=Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+                    max_retries=OPENAI_MAX_RETRIES,
+                    http_client=DefaultHttpxClient(limits=limits),
+                )
+                _CLIENT_PID = os.getpid()
+    return _CLIENT
+
+
+# ── Chamadas ──────────────────────────────────────────────
+
+def stream(
+    messages: List[Message],
+    *,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    purpose: str,
+    user_email: Optional[str] = None,
+    result: Optional[LLMResult] = None,
+    timeout: Optional[float] = None,
+    max_retries: Optional[int] = None,
+    cache: Optional[str] = None,
+) -> Iterator[str]:
+    """Gera o texto da resposta pedaço a pedaço.
+
+    Ao terminar (ou falhar), `result` — se dado — tem o texto completo, os
+    tokens e os tempos, e a chamada é gravada no ledger. Erros do SDK
+    sobem para o chamador. `timeout`/`max_retries` substituem os padrões
+    só nesta chamada. `cache` é a versão do template do prompt: liga o
+    `llm_cache` (resposta guardada sai num pedaço só).
+    """
+    result = result if result is not None else LLMResult()
+    result.model = model
+    parts: List[str] = []
+    error: Optional[BaseException] = None
+    response = None
+    t0 = time.perf_counter()
+
+    if cache is not None and llm_cache.enabled():
+        result.cache_key = llm_cache.cache_key(cache, purpose, model, temperature, max_tokens, messages)
+        cached = llm_cache.get(result.cache_key)
+        if cached is not None:
+            result.text, result.cached = cached, True
+            result.latency_ms = result.ttft_ms = round((time.perf_counter() - t0) * 1000, 1)
+            _record(messages, result, purpose, temperature, user_email, None)
+            yield cached
+            return
+
+    try:
+        client = get_client()
+        if timeout is not None or max_retries is not None:
+            from openai import Timeout
+
+            client = client.with_options(
+                timeout=Timeout(timeout or OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+                max_retries=OPENAI_MAX_RETRIES if max_retries is None else max_retries,
+            )
+        response = client.chat.completions.create(
+            model=model,
+            messages=list(messages),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in response:
+            if chunk.usage is not None:
+                result.prompt_tokens = chunk.usage.prompt_tokens
+                result.completion_tokens = chunk.usage.completion_tokens
+            if chunk.model:
+                result.model = chunk.model
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if result.ttft_ms is None:
+                    result.ttft_ms = round((time.perf_counter() - t0) * 1000, 1)
+                parts.append(delta)
+                yield delta
+        if result.cache_key is not None and parts:
+            llm_cache.put(result.cache_key, purpose=purpose, version=cache, model=model, text="".join(parts))
+    except BaseException as e:   # inclui GeneratorExit (cliente do stream desconectou)
+        error = e
+        if response is not None:
+            response.close()     # stream abandonado: libera a conexão do pool
+        raise
+    finally:
+        result.text = "".join(parts)
+        result.latency_ms = round((time.perf_counter() - t0) * 1000, 1)
+        _record(messages, result, purpose, temperature, user_email, error)
+
+
+def complete(messages: List[Message], **kwargs) -> LLMResult:
+    """Chamada completa (mesmos argumentos de `stream`); texto sem espaços nas pontas."""
+    result = LLMResult()
+    for _ in stream(messages, result=result, **kwargs):
+        pass
+    result.text = result.text.strip()
+    return result
+
+
+# ── Ledger ────────────────────────────────────────────────
+
+def _record(
+    messages: List[Message],
+    result: LLMResult,
+    purpose: str,
+    temperature: float,
+    user_email: Optional[str],
+    error: Optional[BaseException],
+) -> None:
+    with _STATS_LOCK:
+        _STATS["calls"] += 1
+        _STATS["errors"] += error is not None
+        _STATS["cache_hits"] += result.cached
+        _STATS["latency_ms"] += result.latency_ms or 0.0
+        _STATS["ttft_ms"] += result.ttft_ms or 0.0
+        _STATS["tokens"] += (result.prompt_tokens or 0) + (result.completion_tokens or 0)
+    logger.info(
+        "[LLM ⏱] %s model=%s latency_ms=%s ttft_ms=%s tokens=%s/%s%s",
+        purpose, result.model, result.latency_ms, result.ttft_ms,
+        result.prompt_tokens, result.completion_tokens, f" error={error!r}" if error else "",
+    )
+    if not (LLM_LEDGER and _db_enabled()):
+        return
+    from sqlalchemy import insert
+    from app.main import db
+    from app.models import PromptLog
+
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(
+                insert(PromptLog.__table__).values(
+                    user_email=user_email or "",
+                    prompt_text="\n\n".join(m["content"] for m in messages),
+                    created_at=datetime.utcnow(),
+                    purpose=purpose,
+                    model=result.model,
+                    temperature=temperature,
+                    prompt_tokens=result.prompt_tokens,
+                    completion_tokens=result.completion_tokens,
+                    latency_ms=result.latency_ms,
+                    ttft_ms=result.ttft_ms,
+                    status="error" if error else ("cached" if result.cached else "ok"),
+                    error=f"{type(error).__name__}: {error}"[:2000] if error else None,
+                )
+            )
+    except Exception as e:
+        logger.warning("[LLM] Falha ao gravar no ledger: %s", e)
+
+
+def _db_enabled() -> bool:
+    from flask import has_app_context
+
+    return has_app_context()
+
+
+def stats(hours: int = 24) -> Dict[str, object]:
+    """Contadores do processo + resumo do ledger por finalidade/modelo."""
+    with _STATS_LOCK:
+        calls = _STATS["calls"]
+        out: Dict[str, object] = {
+            "calls": int(calls),
+            "errors": int(_STATS["errors"]),
+            "cache_hits": int(_STATS["cache_hits"]),
+            "avg_latency_ms": round(_STATS["latency_ms"] / calls, 1) if calls else 0.0,
+            "avg_ttft_ms": round(_STATS["ttft_ms"] / calls, 1) if calls else 0.0,
+            "tokens": int(_STATS["tokens"]),
+        }
+    if not _db_enabled():
+        return out
+    from sqlalchemy import case, func, select
+    from app.main import db
+    from app.models import PromptLog
+
+    t = PromptLog.__table__
+    try:
+        with db.engine.connect() as conn:
+            rows = conn.execute(
+                select(
+                    t.c.purpose,
+                    t.c.model,
+                    func.count(),
+                    func.sum(case((t.c.status == "error", 1), else_=0)),
+                    func.sum(case((t.c.status == "cached", 1), else_=0)),
+                    func.avg(t.c.latency_ms),
+                    func.avg(t.c.ttft_ms),
+                    func.sum(t.c.prompt_tokens),
+                    func.sum(t.c.completion_tokens),
+                )
+                .where(t.c.created_at >= datetime.utcnow() - timedelta(hours=hours), t.c.purpose.isnot(None))
+                .group_by(t.c.purpose, t.c.model)
+            ).fetchall()
+    except Exception as e:
+        logger.warning("[LLM] Falha ao ler o ledger: %s", e)
+        return out
+    out[f"ledger_{hours}h"] = [
+        {
+            "purpose": purpose,
+            "model": model,
+            "calls": n,
+            "errors": int(errors or 0),
+            "cached": int(cached or 0),
+            "avg_latency_ms": round(latency or 0.0, 1),
+            "avg_ttft_ms": round(ttft or 0.0, 1),
+            "prompt_tokens": int(p_tok or 0),
+            "completion_tokens": int(c_tok or 0),
+        }
+        for purpose, model, n, errors, cached, latency, ttft, p_tok, c_tok in rows
+    ]
+    return out
@@ -0,0 +1,67 @@
+# app/services/lru_cache.py
+"""
+Cache LRU em memória (por processo) para os serviços do Sky.AI.
+
+• Thread‑safe (um único `Lock`), pois o mesmo worker do gunicorn atende
+  requisições e threads de background ao mesmo tempo.
+• TTL opcional por cache e por entrada — útil para *negative caching*,
+  que precisa expirar antes dos resultados positivos.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Mapa limitado por `maxsize`, descartando a entrada usada há mais tempo."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        if maxsize <= 0:
+            raise ValueError("maxsize deve ser positivo.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Grava `value`; `ttl` (segundos) sobrepõe o TTL padrão do cache."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
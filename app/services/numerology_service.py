@@ -2,11 +2,18 @@
 """
 Serviço de numerologia para Sky.AI: cálculos de Life Path, Soul Urge e Expression com validação,
 logging e tratamento de diferentes formatos de data e vocais.
+
+Lote: `get_numerology_many` calcula os três números para listas grandes de
+(nome, data) numa passada — cada nome é normalizado uma vez, as letras são
+somadas com tabelas de `bytes.translate` (letra → valor, em C) e as
+reduções saem de uma tabela de raízes pré‑calculada. Datas repetidas são
+resolvidas uma vez só. O resultado é idêntico ao de `get_numerology`.
 """
 import re
 import unicodedata
 import logging
-from datetime import datetime
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Mapping, Sequence, Union
 
 # Configura logger para este módulo
 logger = logging.getLogger(__name__)
@@ -27,6 +34,38 @@ LETTER_VALUES = {
 # Conjunto de vogais (inclui 'Y' como opcional)
 VOWELS = {'A', 'E', 'I', 'O', 'U', 'Y'}
 
+MASTER_NUMBERS = {11, 22, 33}
+
+# ── Tabelas pré‑calculadas ───────────────────────────────
+# byte ASCII → valor (maiúsculas e minúsculas; o resto vale 0): `sum(b.translate(t))`
+def _byte_table(letters) -> bytes:
+    table = bytearray(256)
+    for char in letters:
+        table[ord(char)] = table[ord(char.lower())] = LETTER_VALUES[char]
+    return bytes(table)
+
+_EXPRESSION_TABLE = _byte_table(LETTER_VALUES)
+_SOUL_TABLE = _byte_table(VOWELS & LETTER_VALUES.keys())
+_DIGIT_TABLE = bytes(b - 48 if 48 <= b <= 57 else 0 for b in range(256))
+
+# Raiz numerológica de 0…_ROOT_LIMIT-1 (somas de nomes reais ficam bem abaixo)
+_ROOT_LIMIT = 4096
+
+
+def _reduce_slow(n: int) -> int:
+    while n > 9 and n not in MASTER_NUMBERS:
+        n = sum(int(d) for d in str(n))
+    return n
+
+_ROOTS = [_reduce_slow(n) for n in range(_ROOT_LIMIT)]
+
+
+def _ascii_bytes(name: str) -> bytes:
+    # Mesmo efeito de `normalize_name` nas somas: acentos caem, hífen/apóstrofo valem 0
+    if name.isascii():
+        return name.encode('ascii')
+    return unicodedata.normalize('NFD', name).encode('ascii', 'ignore')
+
 # 🔹 Remove acentos e caracteres especiais do nome
 def normalize_name(name: str) -> str:
     if not name or not isinstance(name, str):
@@ -37,11 +76,10 @@ def normalize_name(name: str) -> str:
 
 # 🔹 Reduz um número para 1-9 ou mestre (11, 22, 33)
 def reduce_number(n: int) -> int:
-    logger.debug(f"Reducing number: {n}")
-    while n > 9 and n not in {11, 22, 33}:
-        n = sum(int(d) for d in str(n))
-        logger.debug(f"Intermediate reduction: {n}")
-    return n
+    if 0 <= n < _ROOT_LIMIT:
+        return _ROOTS[n]
+    logger.debug("Reducing number: %s", n)
+    return _reduce_slow(n)
 
 # 🔹 Normalize e valida data de nascimento, aceita YYYY-MM-DD ou DD/MM/YYYY
 def parse_birth_date(birth_date: str) -> str:
@@ -51,7 +89,7 @@ def parse_birth_date(birth_date: str) -> str:
         try:
             dt = datetime.strptime(birth_date, fmt).date()
             iso = dt.isoformat()
-            logger.debug(f"Parsed birth date '{birth_date}' as ISO '{iso}' using format {fmt}")
+            logger.debug("Parsed birth date '%s' as ISO '%s' using format %s", birth_date, iso, fmt)
             return iso
         except ValueError:
             continue
@@ -60,49 +98,120 @@ def parse_birth_date(birth_date: str) -> str:
 # 🔹 Caminho de Vida (data de nascimento)
 def calculate_life_path_number(birth_date: str) -> int:
     iso_date = parse_birth_date(birth_date)
-    digits = re.sub(r'[^0-9]', '', iso_date)
-    total = sum(int(d) for d in digits)
-    life_path = reduce_number(total)
-    logger.info(f"Life Path Number for {iso_date} = {life_path}")
+    life_path = reduce_number(sum(iso_date.encode('ascii').translate(_DIGIT_TABLE)))
+    logger.info("Life Path Number for %s = %s", iso_date, life_path)
     return life_path
 
 # 🔹 Número da Alma (vogais)
 def calculate_soul_urge_number(full_name: str) -> int:
-    name = normalize_name(full_name)
-    total = 0
-    for char in name.upper():
-        if char in VOWELS and char in LETTER_VALUES:
-            total += LETTER_VALUES[char]
-    soul_urge = reduce_number(total)
-    logger.info(f"Soul Urge Number for '{full_name}' = {soul_urge}")
+    raw = _ascii_bytes(normalize_name(full_name))
+    soul_urge = reduce_number(sum(raw.translate(_SOUL_TABLE)))
+    logger.info("Soul Urge Number for '%s' = %s", full_name, soul_urge)
     return soul_urge
 
 # 🔹 Número de Expressão (todas as letras)
 def calculate_expression_number(full_name: str) -> int:
-    name = normalize_name(full_name)
-    total = sum(LETTER_VALUES.get(char, 0) for char in name.upper())
-    expression = reduce_number(total)
-    logger.info(f"Expression Number for '{full_name}' = {expression}")
+    raw = _ascii_bytes(normalize_name(full_name))
+    expression = reduce_number(sum(raw.translate(_EXPRESSION_TABLE)))
+    logger.info("Expression Number for '%s' = %s", full_name, expression)
     return expression
 
+# 🔹 Alma + Expressão com uma única normalização do nome
+def _name_numbers(full_name: str):
+    raw = _ascii_bytes(normalize_name(full_name))
+    soul_urge = reduce_number(sum(raw.translate(_SOUL_TABLE)))
+    expression = reduce_number(sum(raw.translate(_EXPRESSION_TABLE)))
+    logger.info("Soul Urge / Expression for '%s' = %s / %s", full_name, soul_urge, expression)
+    return soul_urge, expression
+
 # 🔹 Função principal
 def get_numerology(full_name: str, birth_date: str) -> dict:
     try:
         life_path = calculate_life_path_number(birth_date)
-        soul_urge = calculate_soul_urge_number(full_name)
-        expression = calculate_expression_number(full_name)
+        soul_urge, expression = _name_numbers(full_name)
         result = {
             "life_path": life_path,
             "soul_urge": soul_urge,
             "expression": expression
         }
-        logger.debug(f"Numerology result: {result}")
+        logger.debug("Numerology result: %s", result)
         return result
     except Exception as e:
-        logger.error(f"[Numerology ERROR] {e}")
+        logger.error("[Numerology ERROR] %s", e)
         return {
             "error": str(e),
             "life_path": None,
             "soul_urge": None,
             "expression": None
         }
+
+
+# ── Lote ─────────────────────────────────────────────────
+
+NumerologyRecord = Union[Mapping[str, str], Sequence[str]]
+
+_ISO_RE = re.compile(r"([0-9]{4})-([0-9]{2})-([0-9]{2})")
+_DMY_RE = re.compile(r"([0-9]{2})/([0-9]{2})/([0-9]{4})")
+
+
+def _iso_date(birth_date) -> str:
+    # Formatos de largura fixa sem `strptime`; o resto (e datas inválidas) vai para `parse_birth_date`
+    if isinstance(birth_date, str):
+        m = _ISO_RE.fullmatch(birth_date)
+        if m:
+            y, mo, d = m.groups()
+        else:
+            m = _DMY_RE.fullmatch(birth_date)
+            if m:
+                d, mo, y = m.groups()
+        if m:
+            try:
+                return date(int(y), int(mo), int(d)).isoformat()
+            except ValueError:
+                pass
+    return parse_birth_date(birth_date)
+
+
+def get_numerology_many(records: Iterable[NumerologyRecord]) -> List[dict]:
+    """`get_numerology` para cada registro, na mesma ordem.
+
+    Cada registro é `(full_name, birth_date)` ou um dict com essas chaves.
+    Registros inválidos viram o mesmo dict de erro de `get_numerology`.
+    """
+    life_paths: Dict[str, object] = {}   # data → número ou exceção (datas se repetem muito)
+    out: List[dict] = []
+    failed = 0
+    for record in records:
+        if isinstance(record, Mapping):
+            full_name, birth_date = record.get("full_name"), record.get("birth_date")
+        else:
+            full_name, birth_date = record
+        try:
+            life_path = life_paths.get(birth_date) if isinstance(birth_date, str) else None
+            if life_path is None:
+                try:
+                    iso_date = _iso_date(birth_date)
+                    life_path = _ROOTS[sum(iso_date.encode('ascii').translate(_DIGIT_TABLE))]
+                except ValueError as e:
+                    life_path = e
+                if isinstance(birth_date, str):
+                    life_paths[birth_date] = life_path
+            if isinstance(life_path, Exception):
+                raise life_path
+
+            if not full_name or not isinstance(full_name, str):
+                raise ValueError("Full name must be a non-empty string.")
+            raw = _ascii_bytes(full_name)
+            soul_urge = sum(raw.translate(_SOUL_TABLE))
+            expression = sum(raw.translate(_EXPRESSION_TABLE))
+            out.append({
+                "life_path": life_path,
+                "soul_urge": _ROOTS[soul_urge] if soul_urge < _ROOT_LIMIT else reduce_number(soul_urge),
+                "expression": _ROOTS[expression] if expression < _ROOT_LIMIT else reduce_number(expression),
+            })
+        except Exception as e:
+            failed += 1
+            out.append({"error": str(e), "life_path": None, "soul_urge": None, "expression": None})
+    if failed:
+        logger.warning("[Numerology] %d de %d registros com erro", failed, len(out))
+    return out
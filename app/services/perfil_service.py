@@ -7,18 +7,54 @@ Inclui logging do prompt e controle de erros.
 import os
 import json
 import re
-from datetime import datetime
+from datetime import datetime, timezone
 import io
 import traceback
+from typing import Callable
 
 from flask import current_app
-from openai import OpenAI
 
-from app.services.astrology_service import get_astrological_data
+from app.services.astrology_service import ASPECTS_LIST, get_astrological_data
 from app.services.numerology_service import get_numerology
+from app.services import llm_cache, llm_gateway, report_sections, sky_calendar
+from app.services.transit_service import (
+    TRANSIT_MONTHS,
+    TRANSIT_PROMPT_BODIES,
+    format_transits,
+    transits_for_chart,
+)
+
+
+# Versão do template do relatório: suba ao mudar prompt, formato ou pós‑processamento
+# (respostas guardadas no `llm_cache` com outra versão deixam de ser usadas).
+REPORT_PROMPT_VERSION = "2026.10"
+
+# ── Seções do relatório (mesmos títulos nos modos "single" e "sections") ──
+REPORT_SECTIONS = [
+    "🌞 Sol, 🌙 Luna y ⬆️ Ascendente",
+    "🩹 Temas Astrológicos Clave",
+    "🔢 Numerología Clave",
+    "💖 Relaciones y Emociones",
+    "🎯 Carrera y Propósito",
+    "🔮 Perspectiva a 12 Meses",
+    "✨ Plan de Acción de 30 Días — Tu Prescripción Cósmica Personal",
+]
+
+_PLAN_RULES = """Esta última sección es la más valiosa.  
+Entrega un plan de 30 días con 2–4 acciones simples y poderosas.  
+Frases breves, específicas y prácticas.  
+Cada sugerencia en una línea nueva, tono imperativo.
+
+Cierra con una línea inspiradora que recuerde al usuario su propio poder.
+"""
+
 
+def build_report_context(user_data: dict, astro: dict | None = None) -> dict:
+    """Partes do prompt compartilhadas por todas as seções.
 
-def generate_skyai_prompt(user_data: dict) -> str:
+    `preamble` (valores precomputados) e `intro` (persona, regras de tempo e
+    estilo), mais `astro` e `nume` para os campos fixos do JSON.
+    """
     full_name      = user_data.get("full_name", "User")
     birth_date_raw = user_data.get("birth_date", "")
     birth_time     = user_data.get("birth_time", "")
@@ -40,9 +76,9 @@ def generate_skyai_prompt(user_data: dict) -> str:
     current_year = today.strftime("%Y")
     current_date_text = f"{current_month} {current_year}"
 
-    # ── 2. Astrologia ────────────────────────────────────────────────────────
+    # ── 2. Astrologia (reaproveita o mapa do chamador, se vier) ─────────────
     try:
-        astro = get_astrological_data(
+        astro = astro or get_astrological_data(
             birth_date_iso,
             birth_time,
             birth_city,
@@ -94,6 +130,43 @@ def generate_skyai_prompt(user_data: dict) -> str:
         for a in aspects
     )
 
+    # ── 5.0 Casas (cúspides + casa de cada corpo) ──────────────────────────
+    houses = astro.get("houses") or {}
+    casas_planetas = ", ".join(
+        f"{name} Casa {p['house']}" for name, p in positions.items() if p.get("house")
+    )
+    cuspides = ", ".join(
+        f"Casa {c['house']} {c['sign']} {c['degree']}°" for c in houses.get("cusps", [])
+    )
+
+    # Janelas ancoradas no dia 1º do mês (UTC): os valores precomputados — e a
+    # chave do `llm_cache` — só mudam quando vira o mês
+    window_start = datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    # ── 5.1 Trânsitos exatos dos próximos meses (base da Perspectiva) ───────
+    try:
+        transits = transits_for_chart(
+            positions, ASPECTS_LIST, TRANSIT_MONTHS, start=window_start, bodies=TRANSIT_PROMPT_BODIES
+        )
+        transitos_detalhados = format_transits(transits)
+    except Exception as e:
+        current_app.logger.warning(f"[Transits WARNING] {e}")
+        transitos_detalhados = ""
+
+    # ── 5.2 Calendário global do céu (mesmo para todos, vem da memória) ─────
+    try:
+        cielo = sky_calendar.format_events(sky_calendar.highlights(365, limit=25, now=window_start))
+    except Exception as e:
+        current_app.logger.warning(f"[SkyCalendar WARNING] {e}")
+        cielo = ""
+
+    transit_rule = (
+        "• En la Perspectiva a 12 Meses usa **las fechas de los tránsitos y del calendario del cielo precomputados**; "
+        "no inventes otras.  \n"
+        if transitos_detalhados or cielo
+        else ""
+    )
+
     # ── 6. Prompt final para a IA ───────────────────────────────────────────
     preamble = (
         "Usa estos valores precomputados para todas las interpretaciones:\n"
@@ -107,8 +180,21 @@ def generate_skyai_prompt(user_data: dict) -> str:
         f"- Número de Expresión: {nume['expression']}\n"
         f"- Aspectos de la carta natal:\n{aspectos_detalhados}\n"
     )
+    if cuspides:
+        preamble += (
+            f"- Sistema de casas: {houses.get('name')}\n"
+            f"- Planetas en casas: {casas_planetas}\n"
+            f"- Cúspides de las casas: {cuspides}\n"
+        )
+    if cielo:
+        preamble += f"- Calendario del cielo de los próximos 12 meses (eclipses, estaciones, ingresos):\n{cielo}\n"
+    if transitos_detalhados:
+        preamble += (
+            f"- Tránsitos exactos de los próximos {TRANSIT_MONTHS} meses "
+            f"(fechas UTC; ventana = entrada → salida del orbe):\n{transitos_detalhados}\n"
+        )
 
-    body = f"""
+    intro = f"""
 Eres SkyAI — un/a astrólogo(a) y numerólogo(a) de élite que escribe en **español claro y motivador**.
 
 Genera un informe profundamente PERSONAL y accionable para {full_name},
@@ -119,7 +205,7 @@ Basar **todas** las interpretaciones **solo** en los valores precomputados de ar
 • **No** incluyas referencias a años pasados.  
 • Usa referencias mensuales o trimestrales: “octubre de 2025”, “T4 2025”, “inicios de 2026”.  
 • Todo marco temporal debe ayudar a tomar decisiones reales.
-
+{transit_rule}
 💡 ESTILO  
 • Lenguaje motivador, sin jerga complicada.  
 • 2–4 párrafos cortos por sección, con una línea en blanco entre párrafos.  
@@ -127,22 +213,19 @@ Basar **todas** las interpretaciones **solo** en los valores precomputados de ar
 • En las proyecciones, incluye rangos aproximados (“feb–mar 2026”).  
 • Cierra **cada** sección con una frase imperativa y práctica (“Empieza…”, “Evita…”, “Registra…”).
 
-📑 SECCIONES OBLIGATORIAS (usa **exactamente** estos títulos, cada uno empezando con `##`):
-1. ## 🌞 Sol, 🌙 Luna y ⬆️ Ascendente  
-2. ## 🩹 Temas Astrológicos Clave  
-3. ## 🔢 Numerología Clave  
-4. ## 💖 Relaciones y Emociones  
-5. ## 🎯 Carrera y Propósito  
-6. ## 🔮 Perspectiva a 12 Meses  
-7. ## ✨ Plan de Acción de 30 Días — Tu Prescripción Cósmica Personal
+"""
 
-Esta última sección es la más valiosa.  
-Entrega un plan de 30 días con 2–4 acciones simples y poderosas.  
-Frases breves, específicas y prácticas.  
-Cada sugerencia en una línea nueva, tono imperativo.
+    return {"preamble": preamble, "intro": intro, "astro": astro, "nume": nume}
 
-Cierra con una línea inspiradora que recuerde al usuario su propio poder.
 
+def generate_skyai_prompt(user_data: dict, astro: dict | None = None) -> str:
+    ctx = build_report_context(user_data, astro)
+    nume = ctx["nume"]
+    secciones = "  \n".join(f"{i}. ## {title}" for i, title in enumerate(REPORT_SECTIONS, 1))
+    body = ctx["intro"] + f"""📑 SECCIONES OBLIGATORIAS (usa **exactamente** estos títulos, cada uno empezando con `##`):
+{secciones}
+
+{_PLAN_RULES}
 ➡️ FORMATO DE SALIDA  
 Devuelve **solo** un objeto JSON puro — sin bloques Markdown ni texto adicional.  
 Dentro del campo "texto", ESCAPA cada salto de línea como `\\n`. Ejemplo:
@@ -164,24 +247,61 @@ Tu Sol en Piscis...\\n\\n\
 ✅ Entrega únicamente el JSON anterior.
 """
 
-    return f"{preamble}\n{body}"
+    return f"{ctx['preamble']}\n{body}"
 
 
-def generate_report_via_ai(user_data: dict) -> dict:
-    try:
-        prompt = generate_skyai_prompt(user_data)
+def generate_section_prompt(ctx: dict, index: int) -> str:
+    """Prompt de uma seção (modo "sections"): mesmo preâmbulo e intro, só aquela seção, Markdown puro."""
+    title = REPORT_SECTIONS[index]
+    extra = _PLAN_RULES if index == len(REPORT_SECTIONS) - 1 else ""
+    body = ctx["intro"] + f"""📑 ESCRIBE SOLO ESTA SECCIÓN del informe (las demás se redactan aparte; no las repitas):
+## {title}
 
+{extra}
+➡️ FORMATO DE SALIDA  
+Empieza exactamente con el título `## {title}` y devuelve solo el texto de la sección en Markdown — sin JSON ni bloques de código.  
+❌ No añadas saludos, despedidas, otras secciones ni notas de proceso.
+"""
+    return f"{ctx['preamble']}\n{body}"
+
+
+# ── Texto parcial do relatório (para o SSE) ────────────────
+_TEXTO_START = re.compile(r'"texto"\s*:\s*"')
+_TEXTO_END = re.compile(r'(?<!\\)"\s*[,}]')
+_ESCAPES = {"n": "\n", "t": "\t", "r": ""}
+
+
+def partial_report_text(raw: str) -> str:
+    """Valor de "texto" (já decodificado) do JSON ainda incompleto que o modelo está gerando."""
+    m = _TEXTO_START.search(raw)
+    if not m:
+        return ""
+    body = raw[m.end():]
+    end = _TEXTO_END.search(body)
+    if end:
+        body = body[: end.start()]
+    else:
+        body = body.rstrip('"\\')   # aspa final ou escape ainda pela metade
+    body = re.sub(r"\\(.)", lambda e: _ESCAPES.get(e.group(1), e.group(1)), body, flags=re.S)
+    return re.sub(r"(?:\\)+n", "\n", body)   # mesma limpeza de /relatorio
+
+
+def generate_report_via_ai(
+    user_data: dict,
+    astro: dict | None = None,
+    on_text: Callable[[str], None] | None = None,
+    use_cache: bool = True,
+) -> dict:
+    """Gera o relatório; `on_text(texto_parcial)` é chamado a cada pedaço recebido.
+
+    `REPORT_GENERATION_MODE=sections` → uma completion por seção, em paralelo (`report_sections`).
+    `use_cache=False` ignora respostas guardadas no `llm_cache` (gera de novo).
+    """
+    cache = REPORT_PROMPT_VERSION if use_cache else None
+    try:
         inst = current_app.instance_path
         os.makedirs(inst, exist_ok=True)
         log_path = os.path.join(inst, "prompt_log_skyai.txt")
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(f"\n\n--- {datetime.utcnow().isoformat()} Prompt ---\n")
-            f.write(prompt)
-            f.write("\n--- End Prompt ---\n")
-
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise RuntimeError("OPENAI_API_KEY not set.")
 
         # Idioma configurável (default: es)
         LANG = os.getenv("REPORT_LANG", "es").lower()
@@ -193,18 +313,36 @@ def generate_report_via_ai(user_data: dict) -> dict:
             else "You are SkyAI, astrologer and numerologist. Always answer in the requested language."
         )
 
-        client = OpenAI(api_key=api_key)
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
+        if report_sections.enabled():
+            return _generate_report_by_sections(user_data, astro, system_msg, log_path, on_text, cache)
+
+        prompt = generate_skyai_prompt(user_data, astro)
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(f"\n\n--- {datetime.utcnow().isoformat()} Prompt ---\n")
+            f.write(prompt)
+            f.write("\n--- End Prompt ---\n")
+
+        result = llm_gateway.LLMResult()
+        parts = []
+        for chunk in llm_gateway.stream(
+            [
                 {"role": "system", "content": system_msg},
                 {"role": "user", "content": prompt},
             ],
+            model="gpt-4",
             temperature=0.85,
             max_tokens=2200,
-        )
-
-        raw_output = response.choices[0].message.content.strip()
+            purpose="report",
+            user_email=user_data.get("email"),
+            result=result,
+            cache=cache,
+        ):
+            if on_text is not None:
+                parts.append(chunk)
+                on_text(partial_report_text("".join(parts)))
+        raw_output = result.text.strip()
+        if result.cached:
+            current_app.logger.info("[AI] Relatório servido do cache (%s)", result.cache_key[:12])
 
         # ── Registrar saída bruta ────────────────────────────────────────────
         with open(log_path, "a", encoding="utf-8") as f:
@@ -243,6 +381,7 @@ def generate_report_via_ai(user_data: dict) -> dict:
             parsed = json.loads(result_text)
         except json.JSONDecodeError:
             current_app.logger.warning("[AI WARNING] Response was not JSON. Saving raw text.")
+            llm_cache.forget(result.cache_key)   # não servir de novo a resposta quebrada
             return {
                 "erro": None,
                 "texto": result_text,
@@ -254,6 +393,9 @@ def generate_report_via_ai(user_data: dict) -> dict:
                 "expression": None,
             }
 
+        if not parsed.get("sun_sign"):       # o job rejeita → não guardar a resposta
+            llm_cache.forget(result.cache_key)
+
         # ── Correção para duplicação do plano 30 dias (EN/ES) ───────────────
         texto = parsed.get("texto", "") or ""
         if texto.count("30-Day Action Plan") > 1 or texto.count("Plan de Acción de 30 Días") > 1:
@@ -292,3 +434,46 @@ def generate_report_via_ai(user_data: dict) -> dict:
             "soul_urge": None,
             "expression": None,
         }
+
+
+def _generate_report_by_sections(user_data, astro, system_msg, log_path, on_text, cache=None) -> dict:
+    """Modo "sections": sete completions menores com o mesmo preâmbulo, montadas no mesmo `texto`."""
+    ctx = build_report_context(user_data, astro)
+    sections = [
+        (title, [
+            {"role": "system", "content": system_msg},
+            {"role": "user", "content": generate_section_prompt(ctx, i)},
+        ])
+        for i, title in enumerate(REPORT_SECTIONS)
+    ]
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(f"\n\n--- {datetime.utcnow().isoformat()} Prompt (sections, {len(sections)}×) ---\n")
+        f.write(sections[0][1][1]["content"])
+        f.write("\n--- End Prompt ---\n")
+
+    texto = report_sections.generate(
+        sections,
+        model="gpt-4",
+        temperature=0.85,
+        user_email=user_data.get("email"),
+        on_text=on_text,
+        app=current_app._get_current_object(),
+        cache=cache,
+    )
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write("--- RAW OUTPUT (sections) ---\n")
+        f.write(texto + "\n")
+        f.write("--- End RAW ---\n")
+
+    # Campos fixos do JSON vêm direto do mapa e da numerologia (antes o modelo os copiava)
+    positions, nume = ctx["astro"]["positions"], ctx["nume"]
+    return {
+        "erro": None,
+        "texto": texto,
+        "sun_sign": positions["SUN"]["sign"],
+        "moon_sign": positions["MOON"]["sign"],
+        "ascendant": positions["ASC"]["sign"],
+        "life_path": str(nume["life_path"]),
+        "soul_urge": str(nume["soul_urge"]),
+        "expression": str(nume["expression"]),
+    }
@@ -0,0 +1,214 @@
+# app/services/report_sections.py
+"""
+Relatório por seções, em paralelo, para Sky.AI
+==============================================
+
+No modo padrão (`REPORT_GENERATION_MODE=single`) o relatório é uma única
+completion com as sete seções `##` dentro do JSON: a latência cresce com o
+tamanho da resposta e qualquer falha no meio joga tudo fora. Com
+`REPORT_GENERATION_MODE=sections`, `perfil_service` monta um prompt por
+seção (mesmo preâmbulo de valores precomputados, que fica como prefixo
+comum — bom para o cache de prompt do OpenAI) e este módulo:
+
+• roda as seções **em paralelo** num pool pequeno e compartilhado;
+• dá a cada tentativa de seção um **prazo** (`REPORT_SECTION_TIMEOUT`):
+  vale para o stream inteiro, não só para a conexão;
+• **refaz só a seção** que falhou ou estourou o prazo, até
+  `REPORT_SECTION_RETRIES` vezes — as outras seções não são geradas de
+  novo; se alguma esgotar as tentativas, levanta `SectionError` (o job do
+  relatório então volta para a fila);
+• junta as seções **na ordem** (`\\n\\n` entre elas) e, enquanto isso,
+  repassa ao `on_text` o trecho já ordenado (seções prontas + a primeira
+  ainda em andamento), para o SSE da tela de carregamento.
+
+Cada seção vira uma linha no ledger do `llm_gateway`
+(`purpose = "report_s1"` … `"report_s7"`) e tem sua própria entrada no
+`llm_cache` (com `cache=<versão>`): seção já gerada não é refeita.
+
+Variáveis de ambiente
+---------------------
+REPORT_GENERATION_MODE    → "single" (padrão) ou "sections"
+REPORT_SECTION_WORKERS    → seções simultâneas por processo (padrão 7)
+REPORT_SECTION_TIMEOUT    → prazo de cada tentativa de seção, em segundos (padrão 45)
+REPORT_SECTION_RETRIES    → novas tentativas por seção (padrão 2)
+REPORT_SECTION_MAX_TOKENS → max_tokens de cada seção (padrão 700)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, List, Mapping, Optional, Sequence, Tuple
+
+from app.services import llm_cache, llm_gateway
+
+logger = logging.getLogger(__name__)
+
+REPORT_GENERATION_MODE = os.getenv("REPORT_GENERATION_MODE", "single").strip().lower()
+REPORT_SECTION_WORKERS = max(1, int(os.getenv("REPORT_SECTION_WORKERS", "7")))
+REPORT_SECTION_TIMEOUT = float(os.getenv("REPORT_SECTION_TIMEOUT", "45"))
+REPORT_SECTION_RETRIES = max(0, int(os.getenv("REPORT_SECTION_RETRIES", "2")))
+REPORT_SECTION_MAX_TOKENS = int(os.getenv("REPORT_SECTION_MAX_TOKENS", "700"))
+
+Messages = List[Mapping[str, str]]
+
+
+class SectionError(RuntimeError):
+    """Seção que falhou em todas as tentativas."""
+
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_PID = 0
+_POOL_LOCK = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _POOL, _POOL_PID
+    if _POOL is None or _POOL_PID != os.getpid():   # threads não sobrevivem ao fork
+        with _POOL_LOCK:
+            if _POOL is None or _POOL_PID != os.getpid():
+                _POOL = ThreadPoolExecutor(max_workers=REPORT_SECTION_WORKERS, thread_name_prefix="section")
+                _POOL_PID = os.getpid()
+    return _POOL
+
+
+def enabled() -> bool:
+    return REPORT_GENERATION_MODE == "sections"
+
+
+def clean_section(title: str, text: str) -> str:
+    """Garante o título `## title` no início e corta qualquer outra seção que o modelo tenha emendado."""
+    text = text.replace("```markdown", "").replace("```", "").strip()
+    if not text.startswith("##"):
+        text = f"## {title}\n{text}"
+    nxt = text.find("\n## ", 2)
+    return text[:nxt].rstrip() if nxt != -1 else text
+
+
+# ── Progresso ordenado (para o SSE) ───────────────────────
+
+class _Progress:
+    """Texto já utilizável: seções prontas, na ordem, + a primeira em andamento."""
+
+    def __init__(self, n: int, on_text: Optional[Callable[[str], None]]) -> None:
+        self.parts: List[List[str]] = [[] for _ in range(n)]
+        self.done = [False] * n
+        self.on_text = on_text
+        self.lock = threading.Lock()
+
+    def _visible(self, i: int) -> bool:
+        return all(self.done[:i])
+
+    def _emit(self) -> None:
+        out = []
+        for parts, done in zip(self.parts, self.done):
+            text = "".join(parts).strip()
+            if text:
+                out.append(text)
+            if not done:
+                break
+        self.on_text("\n\n".join(out))
+
+    def append(self, i: int, chunk: str) -> None:
+        with self.lock:
+            self.parts[i].append(chunk)
+            if self.on_text is not None and self._visible(i):
+                self._emit()
+
+    def reset(self, i: int) -> None:
+        with self.lock:
+            self.parts[i] = []
+
+    def finish(self, i: int, text: str) -> None:
+        with self.lock:
+            self.parts[i] = [text]
+            self.done[i] = True
+            if self.on_text is not None and self._visible(i):
+                self._emit()
+
+
+# ── Execução ──────────────────────────────────────────────
+
+def _attempt(i: int, messages: Messages, progress: _Progress, timeout: float, **llm) -> llm_gateway.LLMResult:
+    """Uma tentativa de uma seção; TimeoutError se o stream passar do prazo."""
+    deadline = time.monotonic() + timeout
+    result = llm_gateway.LLMResult()
+    gen = llm_gateway.stream(messages, result=result, timeout=timeout, max_retries=0, **llm)
+    for chunk in gen:
+        progress.append(i, chunk)
+        if time.monotonic() > deadline:
+            gen.throw(TimeoutError(f"seção passou de {timeout:g}s"))   # o ledger registra o timeout
+    return result
+
+
+def _run_section(
+    i: int,
+    title: str,
+    messages: Messages,
+    progress: _Progress,
+    timeout: float,
+    retries: int,
+    app=None,
+    **llm,
+) -> str:
+    if app is not None:
+        with app.app_context():
+            return _run_section(i, title, messages, progress, timeout, retries, **llm)
+
+    error: Optional[BaseException] = None
+    for attempt in range(1, retries + 2):
+        progress.reset(i)
+        try:
+            result = _attempt(i, messages, progress, timeout, purpose=f"report_s{i + 1}", **llm)
+            text = clean_section(title, result.text)
+            if len(text) <= len(title) + 4:
+                llm_cache.forget(result.cache_key)
+                raise ValueError("seção vazia")
+            progress.finish(i, text)
+            return text
+        except Exception as e:
+            error = e
+            logger.warning("[SECTIONS] '%s' tentativa %d/%d falhou: %s", title, attempt, retries + 1, e)
+            if attempt <= retries:
+                time.sleep(min(8.0, 2 ** (attempt - 1)) * random.uniform(0.5, 1.0))
+    raise SectionError(f"Seção '{title}' falhou {retries + 1}x: {error}")
+
+
+def generate(
+    sections: Sequence[Tuple[str, Messages]],
+    *,
+    model: str,
+    temperature: float,
+    max_tokens: int = REPORT_SECTION_MAX_TOKENS,
+    user_email: Optional[str] = None,
+    on_text: Optional[Callable[[str], None]] = None,
+    timeout: float = REPORT_SECTION_TIMEOUT,
+    retries: int = REPORT_SECTION_RETRIES,
+    app=None,
+    cache: Optional[str] = None,
+) -> str:
+    """Gera as seções (`[(título, mensagens), …]`) em paralelo e devolve o texto montado na ordem.
+
+    Passe `app` (Flask) para o ledger e os logs dentro das threads; `cache`
+    é a versão do template para o `llm_cache` (None = sem cache).
+    Levanta `SectionError` se alguma seção esgotar as tentativas.
+    """
+    t0 = time.perf_counter()
+    progress = _Progress(len(sections), on_text)
+    futures = [
+        _pool().submit(
+            _run_section, i, title, messages, progress, timeout, retries, app,
+            model=model, temperature=temperature, max_tokens=max_tokens, user_email=user_email, cache=cache,
+        )
+        for i, (title, messages) in enumerate(sections)
+    ]
+    wait(futures)
+    failed = [str(f.exception()) for f in futures if f.exception() is not None]
+    if failed:
+        raise SectionError("; ".join(failed))
+    logger.info("[SECTIONS] %d seções em %.1fs", len(sections), time.perf_counter() - t0)
+    return "\n\n".join(f.result() for f in futures)
@@ -0,0 +1,270 @@
+# app/services/returns_service.py
+"""
+Revolução solar e progressões secundárias para Sky.AI
+=====================================================
+
+Revolução solar
+---------------
+Instante exato em que o Sol volta à longitude natal, ano a ano. O palpite
+`JD natal + ano trópico × idade` erra menos de um dia; a raiz sai por
+Newton com salvaguarda (`transit_service.solve_brackets`, derivada = a
+velocidade do Sol) num intervalo de ±`RETURN_WINDOW` dias. É tudo
+vetorizado: N nascimentos × M anos andam juntos em cada iteração de Newton
+via `body_positions` — com as tabelas (`EPHEMERIS_TABLES_PATH`) milhões de
+retornos saem em segundos; sem elas cai no `swe.calc_ut` ponto a ponto.
+
+O "ano" de um retorno é o ano (UT) do aniversário perto do qual ele cai.
+
+Progressões secundárias
+-----------------------
+"Um dia por ano": o céu `idade` dias depois do nascimento (idade em anos
+trópicos) descreve aquela idade. `progressed_positions` também é
+vetorizado (N nascimentos, cada um na sua data).
+
+Lote
+----
+`returns_many` devolve, além do JD, a Lua e o ASC do mapa de cada retorno
+no local de nascimento; `precompute_returns.py` grava tudo na tabela
+`solar_returns` (`store_returns` / `load_returns`).
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import swisseph as swe
+
+from app.services import ephemeris_executor
+from app.services.astrology_service import (
+    BODIES,
+    SIGNS,
+    compute_chart,
+    get_timezone,
+    get_zoneinfo,
+    jd_from_utc,
+)
+from app.services.ephemeris_tables import body_positions
+from app.services.transit_service import solve_brackets, utc_from_jd
+
+logger = logging.getLogger(__name__)
+
+TROPICAL_YEAR = 365.242189   # dias
+RETURN_WINDOW = 3.0          # ± dias em volta do palpite (o Sol anda ~6°)
+PROGRESSION_BODIES: List[str] = list(BODIES)
+
+
+def _wrap(delta: np.ndarray) -> np.ndarray:
+    return (delta + 180.0) % 360.0 - 180.0
+
+
+def _sign_fields(lon: float) -> Dict[str, float | str]:
+    return {
+        "longitude": round(lon, 6),
+        "sign": SIGNS[int(lon / 30.0) % 12],
+        "degree": round(math.fmod(lon, 30.0), 4),
+    }
+
+
+def _birth_years(jd_birth: np.ndarray) -> np.ndarray:
+    return np.array([swe.revjul(float(jd), swe.GREG_CAL)[0] for jd in jd_birth], dtype=np.int64)
+
+
+# ── Núcleo vetorizado ─────────────────────────────────────
+
+def solar_returns(
+    jd_birth,
+    years,
+    natal_sun=None,
+    fast: Optional[bool] = None,
+) -> np.ndarray:
+    """JD UT do retorno solar de cada nascimento em cada ano: `(N, M)`.
+
+    `natal_sun`: longitude natal do Sol `(N,)` (calculada se omitida).
+    `fast` vai para `body_positions`.
+    """
+    jd_birth = np.atleast_1d(np.asarray(jd_birth, dtype=float))
+    years = np.atleast_1d(np.asarray(years, dtype=np.int64))
+    if natal_sun is None:
+        natal_sun = body_positions(jd_birth, ["SUN"], fast=fast)[0][:, 0]
+    natal_sun = np.atleast_1d(np.asarray(natal_sun, dtype=float))
+    shape = (len(jd_birth), len(years))
+    if not jd_birth.size or not years.size:
+        return np.empty(shape)
+
+    guess = jd_birth[:, None] + TROPICAL_YEAR * (years[None, :] - _birth_years(jd_birth)[:, None])
+    guess = guess.ravel()
+    target = np.repeat(natal_sun, len(years))
+    a, b = guess - RETURN_WINDOW, guess + RETURN_WINDOW
+    lon_ab = body_positions(np.concatenate([a, b]), ["SUN"], fast=fast)[0][:, 0]
+
+    def fn(x: np.ndarray, idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        lon, speed = body_positions(x, ["SUN"], fast=fast)
+        return _wrap(lon[:, 0] - target[idx]), speed[:, 0]
+
+    jd, _ = solve_brackets(fn, a, b, _wrap(lon_ab[: len(a)] - target), _wrap(lon_ab[len(a) :] - target))
+    return jd.reshape(shape)
+
+
+def progressed_jd(jd_birth, target_jd) -> np.ndarray:
+    """JD do céu progredido: um dia depois do nascimento por ano de idade."""
+    jd_birth = np.asarray(jd_birth, dtype=float)
+    return jd_birth + (np.asarray(target_jd, dtype=float) - jd_birth) / TROPICAL_YEAR
+
+
+def progressed_positions(
+    jd_birth,
+    target_jd,
+    bodies: Sequence[str] = PROGRESSION_BODIES,
+    fast: Optional[bool] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Longitude e velocidade progredidas `(N, corpos)`; N nascimentos × datas alvo."""
+    jd = np.atleast_1d(progressed_jd(jd_birth, target_jd))
+    return body_positions(jd, list(bodies), fast=fast)
+
+
+def _ascendants(jd: np.ndarray, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    # O ASC não depende do sistema de casas; Porphyry nunca falha (círculo polar)
+    out = np.empty(len(jd))
+    for i, (t, la, lo) in enumerate(zip(jd, lat, lon)):
+        out[i] = swe.houses(float(t), float(la), float(lo), b"O")[1][0]
+    return out
+
+
+def returns_many(jd_birth, lat, lon, years, fast: Optional[bool] = None) -> Dict[str, np.ndarray]:
+    """Lote: retorno + Lua e ASC do mapa do retorno no local de nascimento.
+
+    Devolve `jd`, `moon` e `asc`, cada um `(N, M)`. Rode dentro do
+    `ephemeris_executor` (ex. `ephemeris_executor.run(returns_many, …, timeout=0)`).
+    """
+    jd = solar_returns(jd_birth, years, fast=fast)
+    flat = jd.ravel()
+    m = jd.shape[1]
+    moon = body_positions(flat, ["MOON"], fast=fast)[0][:, 0] if flat.size else np.empty(0)
+    asc = _ascendants(flat, np.repeat(np.asarray(lat, dtype=float), m), np.repeat(np.asarray(lon, dtype=float), m))
+    return {"jd": jd, "moon": moon.reshape(jd.shape), "asc": asc.reshape(jd.shape)}
+
+
+# ── Um mapa ───────────────────────────────────────────────
+
+def get_solar_return(
+    astro: Dict[str, object],
+    year: int,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    timeout: Optional[float] = None,
+) -> Dict[str, object]:
+    """Revolução solar completa de `year` (mapa natal de `get_astrological_data`).
+
+    `lat`/`lon` relocam o mapa do retorno (padrão: local de nascimento).
+    Devolve `jd_ut`, `utc`, `local` (ISO, fuso do local), `positions`,
+    `aspects` e `houses` como em `get_astrological_data`.
+    """
+    jd = float(
+        ephemeris_executor.run(
+            solar_returns,
+            [astro["jd_ut"]],
+            [year],
+            natal_sun=[astro["positions"]["SUN"]["longitude"]],
+            timeout=timeout,
+        )[0, 0]
+    )
+    if lat is None or lon is None:
+        lat, lon, tz_str = astro["coords"]["lat"], astro["coords"]["lon"], astro["timezone"]
+    else:
+        tz_str = get_timezone(lat, lon)
+    positions, aspects, houses = ephemeris_executor.run(compute_chart, jd, lat, lon, timeout=timeout)
+    utc = utc_from_jd(jd)
+    return {
+        "year": year,
+        "jd_ut": jd,
+        "utc": utc.isoformat(),
+        "local": utc.astimezone(get_zoneinfo(tz_str)).isoformat(),
+        "timezone": tz_str,
+        "positions": positions,
+        "aspects": aspects,
+        "houses": houses,
+    }
+
+
+def get_progressions(
+    astro: Dict[str, object],
+    on: Optional[date] = None,
+    timeout: Optional[float] = None,
+) -> Dict[str, object]:
+    """Posições progredidas para a data `on` (padrão: hoje, UTC)."""
+    on = on or datetime.now(timezone.utc).date()
+    target_jd = jd_from_utc(datetime(on.year, on.month, on.day, tzinfo=timezone.utc))
+    jd_birth = float(astro["jd_ut"])
+    lon, speed = ephemeris_executor.run(progressed_positions, jd_birth, target_jd, timeout=timeout)
+    return {
+        "date": on.isoformat(),
+        "age": round((target_jd - jd_birth) / TROPICAL_YEAR, 2),
+        "progressed_jd": float(progressed_jd(jd_birth, target_jd)),
+        "positions": {
+            body: {**_sign_fields(float(lon[0, j])), "retrograde": bool(speed[0, j] < 0)}
+            for j, body in enumerate(PROGRESSION_BODIES)
+        },
+    }
+
+
+# ── Banco ─────────────────────────────────────────────────
+
+def store_returns(session_ids: Sequence[int], years: Sequence[int], result: Dict[str, np.ndarray]) -> int:
+    """Substitui os retornos dessas sessões nesses anos (numa transação)."""
+    from sqlalchemy import delete, insert
+    from app.main import db
+    from app.models import SolarReturn
+
+    table = SolarReturn.__table__
+    rows = [
+        {
+            "session_id": int(sid),
+            "year": int(year),
+            "jd": float(result["jd"][i, j]),
+            "moon_longitude": round(float(result["moon"][i, j]), 6),
+            "asc_longitude": round(float(result["asc"][i, j]), 6),
+        }
+        for i, sid in enumerate(session_ids)
+        for j, year in enumerate(years)
+    ]
+    with db.engine.begin() as conn:
+        conn.execute(
+            delete(table).where(
+                table.c.session_id.in_([int(s) for s in session_ids]),
+                table.c.year.in_([int(y) for y in years]),
+            )
+        )
+        if rows:
+            conn.execute(insert(table), rows)
+    return len(rows)
+
+
+def load_returns(session_id: int) -> List[Dict[str, object]]:
+    """Retornos pré‑calculados da sessão, por ano ([] se não houver)."""
+    from sqlalchemy import select
+    from app.main import db
+    from app.models import SolarReturn
+
+    table = SolarReturn.__table__
+    try:
+        with db.engine.connect() as conn:
+            rows = conn.execute(
+                select(table).where(table.c.session_id == session_id).order_by(table.c.year)
+            ).fetchall()
+    except Exception as e:
+        logger.warning("[RETURNS] Falha ao ler retornos da sessão %s: %s", session_id, e)
+        return []
+    return [
+        {
+            "year": r.year,
+            "jd_ut": r.jd,
+            "utc": utc_from_jd(r.jd).isoformat(),
+            "moon_sign": SIGNS[int(r.moon_longitude / 30.0) % 12],
+            "asc_sign": SIGNS[int(r.asc_longitude / 30.0) % 12],
+        }
+        for r in rows
+    ]
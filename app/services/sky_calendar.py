@@ -0,0 +1,382 @@
+# app/services/sky_calendar.py
+"""
+Calendário global do céu para Sky.AI
+====================================
+
+Ingressos em signos, estações (retrógrado/direto), luas novas/cheias e
+eclipses são **iguais para todos os usuários**. Calculamos uma vez por ano,
+guardamos na tabela `sky_events` e servimos da memória com consultas por
+intervalo — relatório, Guru e painel citam datas reais a custo zero.
+
+Como cada tipo é encontrado (varredura diária + refinamento de raízes,
+ver `transit_service.solve_brackets`):
+
+• ingresso  → passagens da longitude pelas cúspides 0°, 30°, … 330°
+• estação   → troca de sinal da velocidade (bissecção no Swiss Ephemeris)
+• lunação   → elongação Lua − Sol = 0° (nova) / 180° (cheia)
+• eclipse   → `swe.sol_eclipse_when_glob` / `swe.lun_eclipse_when`
+
+A varredura usa as tabelas interpoladas quando houver; o refinamento
+final é sempre no `swe.calc_ut` (é feito uma vez por ano).
+
+Níveis: índice em memória por ano → tabela `sky_events` (só dentro de app
+context) → cálculo na hora (e grava no banco). `build_sky_calendar.py`
+pré‑calcula vários anos de uma vez.
+
+Variáveis de ambiente
+---------------------
+SKY_CALENDAR_DB  → "0" desliga o nível de banco
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import swisseph as swe
+
+from app.services import ephemeris_executor
+from app.services.astrology_service import SIGNS, jd_from_utc
+from app.services.ephemeris_tables import body_positions
+from app.services.transit_service import longitude_crossings, solve_brackets, utc_from_jd
+
+logger = logging.getLogger(__name__)
+
+SKY_CALENDAR_DB = os.getenv("SKY_CALENDAR_DB", "1") != "0"
+
+INGRESS_BODIES = [
+    "SUN", "MERCURY", "VENUS", "MARS", "JUPITER",
+    "SATURN", "URANUS", "NEPTUNE", "PLUTO",
+]
+STATION_BODIES = INGRESS_BODIES[1:]   # o Sol nunca retrograda
+
+KINDS = ("ingress", "station", "new_moon", "full_moon", "solar_eclipse", "lunar_eclipse")
+
+# Apresentação (painel / prompts em espanhol)
+BODY_NAMES_ES: Dict[str, str] = {
+    "SUN": "Sol", "MOON": "Luna", "MERCURY": "Mercurio", "VENUS": "Venus",
+    "MARS": "Marte", "JUPITER": "Júpiter", "SATURN": "Saturno",
+    "URANUS": "Urano", "NEPTUNE": "Neptuno", "PLUTO": "Plutón",
+}
+SIGNS_ES: List[str] = [
+    "Aries", "Tauro", "Géminis", "Cáncer", "Leo", "Virgo",
+    "Libra", "Escorpio", "Sagitario", "Capricornio", "Acuario", "Piscis",
+]
+ECLIPSE_TYPES_ES: Dict[str, str] = {
+    "total": "total", "annular": "anular", "hybrid": "híbrido",
+    "partial": "parcial", "penumbral": "penumbral",
+}
+
+_YEARS: Dict[int, Tuple[List[float], List[Dict[str, object]]]] = {}
+_LOCK = threading.Lock()
+
+
+def _wrap(delta: np.ndarray) -> np.ndarray:
+    return (delta + 180.0) % 360.0 - 180.0
+
+
+def year_bounds(year: int) -> Tuple[float, float]:
+    """JD UT de 1º de janeiro do ano e do seguinte."""
+    return swe.julday(year, 1, 1, 0.0), swe.julday(year + 1, 1, 1, 0.0)
+
+
+def _event(kind: str, body: str, jd: float, lon: float, detail: Optional[str] = None) -> Dict[str, object]:
+    lon = float(lon) % 360.0
+    return {
+        "kind": kind,
+        "body": body,
+        "jd": float(jd),
+        "date": utc_from_jd(jd),
+        "longitude": round(lon, 4),
+        "sign": SIGNS[int(lon / 30.0) % 12],
+        "degree": round(math.fmod(lon, 30.0), 2),
+        "detail": detail,
+    }
+
+
+# ── Cálculo ──────────────────────────────────────────────
+
+def _ingresses(jd0: float, jd1: float) -> List[Dict[str, object]]:
+    cusps = np.arange(12) * 30.0
+    events = []
+    for body in INGRESS_BODIES:
+        jd, speed, k_idx, _ = longitude_crossings(body, cusps, jd0, jd1, fast=False)
+        for t, v, k in zip(jd, speed, k_idx):
+            if not jd0 <= t < jd1:
+                continue
+            # Retrógrado atravessa a cúspide "para trás": entra no signo anterior
+            lon = cusps[k] + (1e-6 if v >= 0 else -1e-6)
+            events.append(_event("ingress", body, t, lon, "retrograde" if v < 0 else None))
+    return events
+
+
+def _stations(jd0: float, jd1: float) -> List[Dict[str, object]]:
+    grid = np.arange(jd0 - 1.0, jd1 + 1.0, 1.0)
+    events = []
+    for body in STATION_BODIES:
+        speed = body_positions(grid, [body])[1][:, 0]
+        t_idx = np.flatnonzero(np.signbit(speed[:-1]) != np.signbit(speed[1:]))
+        if not len(t_idx):
+            continue
+
+        def fn(x, idx, _body=body):
+            _lon, sp = body_positions(x, [_body], fast=False)
+            return sp[:, 0], np.full(len(x), np.nan)   # sem 2ª derivada: bissecção
+
+        a, b = grid[t_idx], grid[t_idx + 1]
+        fa = body_positions(a, [body], fast=False)[1][:, 0]
+        fb = body_positions(b, [body], fast=False)[1][:, 0]
+        ok = np.signbit(fa) != np.signbit(fb)   # confirma o intervalo no swe
+        jd, _ = solve_brackets(fn, a[ok], b[ok], fa[ok], fb[ok])
+        lon = body_positions(jd, [body], fast=False)[0][:, 0]
+        for t, l, before in zip(jd, lon, fa[ok]):
+            if jd0 <= t < jd1:
+                events.append(_event("station", body, t, l, "retrograde" if before > 0 else "direct"))
+    return events
+
+
+def _lunations(jd0: float, jd1: float) -> List[Dict[str, object]]:
+    grid = np.arange(jd0 - 1.0, jd1 + 1.0, 0.5)
+    lon, _ = body_positions(grid, ["MOON", "SUN"])
+    elong = lon[:, 0] - lon[:, 1]
+    events = []
+    for kind, target in (("new_moon", 0.0), ("full_moon", 180.0)):
+        f = _wrap(elong - target)
+        t_idx = np.flatnonzero(
+            (np.signbit(f[:-1]) != np.signbit(f[1:])) & (np.abs(f[1:] - f[:-1]) < 180.0)
+        )
+
+        def fn(x, idx, _target=target):
+            l, sp = body_positions(x, ["MOON", "SUN"], fast=False)
+            return _wrap(l[:, 0] - l[:, 1] - _target), sp[:, 0] - sp[:, 1]
+
+        jd, _ = solve_brackets(fn, grid[t_idx], grid[t_idx + 1], f[t_idx], f[t_idx + 1])
+        moon = body_positions(jd, ["MOON"], fast=False)[0][:, 0]
+        events += [_event(kind, "MOON", t, l) for t, l in zip(jd, moon) if jd0 <= t < jd1]
+    return events
+
+
+def _eclipse_type(flags: int, lunar: bool) -> str:
+    if flags & swe.ECL_TOTAL:
+        return "total"
+    if not lunar and flags & swe.ECL_ANNULAR_TOTAL:
+        return "hybrid"
+    if not lunar and flags & swe.ECL_ANNULAR:
+        return "annular"
+    if lunar and flags & swe.ECL_PENUMBRAL:
+        return "penumbral"
+    return "partial"
+
+
+def _eclipses(jd0: float, jd1: float) -> List[Dict[str, object]]:
+    events = []
+    for kind, body, search, lunar in (
+        ("solar_eclipse", "SUN", swe.sol_eclipse_when_glob, False),
+        ("lunar_eclipse", "MOON", swe.lun_eclipse_when, True),
+    ):
+        t = jd0
+        while True:
+            flags, tret = search(t, swe.FLG_SWIEPH, 0, False)
+            peak = tret[0]
+            if peak >= jd1:
+                break
+            lon = swe.calc_ut(peak, swe.MOON if lunar else swe.SUN, swe.FLG_SWIEPH)[0][0]
+            events.append(_event(kind, body, peak, lon, _eclipse_type(flags, lunar)))
+            t = peak + 1.0
+    return events
+
+
+def compute_year(year: int) -> List[Dict[str, object]]:
+    """Todos os eventos do ano (UT), ordenados por data."""
+    jd0, jd1 = year_bounds(year)
+    events = _ingresses(jd0, jd1) + _stations(jd0, jd1) + _lunations(jd0, jd1) + _eclipses(jd0, jd1)
+    events.sort(key=lambda e: e["jd"])
+    return events
+
+
+# ── Nível de banco ────────────────────────────────────────
+
+def _db_enabled() -> bool:
+    if not SKY_CALENDAR_DB:
+        return False
+    from flask import has_app_context
+
+    return has_app_context()
+
+
+def _db_load(year: int) -> Optional[List[Dict[str, object]]]:
+    from sqlalchemy import select
+    from app.main import db
+    from app.models import SkyEvent
+
+    table = SkyEvent.__table__
+    try:
+        with db.engine.connect() as conn:
+            rows = conn.execute(
+                select(table).where(table.c.year == year).order_by(table.c.jd)
+            ).fetchall()
+    except Exception as e:
+        logger.warning("[SKY CALENDAR] Falha ao ler eventos de %s: %s", year, e)
+        return None
+    if not rows:
+        return None
+    return [
+        {
+            "kind": r.kind,
+            "body": r.body,
+            "jd": r.jd,
+            "date": utc_from_jd(r.jd),
+            "longitude": r.longitude,
+            "sign": r.sign,
+            "degree": round(math.fmod(r.longitude, 30.0), 2),
+            "detail": r.detail,
+        }
+        for r in rows
+    ]
+
+
+def store_year(year: int, events: Sequence[Dict[str, object]]) -> None:
+    """Substitui os eventos do ano no banco (numa transação)."""
+    from sqlalchemy import delete, insert
+    from app.main import db
+    from app.models import SkyEvent
+
+    table = SkyEvent.__table__
+    rows = [
+        {
+            "year": year,
+            "jd": e["jd"],
+            "kind": e["kind"],
+            "body": e["body"],
+            "sign": e["sign"],
+            "longitude": e["longitude"],
+            "detail": e["detail"],
+        }
+        for e in events
+    ]
+    with db.engine.begin() as conn:
+        conn.execute(delete(table).where(table.c.year == year))
+        if rows:
+            conn.execute(insert(table), rows)
+
+
+# ── API pública ───────────────────────────────────────────
+
+def _year_index(year: int) -> Tuple[List[float], List[Dict[str, object]]]:
+    cached = _YEARS.get(year)
+    if cached is not None:
+        return cached
+
+    with _LOCK:
+        cached = _YEARS.get(year)
+        if cached is not None:
+            return cached
+
+        use_db = _db_enabled()
+        events = _db_load(year) if use_db else None
+        if events is None:
+            # Um ano inteiro de uma vez (sem prazo); as chamadas internas reentram
+            events = ephemeris_executor.run(compute_year, year, timeout=0)
+            if use_db:
+                try:
+                    store_year(year, events)
+                except Exception as e:
+                    logger.warning("[SKY CALENDAR] Falha ao gravar eventos de %s: %s", year, e)
+        _YEARS[year] = ([e["jd"] for e in events], events)
+        return _YEARS[year]
+
+
+def events_for_year(year: int) -> List[Dict[str, object]]:
+    """Eventos do ano: memória → banco → cálculo (gravando no banco)."""
+    return _year_index(year)[1]
+
+
+def events_between(
+    start: datetime,
+    end: datetime,
+    kinds: Optional[Iterable[str]] = None,
+    bodies: Optional[Iterable[str]] = None,
+) -> List[Dict[str, object]]:
+    """Eventos com data em `[start, end)`, opcionalmente filtrados."""
+    jd0 = jd_from_utc(start.astimezone(timezone.utc))
+    jd1 = jd_from_utc(end.astimezone(timezone.utc))
+    kinds = set(kinds) if kinds else None
+    bodies = set(bodies) if bodies else None
+
+    out: List[Dict[str, object]] = []
+    for year in range(start.astimezone(timezone.utc).year, end.astimezone(timezone.utc).year + 1):
+        jds, events = _year_index(year)
+        for e in events[bisect_left(jds, jd0) : bisect_right(jds, jd1)]:
+            if e["jd"] >= jd1:
+                continue
+            if kinds and e["kind"] not in kinds:
+                continue
+            if bodies and e["body"] not in bodies:
+                continue
+            out.append(e)
+    return out
+
+
+def upcoming(
+    days: int = 90,
+    kinds: Optional[Iterable[str]] = None,
+    bodies: Optional[Iterable[str]] = None,
+    limit: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> List[Dict[str, object]]:
+    """Próximos eventos a partir de agora."""
+    now = now or datetime.now(timezone.utc)
+    events = events_between(now, now + timedelta(days=days), kinds, bodies)
+    return events[:limit] if limit else events
+
+
+def highlights(
+    days: int = 365,
+    limit: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> List[Dict[str, object]]:
+    """Eventos marcantes: eclipses, estações e ingressos de Marte em diante."""
+    slow = {"MARS", "JUPITER", "SATURN", "URANUS", "NEPTUNE", "PLUTO"}
+    events = [
+        e
+        for e in upcoming(days, now=now)
+        if e["kind"] in ("station", "solar_eclipse", "lunar_eclipse")
+        or (e["kind"] == "ingress" and e["body"] in slow)
+    ]
+    return events[:limit] if limit else events
+
+
+def describe(event: Dict[str, object]) -> str:
+    """Frase curta em espanhol, ex. "Mercurio estación retrógrada a 8.3° de Sagitario"."""
+    body = BODY_NAMES_ES.get(event["body"], event["body"])
+    sign = SIGNS_ES[SIGNS.index(event["sign"])]
+    where = f"a {event['degree']:.1f}° de {sign}"
+    kind = event["kind"]
+    if kind == "ingress":
+        retro = " (retrógrado)" if event["detail"] == "retrograde" else ""
+        return f"{body} ingresa en {sign}{retro}"
+    if kind == "station":
+        state = "retrógrada" if event["detail"] == "retrograde" else "directa"
+        return f"{body} estación {state} {where}"
+    if kind == "new_moon":
+        return f"Luna nueva {where}"
+    if kind == "full_moon":
+        return f"Luna llena {where}"
+    eclipse = "Eclipse solar" if kind == "solar_eclipse" else "Eclipse lunar"
+    return f"{eclipse} {ECLIPSE_TYPES_ES.get(event['detail'], event['detail'])} {where}"
+
+
+def format_events(events: Sequence[Dict[str, object]]) -> str:
+    """Linhas para prompts: "  - 2026-11-09 — Mercurio estación retrógrada …"."""
+    return "\n".join(f"  - {e['date']:%Y-%m-%d} — {describe(e)}" for e in events)
+
+
+def clear_memory_cache() -> None:
+    with _LOCK:
+        _YEARS.clear()
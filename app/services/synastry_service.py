@@ -0,0 +1,222 @@
+# app/services/synastry_service.py
+"""
+Motor de sinastria (NumPy) para Sky.AI
+======================================
+
+Compara dois mapas de `get_astrological_data` aspecto a aspecto, em vez de
+só os nomes dos signos de Sol/Lua/ASC:
+
+• **matriz cruzada** 11 × 11 corpos (A × B) × 6 aspectos alvo num único
+  *broadcast* (`aspect_engine.separation_matrix` + `match_aspects`), com os
+  mesmos orbes dos aspectos natais;
+• **pontuação ponderada** 0–100: cada aspecto contribui
+  `peso(corpo A) × peso(corpo B) × natureza do aspecto × exatidão`
+  (exatidão = 1 − orbe/orbe máximo); a soma passa por um `tanh` centrado
+  em 50 (sem aspectos → 50);
+• **resumo compacto** para o prompt de compatibilidade (`format_synastry`);
+• **um contra muitos** (`score_many`): um mapa contra uma matriz `(N, 11)`
+  de longitudes guardadas, em blocos, sem o tensor 4‑D (ver `_raw_many`).
+
+Natureza dos aspectos: trígono/sextil harmônicos, quadratura/oposição/
+quincúncio tensos; conjunção é harmônica, exceto com Marte, Saturno ou
+Plutão (`HARD_BODIES`).
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+from app.services.aspect_engine import Orbs, match_aspects, orb_matrix, separation_matrix
+from app.services.astrology_service import ASPECTS_LIST
+
+SYNASTRY_BODIES: List[str] = [
+    "SUN", "MOON", "MERCURY", "VENUS", "MARS", "JUPITER",
+    "SATURN", "URANUS", "NEPTUNE", "PLUTO", "ASC",
+]
+
+# Peso de cada corpo numa relação (luminares, Vênus/Marte e ASC pesam mais)
+BODY_WEIGHTS: Dict[str, float] = {
+    "SUN": 3.0, "MOON": 3.0, "VENUS": 2.5, "MARS": 2.0, "ASC": 2.0,
+    "MERCURY": 1.5, "JUPITER": 1.0, "SATURN": 1.0,
+    "URANUS": 0.5, "NEPTUNE": 0.5, "PLUTO": 0.5,
+}
+# Natureza de cada aspecto (+ harmônico, − tenso)
+ASPECT_WEIGHTS: Dict[str, float] = {
+    "Conjunction": 0.6,
+    "Sextile": 0.8,
+    "Square": -0.7,
+    "Trine": 1.0,
+    "Quincunx": -0.3,
+    "Opposition": -0.4,
+}
+HARD_BODIES = frozenset({"MARS", "SATURN", "PLUTO"})
+HARD_CONJUNCTION_WEIGHT = -0.3
+
+# Soma ponderada que leva a pontuação a ~88 (tanh(1) ≈ 0,76); em pares
+# aleatórios o p5–p95 da soma fica em ≈ −5 … +25 → pontuação ≈ 39 … 88
+SCORE_SCALE = 25.0
+
+_TARGETS = np.array([t for t, _ in ASPECTS_LIST], dtype=float)
+_ASPECT_NAMES = [n for _, n in ASPECTS_LIST]
+
+
+def _nature_matrix() -> np.ndarray:
+    """Natureza `(11, 11, k)` de cada (corpo A, corpo B, aspecto)."""
+    n = len(SYNASTRY_BODIES)
+    nature = np.broadcast_to(np.array([ASPECT_WEIGHTS[a] for a in _ASPECT_NAMES]), (n, n, len(_ASPECT_NAMES))).copy()
+    conj = _ASPECT_NAMES.index("Conjunction")
+    hard = np.array([b in HARD_BODIES for b in SYNASTRY_BODIES])
+    nature[hard[:, None] | hard[None, :], conj] = HARD_CONJUNCTION_WEIGHT
+    return nature
+
+
+_WEIGHTS = np.array([BODY_WEIGHTS[b] for b in SYNASTRY_BODIES])
+_PAIR_WEIGHTS = _WEIGHTS[:, None] * _WEIGHTS[None, :]
+_NATURE = _nature_matrix()
+
+
+def chart_longitudes(astro: Mapping[str, object]) -> np.ndarray:
+    """Longitudes `(11,)` na ordem de `SYNASTRY_BODIES` (saída de `get_astrological_data`)."""
+    positions = astro["positions"]
+    return np.array([positions[b]["longitude"] for b in SYNASTRY_BODIES], dtype=float)
+
+
+def stack_longitudes(charts: Iterable[Mapping[str, object]]) -> np.ndarray:
+    """Matriz `(N, 11)` para `score_many`."""
+    return np.array([chart_longitudes(c) for c in charts], dtype=float).reshape(-1, len(SYNASTRY_BODIES))
+
+
+# ── Núcleo vetorizado ─────────────────────────────────────
+
+def _contributions(lon_a: np.ndarray, lon_b: np.ndarray, orb_max: np.ndarray):
+    """`(..., 11, 11, k)`: aspectos encontrados, orbes e contribuição de cada um."""
+    sep = separation_matrix(lon_a, lon_b)
+    hits, orbs = match_aspects(sep, orb_max, _TARGETS)
+    exactness = np.clip(1.0 - orbs / orb_max[..., None], 0.0, 1.0)
+    contrib = np.where(hits, _PAIR_WEIGHTS[..., None] * _NATURE * exactness, 0.0)
+    return sep, hits, orbs, contrib
+
+
+def _score(raw: np.ndarray) -> np.ndarray:
+    return np.round(50.0 + 50.0 * np.tanh(raw / SCORE_SCALE), 1)
+
+
+def synastry(
+    astro_a: Mapping[str, object],
+    astro_b: Mapping[str, object],
+    orbs: Orbs = None,
+) -> Dict[str, object]:
+    """Sinastria completa de dois mapas.
+
+    Devolve `score` (0–100), `harmony`/`tension` (somas ponderadas),
+    `aspects` (todos os aspectos cruzados, do mais forte ao mais fraco) e
+    `matrix` (booleano `(11, 11, k)`, para uso programático).
+    """
+    orb_max = orb_matrix(SYNASTRY_BODIES, SYNASTRY_BODIES, orbs)
+    sep, hits, orb_vals, contrib = _contributions(
+        chart_longitudes(astro_a), chart_longitudes(astro_b), orb_max
+    )
+
+    aspects: List[Dict[str, object]] = []
+    for i, j, k in zip(*np.nonzero(hits)):
+        aspects.append(
+            {
+                "body_a": SYNASTRY_BODIES[i],
+                "body_b": SYNASTRY_BODIES[j],
+                "aspect": _ASPECT_NAMES[k],
+                "angle": round(float(sep[i, j]), 2),
+                "orb": round(float(orb_vals[i, j, k]), 2),
+                "weight": round(float(contrib[i, j, k]), 3),
+            }
+        )
+    aspects.sort(key=lambda a: -abs(a["weight"]))
+
+    raw = float(contrib.sum())
+    return {
+        "score": float(_score(np.array(raw))),
+        "harmony": round(float(contrib[contrib > 0].sum()), 2),
+        "tension": round(float(-contrib[contrib < 0].sum()), 2),
+        "aspects": aspects,
+        "matrix": hits,
+    }
+
+
+def _raw_many(lon_a: np.ndarray, lons_b: np.ndarray, orb_max: np.ndarray) -> np.ndarray:
+    """Soma das contribuições de A contra cada linha de `lons_b` `(n, 11)`.
+
+    Mesma conta de `_contributions`, sem materializar `(n, 11, 11, k)`:
+    `exatidão = max(0, 1 − |sep − alvo| / orbe)` já zera quem está fora do
+    orbe, então cada alvo vira um `relu` + produto matricial com os pesos.
+    """
+    sep = np.abs(lons_b[:, None, :] - lon_a[None, :, None])   # (n, 11 A, 11 B)
+    np.remainder(sep, 360.0, out=sep)
+    np.minimum(sep, 360.0 - sep, out=sep)
+    sep = sep.reshape(len(lons_b), -1)
+    inv_orb = (1.0 / orb_max).reshape(-1)
+    raw = np.zeros(len(lons_b))
+    buf = np.empty_like(sep)
+    for k, target in enumerate(_TARGETS):
+        np.subtract(sep, target, out=buf)
+        np.abs(buf, out=buf)
+        buf *= -inv_orb
+        buf += 1.0
+        np.maximum(buf, 0.0, out=buf)
+        raw += buf @ (_PAIR_WEIGHTS * _NATURE[..., k]).reshape(-1)
+    return raw
+
+
+def score_many(
+    astro_or_lon,
+    lons_b: np.ndarray,
+    orbs: Orbs = None,
+    chunk: int = 8192,
+) -> np.ndarray:
+    """Pontuação 0–100 de um mapa contra N mapas `(N, 11)` (ver `stack_longitudes`).
+
+    `astro_or_lon`: saída de `get_astrological_data` ou longitudes `(11,)`.
+    Processa em blocos de `chunk` mapas para limitar a memória.
+    """
+    lon_a = (
+        chart_longitudes(astro_or_lon) if isinstance(astro_or_lon, Mapping) else np.asarray(astro_or_lon, dtype=float)
+    )
+    lons_b = np.asarray(lons_b, dtype=float).reshape(-1, len(SYNASTRY_BODIES))
+    orb_max = orb_matrix(SYNASTRY_BODIES, SYNASTRY_BODIES, orbs)
+    raw = np.empty(len(lons_b))
+    for s in range(0, len(lons_b), chunk):
+        raw[s : s + chunk] = _raw_many(lon_a, lons_b[s : s + chunk], orb_max)
+    return _score(raw)
+
+
+def top_matches(
+    astro_or_lon,
+    lons_b: np.ndarray,
+    limit: int = 10,
+    orbs: Orbs = None,
+) -> List[Tuple[int, float]]:
+    """`(índice, pontuação)` dos `limit` melhores de `lons_b`."""
+    scores = score_many(astro_or_lon, lons_b, orbs=orbs)
+    limit = min(limit, len(scores))
+    if limit <= 0:
+        return []
+    idx = np.argpartition(-scores, limit - 1)[:limit]
+    idx = idx[np.argsort(-scores[idx], kind="stable")]
+    return [(int(i), float(scores[i])) for i in idx]
+
+
+# ── Prompt ────────────────────────────────────────────────
+
+def format_synastry(result: Mapping[str, object], limit: int = 10, labels: Sequence[str] = ("A", "B")) -> str:
+    """Resumo compacto para o prompt: pontuação + aspectos mais fortes."""
+    la, lb = labels
+    lines = [
+        f"  Puntuación de sinastría: {result['score']:g}/100 "
+        f"(armonía {result['harmony']:g} · tensión {result['tension']:g})"
+    ]
+    for a in list(result["aspects"])[:limit]:
+        tone = "armónico" if a["weight"] > 0 else "tenso"
+        lines.append(
+            f"  - {a['body_a']} {la} {a['aspect']} {a['body_b']} {lb} (orbe {a['orb']:g}°, {tone})"
+        )
+    return "\n".join(lines)
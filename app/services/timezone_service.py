@@ -0,0 +1,227 @@
+# app/services/timezone_service.py
+"""
+Fuso‑horário por coordenadas para Sky.AI
+========================================
+
+Em vez de instanciar um `TimezoneFinder()` em cada worker do gunicorn
+(import lento e muita RSS por processo), usamos uma **grade pré‑calculada**
+lat/lon → zona IANA, gerada por `build_timezone_grid.py`:
+
+tz_grid.npy   → uint16[linhas, colunas]  índice da zona em cada célula
+tz_grid.json  → {"resolution": graus, "zones": [...]}
+
+A grade é aberta com *memory‑map*, então todos os workers forkados
+compartilham as mesmas páginas. Células cortadas por uma fronteira de fuso
+ficam marcadas como `BOUNDARY`; só nelas o `TimezoneFinder` (criado sob
+demanda, uma vez por processo) faz a busca exata por polígono.
+
+Variáveis de ambiente
+---------------------
+TZ_GRID_PATH      → diretório com `tz_grid.npy`/`tz_grid.json` (opcional)
+DEFAULT_TIMEZONE  → fallback, ex. "UTC" ou "America/Sao_Paulo"
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import sys
+import threading
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    from zoneinfo import ZoneInfo  # Python ≥ 3.9
+except ImportError:  # pragma: no cover — fallback antigo
+    try:
+        from pytz import timezone as ZoneInfo  # type: ignore
+    except ImportError as err:  # pragma: no cover
+        sys.exit(
+            "✖ Nenhuma biblioteca de timezone disponível. Instale python ≥ 3.9 ou pytz."
+        )
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TZ = os.getenv("DEFAULT_TIMEZONE", "UTC")
+TZ_GRID_PATH = os.getenv("TZ_GRID_PATH")
+
+NO_ZONE = 0          # célula sem fuso (não deveria ocorrer: oceanos têm Etc/GMT±N)
+BOUNDARY = 0xFFFF    # célula atravessada por fronteira → busca por polígono
+
+
+# ── Grade memory‑mapped ──────────────────────────────────
+
+class TimezoneGrid:
+    """Grade regular lat/lon com o índice da zona IANA em cada célula."""
+
+    def __init__(self, path: str) -> None:
+        with open(os.path.join(path, "tz_grid.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.resolution: float = float(meta["resolution"])
+        self.zones: List[str] = meta["zones"]   # zones[0] é o marcador NO_ZONE
+        self.cells = np.load(os.path.join(path, "tz_grid.npy"), mmap_mode="r")
+        self.rows, self.cols = self.cells.shape
+
+    def cell(self, lat: float, lon: float) -> int:
+        r = min(max(int(math.floor((lat + 90.0) / self.resolution)), 0), self.rows - 1)
+        c = int(math.floor((lon + 180.0) / self.resolution)) % self.cols
+        return int(self.cells[r, c])
+
+    def zone_at(self, lat: float, lon: float) -> Optional[str]:
+        """Zona da célula; `None` se for fronteira (precisa de polígono)."""
+        idx = self.cell(lat, lon)
+        if idx == BOUNDARY:
+            return None
+        if idx == NO_ZONE:
+            raise ValueError("Grade de fusos não tem zona para as coordenadas.")
+        return self.zones[idx]
+
+
+_GRID: Optional[TimezoneGrid] = None
+_GRID_LOADED = False
+_TF = None
+_TF_LOADED = False
+_LOCK = threading.Lock()
+
+
+def get_grid() -> Optional[TimezoneGrid]:
+    global _GRID, _GRID_LOADED
+    if not _GRID_LOADED:
+        with _LOCK:
+            if not _GRID_LOADED:
+                if TZ_GRID_PATH:
+                    try:
+                        _GRID = TimezoneGrid(TZ_GRID_PATH)
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.warning("[TZ GRID] Grade indisponível em %s: %s", TZ_GRID_PATH, e)
+                _GRID_LOADED = True
+    return _GRID
+
+
+def get_finder():
+    """`TimezoneFinder` criado só na primeira consulta de fronteira (slow import)."""
+    global _TF, _TF_LOADED
+    if not _TF_LOADED:
+        with _LOCK:
+            if not _TF_LOADED:
+                try:
+                    from timezonefinder import TimezoneFinder
+
+                    _TF = TimezoneFinder()
+                except ImportError:
+                    _TF = None
+                _TF_LOADED = True
+    return _TF
+
+
+# ── API pública ───────────────────────────────────────────
+
+def polygon_timezone(lat: float, lon: float) -> str:
+    """Busca exata por polígono (caminho antigo, sem grade)."""
+    tf = get_finder()
+    if tf is None:
+        print("[WARN] TimezoneFinder não instalado – usando DEFAULT_TIMEZONE!", file=sys.stderr)
+        return DEFAULT_TZ
+    tz = tf.timezone_at(lat=lat, lng=lon)
+    if tz is None:
+        raise ValueError("TimezoneFinder não encontrou fuso para as coordenadas.")
+    return tz
+
+
+def get_timezone(lat: float, lon: float) -> str:
+    """Resolve fuso‑horário IANA a partir da latitude/longitude."""
+    grid = get_grid()
+    if grid is not None:
+        tz = grid.zone_at(lat, lon)
+        if tz is not None:
+            return tz
+    return polygon_timezone(lat, lon)
+
+
+@lru_cache(maxsize=512)
+def get_zoneinfo(tz_str: str):
+    """`ZoneInfo` cacheado por nome de zona."""
+    return ZoneInfo(tz_str)
+
+
+# ── Construção da grade ──────────────────────────────────
+
+def _sample_rows(args) -> np.ndarray:
+    """Amostra zonas num bloco de linhas da malha (roda num processo filho)."""
+    lats, lons = args
+    from timezonefinder import TimezoneFinder
+
+    tf = TimezoneFinder()
+    out = np.empty((len(lats), len(lons)), dtype=object)
+    for i, lat in enumerate(lats):
+        for j, lon in enumerate(lons):
+            out[i, j] = tf.timezone_at(lat=float(lat), lng=float(lon))
+    return out
+
+
+def build_grid(out_dir: str, resolution: float = 0.25, workers: int = 1) -> dict:
+    """Gera `tz_grid.npy`/`tz_grid.json`.
+
+    Cada célula é amostrada nos 4 cantos e no centro; se as 5 amostras
+    concordam a célula recebe a zona, senão vira `BOUNDARY`. Enclaves menores
+    que uma célula e sem tocar nenhuma amostra não são detectados — a
+    resolução controla esse compromisso (0.25° ≈ 28 km).
+    """
+    rows = int(round(180.0 / resolution))
+    cols = int(round(360.0 / resolution))
+    # Pontos ligeiramente para dentro evitam ambiguidade exatamente no ±180/±90
+    v_lats = np.clip(np.linspace(-90.0, 90.0, rows + 1), -89.9999, 89.9999)
+    v_lons = np.clip(np.linspace(-180.0, 180.0, cols + 1), -179.9999, 179.9999)
+    c_lats = -90.0 + (np.arange(rows) + 0.5) * resolution
+    c_lons = -180.0 + (np.arange(cols) + 0.5) * resolution
+
+    def sample(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        chunks = [(lats[i : i + 8], lons) for i in range(0, len(lats), 8)]
+        if workers > 1:
+            from multiprocessing import Pool
+
+            with Pool(workers) as pool:
+                parts = pool.map(_sample_rows, chunks)
+        else:
+            parts = [_sample_rows(c) for c in chunks]
+        return np.concatenate(parts, axis=0)
+
+    vertices = sample(v_lats, v_lons)
+    centers = sample(c_lats, c_lons)
+
+    zones: List[str] = [""]
+    index = {}
+
+    def zone_id(name) -> int:
+        if name is None:
+            return NO_ZONE
+        if name not in index:
+            index[name] = len(zones)
+            zones.append(name)
+        return index[name]
+
+    cells = np.empty((rows, cols), dtype=np.uint16)
+    boundary = 0
+    for r in range(rows):
+        for c in range(cols):
+            center = centers[r, c]
+            corners = (vertices[r, c], vertices[r, c + 1], vertices[r + 1, c], vertices[r + 1, c + 1])
+            if center is not None and all(z == center for z in corners):
+                cells[r, c] = zone_id(center)
+            else:
+                cells[r, c] = BOUNDARY
+                boundary += 1
+
+    if len(zones) >= BOUNDARY:
+        raise ValueError("Zonas demais para índice uint16.")
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "tz_grid.npy"), cells)
+    with open(os.path.join(out_dir, "tz_grid.json"), "w", encoding="utf-8") as f:
+        json.dump({"resolution": resolution, "zones": zones}, f)
+
+    return {"rows": rows, "cols": cols, "zones": len(zones) - 1, "boundary_cells": boundary}
@@ -0,0 +1,348 @@
+# app/services/transit_service.py
+"""
+Motor de trânsitos para Sky.AI
+==============================
+
+Encontra **todos** os aspectos exatos de planetas em trânsito sobre os
+pontos de um mapa natal nos próximos N meses, com a janela de orbe de cada
+um (entrada → exato → saída).
+
+Como funciona
+-------------
+1. **Varredura grossa vetorizada**: cada corpo em trânsito é amostrado numa
+   grade regular (passo ≤ 1 dia, menor para corpos rápidos) via
+   `ephemeris_tables.body_positions`. Para cada alvo
+   `c = natal ± ângulo do aspecto` e cada nível (−orbe, 0, +orbe) calculamos
+   `wrap(lon(t) − c)` em toda a grade e marcamos as trocas de sinal.
+2. **Refinamento**: cada intervalo com troca de sinal é resolvido por Newton
+   (a derivada é a velocidade do corpo) protegido por bissecção — perto das
+   estações, quando a velocidade tende a zero, o passo de Newton sai do
+   intervalo e a bissecção assume. Precisão ≈ 1 s; exibimos ao minuto.
+3. **Janelas**: cruzar ±orbe alterna "dentro/fora do orbe"; cada exato cai
+   na janela corrente. Com retrogradação, até 3 exatos dividem a mesma
+   janela (`pass`/`passes`).
+
+Com as tabelas (`EPHEMERIS_TABLES_PATH`) um ano de eventos para todos os
+corpos sai em poucos ms; sem elas cai no `swe.calc_ut` ponto a ponto
+(ordem de centenas de ms).
+
+Variáveis de ambiente
+---------------------
+TRANSIT_ORB            → orbe dos trânsitos em graus (padrão 1)
+TRANSIT_MONTHS         → horizonte do prompt do relatório (padrão 12)
+TRANSIT_PROMPT_BODIES  → corpos citados no prompt (padrão: Júpiter … Plutão)
+TRANSIT_PROMPT_LIMIT   → máximo de eventos no prompt (padrão 30)
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import swisseph as swe
+
+from app.services.ephemeris_tables import body_positions
+
+TRANSIT_ORB = float(os.getenv("TRANSIT_ORB", "1.0"))
+TRANSIT_MONTHS = int(os.getenv("TRANSIT_MONTHS", "12"))
+TRANSIT_PROMPT_BODIES = [
+    b.strip().upper()
+    for b in os.getenv("TRANSIT_PROMPT_BODIES", "JUPITER,SATURN,URANUS,NEPTUNE,PLUTO").split(",")
+    if b.strip()
+]
+TRANSIT_PROMPT_LIMIT = int(os.getenv("TRANSIT_PROMPT_LIMIT", "30"))
+
+# Lua fora por padrão: ~130 eventos/mês que não ajudam numa previsão anual
+TRANSIT_BODIES = [
+    "SUN", "MERCURY", "VENUS", "MARS", "JUPITER",
+    "SATURN", "URANUS", "NEPTUNE", "PLUTO",
+]
+
+# Velocidade máxima (°/dia), usada para escolher o passo da varredura
+MAX_SPEED: Dict[str, float] = {
+    "SUN": 1.02,
+    "MOON": 15.4,
+    "MERCURY": 2.2,
+    "VENUS": 1.26,
+    "MARS": 0.8,
+    "JUPITER": 0.25,
+    "SATURN": 0.14,
+    "URANUS": 0.07,
+    "NEPTUNE": 0.04,
+    "PLUTO": 0.04,
+}
+
+DAYS_PER_MONTH = 365.25 / 12
+PAD_DAYS = 120.0         # varremos além do horizonte para fechar as janelas
+TOL_DAYS = 1e-5          # ≈ 1 s
+MAX_ITER = 40
+
+TransitOrbs = Union[None, float, Mapping[str, float]]
+
+
+def _wrap(delta: np.ndarray) -> np.ndarray:
+    return (delta + 180.0) % 360.0 - 180.0
+
+
+def _orb_for(body: str, orbs: TransitOrbs) -> float:
+    if orbs is None:
+        return TRANSIT_ORB
+    if isinstance(orbs, (int, float)):
+        return float(orbs)
+    return float(orbs.get(body, TRANSIT_ORB))
+
+
+def utc_from_jd(jd_ut: float) -> datetime:
+    """Julian Day UT → datetime UTC (arredondado ao minuto)."""
+    y, m, d, hours = swe.revjul(float(jd_ut), swe.GREG_CAL)
+    dt = datetime(y, m, d, tzinfo=timezone.utc) + timedelta(hours=hours)
+    return (dt + timedelta(seconds=30)).replace(second=0, microsecond=0)
+
+
+# ── Núcleo numérico ──────────────────────────────────────
+
+def solve_brackets(
+    fn: Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]],
+    a: np.ndarray,
+    b: np.ndarray,
+    fa: np.ndarray,
+    fb: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Raízes de `fn` nos intervalos `[a, b]` com troca de sinal (vetorizado).
+
+    `fn(x, idx)` devolve `(f, f')` para os itens `idx` (só os que ainda não
+    convergiram são reavaliados). Newton com salvaguarda: se o passo sair do
+    intervalo (ex. estação, `f' ≈ 0`) ou `f'` for NaN, bissecção.
+    Devolve `(x, f'(x))` na raiz.
+    """
+    a, b, fa = a.astype(float), b.astype(float), fa.astype(float)
+    x = a + (b - a) * fa / (fa - fb)          # começa pela secante
+    deriv = np.zeros_like(x)
+    active = np.ones(len(x), dtype=bool)
+    for _ in range(MAX_ITER):
+        if not active.any():
+            break
+        idx = np.flatnonzero(active)
+        xa = x[idx]
+        f, df = fn(xa, idx)
+        deriv[idx] = df
+
+        aa, bb, ffa = a[idx], b[idx], fa[idx]
+        same = np.signbit(f) == np.signbit(ffa)
+        aa = np.where(same, xa, aa)
+        ffa = np.where(same, f, ffa)
+        bb = np.where(same, bb, xa)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = xa - f / df
+        inside = np.isfinite(newton) & (newton > aa) & (newton < bb)
+        nx = np.where(inside, newton, (aa + bb) / 2.0)
+
+        done = (np.abs(nx - xa) < TOL_DAYS) | ((bb - aa) < TOL_DAYS)
+        a[idx], b[idx], fa[idx] = aa, bb, ffa
+        x[idx] = nx
+        active[idx[done]] = False
+    return x, deriv
+
+
+def crossing_brackets(lon: np.ndarray, levels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Passos de uma grade de longitudes que atravessam cada nível.
+
+    Em vez de testar cada nível em cada passo (tempo × níveis), cada passo
+    cobre um arco curto `[lo, hi)` e um `searchsorted` nos níveis ordenados
+    diz quais foram atravessados. Devolve `(índice do passo, índice do nível)`.
+    """
+    delta = _wrap(np.diff(lon))
+    lo = np.where(delta >= 0, lon[:-1], lon[1:])
+    hi = lo + np.abs(delta)                     # pode passar de 360
+
+    order = np.argsort(levels)
+    ext = np.concatenate([levels[order], levels[order] + 360.0])
+    first = np.searchsorted(ext, lo, side="left")
+    count = np.searchsorted(ext, hi, side="left") - first
+    t_idx = np.repeat(np.arange(len(lo)), count)
+    offsets = np.arange(len(t_idx)) - np.repeat(np.cumsum(count) - count, count)
+    k_idx = order[(np.repeat(first, count) + offsets) % len(levels)]
+    return t_idx, k_idx
+
+
+def longitude_crossings(
+    body: str,
+    levels: np.ndarray,
+    jd_from: float,
+    jd_to: float,
+    step: float = 1.0,
+    fast: Optional[bool] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Todas as passagens do corpo pelas longitudes `levels` em [jd_from, jd_to].
+
+    Grade regular + `crossing_brackets` + `solve_brackets`. `fast` vai para
+    `body_positions`.
+
+    Devolve `(jd, velocidade, índice do nível, longitude no início da grade)`.
+    """
+    n = int(np.ceil((jd_to - jd_from) / step)) + 1
+    grid = jd_from + np.arange(n) * step
+    lon = body_positions(grid, [body], fast=fast)[0][:, 0]
+
+    t_idx, k_idx = crossing_brackets(lon, levels)
+    if not len(t_idx):
+        empty = np.empty(0)
+        return empty, empty, np.empty(0, dtype=np.int64), lon[0]
+    c = levels[k_idx]
+
+    def fn(x: np.ndarray, idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        lon_x, speed_x = body_positions(x, [body], fast=fast)
+        return _wrap(lon_x[:, 0] - c[idx]), speed_x[:, 0]
+
+    jd, speed = solve_brackets(
+        fn,
+        grid[t_idx],
+        grid[t_idx + 1],
+        _wrap(lon[t_idx] - c),
+        _wrap(lon[t_idx + 1] - c),
+    )
+    return jd, speed, k_idx, lon[0]
+
+
+def _windows(
+    jd: np.ndarray,
+    is_exact: np.ndarray,
+    group: np.ndarray,
+    inside: bool,
+) -> List[Tuple[Optional[float], Optional[float], List[int]]]:
+    """Agrupa as passagens (em ordem de tempo) de um alvo em janelas de orbe.
+
+    Cada passagem por ±orbe alterna dentro/fora; exatos ficam na janela
+    corrente. Devolve `(início, fim, [índices dos exatos])`.
+    """
+    windows = []
+    start: Optional[float] = None
+    exacts: List[int] = []
+    for i in group:
+        if is_exact[i]:
+            if not inside:   # borda perdida (raiz dupla numa estação)
+                inside, start = True, None
+            exacts.append(int(i))
+        elif inside:
+            if exacts:
+                windows.append((start, float(jd[i]), exacts))
+            exacts, inside = [], False
+        else:
+            start, inside = float(jd[i]), True
+    if exacts:
+        windows.append((start, None, exacts))
+    return windows
+
+
+# ── API pública ───────────────────────────────────────────
+
+def find_transits(
+    natal: Mapping[str, float],
+    aspects: Sequence[Tuple[float, str]],
+    jd_start: float,
+    jd_end: float,
+    bodies: Sequence[str] = TRANSIT_BODIES,
+    orbs: TransitOrbs = None,
+    fast: Optional[bool] = None,
+) -> List[Dict[str, object]]:
+    """Aspectos exatos trânsito → natal com exato em `[jd_start, jd_end]`.
+
+    Args:
+        natal: ponto natal → longitude (ex. SUN, MOON, ASC).
+        aspects: `(ângulo, nome)`, como `ASPECTS_LIST`.
+        jd_start, jd_end: intervalo em Julian Day UT.
+        bodies: corpos em trânsito.
+        orbs: orbe da janela — número ou dict por corpo em trânsito.
+        fast: vai para `body_positions` (None = tabelas se houver).
+
+    Cada evento traz `start`/`end` (`None` se a janela passa da varredura),
+    `exact`, `retrograde` e `pass`/`passes` para janelas com vários exatos.
+    """
+    names, targets, angles, aspect_names = [], [], [], []
+    for point, lon in natal.items():
+        for angle, aspect in aspects:
+            for side in ((1,) if angle % 180 == 0 else (1, -1)):
+                names.append(point)
+                targets.append((float(lon) + side * angle) % 360.0)
+                angles.append(angle)
+                aspect_names.append(aspect)
+    targets_arr = np.array(targets, dtype=float)
+    n_targets = len(targets_arr)
+
+    events: List[Dict[str, object]] = []
+    for body in bodies:
+        orb = _orb_for(body, orbs)
+        step = min(1.0, orb / MAX_SPEED.get(body, 1.0))
+        levels = np.concatenate([targets_arr, targets_arr - orb, targets_arr + orb]) % 360.0
+        jd, speed, k_idx, lon0 = longitude_crossings(
+            body, levels, jd_start - PAD_DAYS, jd_end + PAD_DAYS, step, fast=fast
+        )
+
+        target = k_idx % n_targets
+        is_exact = k_idx < n_targets
+        inside0 = np.abs(_wrap(lon0 - targets_arr)) <= orb
+
+        order = np.lexsort((jd, target))
+        for group in np.split(order, np.flatnonzero(np.diff(target[order])) + 1):
+            if not len(group):
+                continue
+            t = int(target[group[0]])
+            for start, end, exacts in _windows(jd, is_exact, group, bool(inside0[t])):
+                for n, i in enumerate(exacts, 1):
+                    if not jd_start <= jd[i] <= jd_end:
+                        continue
+                    events.append(
+                        {
+                            "transit": body,
+                            "natal": names[t],
+                            "aspect": aspect_names[t],
+                            "angle": angles[t],
+                            "exact_jd": float(jd[i]),
+                            "exact": utc_from_jd(jd[i]),
+                            "start": None if start is None else utc_from_jd(start),
+                            "end": None if end is None else utc_from_jd(end),
+                            "retrograde": bool(speed[i] < 0),
+                            "pass": n,
+                            "passes": len(exacts),
+                            "orb": orb,
+                        }
+                    )
+
+    events.sort(key=lambda e: e["exact_jd"])
+    return events
+
+
+def transits_for_chart(
+    positions: Mapping[str, Mapping[str, object]],
+    aspects: Sequence[Tuple[float, str]],
+    months: int = TRANSIT_MONTHS,
+    start: Optional[datetime] = None,
+    bodies: Sequence[str] = TRANSIT_BODIES,
+    orbs: TransitOrbs = None,
+) -> List[Dict[str, object]]:
+    """Atalho para `get_astrological_data()["positions"]`, a partir de agora."""
+    from app.services.astrology_service import jd_from_utc
+
+    start = start or datetime.now(timezone.utc)
+    jd0 = jd_from_utc(start.astimezone(timezone.utc))
+    natal = {name: float(p["longitude"]) for name, p in positions.items()}
+    return find_transits(natal, aspects, jd0, jd0 + months * DAYS_PER_MONTH, bodies, orbs)
+
+
+def format_transits(events: Sequence[Dict[str, object]], limit: int = TRANSIT_PROMPT_LIMIT) -> str:
+    """Linhas para o prompt do relatório (datas no formato AAAA-MM-DD)."""
+    def day(dt: Optional[datetime]) -> str:
+        return dt.strftime("%Y-%m-%d") if dt else "…"
+
+    lines = []
+    for e in list(events)[:limit]:
+        passes = f", pase {e['pass']}/{e['passes']}" if e["passes"] > 1 else ""
+        retro = " ℞" if e["retrograde"] else ""
+        lines.append(
+            f"  - {e['transit']}{retro} {e['aspect']} {e['natal']} natal: "
+            f"exacto {day(e['exact'])} (orbe {e['orb']:g}°: {day(e['start'])} → {day(e['end'])}{passes})"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,265 @@
+# app/services/unknown_time_service.py
+"""
+Modo "hora desconhecida" para Sky.AI
+====================================
+
+Quem não sabe a hora de nascimento só tem a data e a cidade. Em vez de
+inventar um horário, varremos o **dia local inteiro** (00:00 → 24:00, com
+a duração real do dia no fuso — 23 h/25 h na troca de horário de verão) e
+devolvemos, para cada corpo, os intervalos de signo e a probabilidade de
+cada um (fração do dia, prior uniforme na hora).
+
+Como funciona
+-------------
+1. **Ascendente analítico**: `λ = atan2(cos θ, −(sin θ·cos ε + tan φ·sin ε))`
+   com θ = ARMC. O tempo sideral vem do `swe.sidtime` nas duas pontas do
+   dia (interpolação linear) e a obliquidade verdadeira do `swe.ECL_NUT`
+   no meio do dia; acima do círculo polar aplicamos a mesma regra do swe
+   (ASC sempre a leste do MC, o que gera saltos de 180°). Essas duas
+   aproximações deixam o ASC a até ~3e‑5° do `ascmc[0]` do `swe.houses`
+   até 60° de latitude e ~2e‑4° perto do círculo polar — abaixo de 1″,
+   irrelevante para as trocas de signo —, sem chamar o `swe.houses`.
+2. **Varredura grossa vetorizada**: ASC numa grade de 5 min (289 pontos,
+   um único cálculo NumPy); Lua e planetas por `longitude_crossings`
+   (tabelas interpoladas quando houver).
+3. **Refinamento**: trocas de signo do ASC por Newton protegido
+   (`transit_service.solve_brackets`, derivada analítica); saltos polares
+   por bissecção.
+4. **Intervalos**: as raízes de todos os corpos partem o dia numa matriz
+   pedaço × corpo de signos (o signo após cada passagem sai do nível e do
+   sentido; o ASC é avaliado nos pontos médios), de onde também saem as
+   combinações Lua × ASC.
+
+A varredura inteira roda numa chamada do `ephemeris_executor` e leva
+poucos ms por mapa (ver `benchmarks/bench_unknown_time.py`).
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import swisseph as swe
+
+from app.services import ephemeris_executor
+from app.services.astrology_service import (
+    BODIES,
+    SIGNS,
+    get_zoneinfo,
+    jd_from_utc,
+    local_to_utc,
+    resolve_location,
+)
+from app.services.transit_service import (
+    MAX_SPEED,
+    crossing_brackets,
+    longitude_crossings,
+    solve_brackets,
+    utc_from_jd,
+)
+
+SCAN_BODIES: List[str] = [*BODIES, "ASC"]
+ASC_STEP = 5.0 / 1440.0                # grade do ascendente (dias)
+SIDEREAL_RATE = 360.98564736629        # °/dia (ARMC)
+JUMP_DEG = 90.0                        # passo maior que isso = salto polar do ASC
+BISECT_ITER = 30                       # 5 min / 2³⁰ ≪ 1 s
+
+_CUSPS = np.arange(12) * 30.0
+
+
+def _wrap(delta: np.ndarray) -> np.ndarray:
+    return (delta + 180.0) % 360.0 - 180.0
+
+
+# ── Ascendente ────────────────────────────────────────────
+
+class _Ascendant:
+    """ASC (e dλ/dt) analítico para um local, ao longo de `[jd0, jd1]`."""
+
+    def __init__(self, jd0: float, jd1: float, lat: float, lon: float) -> None:
+        span = jd1 - jd0
+        st0 = swe.sidtime(jd0) * 15.0
+        st1 = swe.sidtime(jd1) * 15.0
+        self.jd0 = jd0
+        self.armc0 = st0 + lon
+        # taxa real no dia (inclui a variação da nutação), sem ambiguidade de volta
+        self.rate = SIDEREAL_RATE + float(_wrap(np.array(st1 - st0 - SIDEREAL_RATE * span))) / span
+        eps = math.radians(swe.calc_ut((jd0 + jd1) / 2.0, swe.ECL_NUT)[0][0])
+        self.cos_e, self.sin_e = math.cos(eps), math.sin(eps)
+        self.tan_f = math.tan(math.radians(lat))
+        self.polar = abs(lat) >= 90.0 - math.degrees(eps)
+
+    def __call__(self, jd: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """`(longitude °, velocidade °/dia)` do ASC em cada `jd`."""
+        theta = np.radians(self.armc0 + self.rate * (np.asarray(jd, dtype=float) - self.jd0))
+        sin_t, cos_t = np.sin(theta), np.cos(theta)
+        x = -(sin_t * self.cos_e + self.tan_f * self.sin_e)
+        lon = np.degrees(np.arctan2(cos_t, x)) % 360.0
+        if self.polar:
+            mc = np.degrees(np.arctan2(sin_t, cos_t * self.cos_e))
+            lon = np.where(_wrap(lon - mc) < 0, (lon + 180.0) % 360.0, lon)
+        # dλ/dθ de atan2(y, x) com y = cos θ, x' = −cos θ·cos ε
+        dlam = (x * -sin_t + cos_t * cos_t * self.cos_e) / (x * x + cos_t * cos_t)
+        return lon, dlam * self.rate
+
+
+def _asc_changes(asc: _Ascendant, jd0: float, jd1: float) -> np.ndarray:
+    """Instantes (JD) em que o ASC troca de signo dentro de `(jd0, jd1)`."""
+    n = max(2, int(math.ceil((jd1 - jd0) / ASC_STEP)) + 1)
+    grid = np.linspace(jd0, jd1, n)
+    lon, _ = asc(grid)
+    jumps = np.abs(_wrap(np.diff(lon))) > JUMP_DEG
+
+    t_idx, k_idx = crossing_brackets(lon, _CUSPS)
+    keep = ~jumps[t_idx]
+    t_idx, c = t_idx[keep], _CUSPS[k_idx[keep]]
+    roots = [np.empty(0)]
+    if len(t_idx):
+        def fn(x: np.ndarray, idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            lon_x, speed_x = asc(x)
+            return _wrap(lon_x - c[idx]), speed_x
+
+        jd, _ = solve_brackets(fn, grid[t_idx], grid[t_idx + 1], _wrap(lon[t_idx] - c), _wrap(lon[t_idx + 1] - c))
+        roots.append(jd)
+
+    j_idx = np.flatnonzero(jumps)
+    if len(j_idx):   # salto polar: bissecção em "ainda no ramo de antes"
+        a, b, ref = grid[j_idx], grid[j_idx + 1], lon[j_idx]
+        for _ in range(BISECT_ITER):
+            mid = (a + b) / 2.0
+            before = np.abs(_wrap(asc(mid)[0] - ref)) < JUMP_DEG
+            a, b = np.where(before, mid, a), np.where(before, b, mid)
+        roots.append((a + b) / 2.0)
+    return np.concatenate(roots)
+
+
+# ── Varredura do dia ──────────────────────────────────────
+
+def _body_signs(body: str, jd0: float, jd1: float) -> Tuple[np.ndarray, np.ndarray]:
+    """`(trocas, signos)` do corpo no dia: `signos[i]` vale entre as trocas i‑1 e i.
+
+    O signo depois de cada passagem sai do nível e do sentido (retrógrado
+    atravessa a cúspide para trás): nenhuma posição extra é calculada.
+    """
+    span = jd1 - jd0
+    steps = max(1, int(math.ceil(span * MAX_SPEED[body] / 15.0)))   # < 15° por passo
+    jd, speed, k_idx, lon0 = longitude_crossings(body, _CUSPS, jd0, jd1, step=span / steps)
+    keep = (jd > jd0) & (jd < jd1)
+    jd, speed, k_idx = jd[keep], speed[keep], k_idx[keep]
+    order = np.argsort(jd)
+    after = (k_idx[order] - (speed[order] < 0)) % 12
+    return jd[order], np.concatenate([[int(lon0 // 30.0) % 12], after])
+
+
+def scan_day(jd0: float, jd1: float, lat: float, lon: float) -> Dict[str, object]:
+    """Parte Swiss Ephemeris da varredura (roda no `ephemeris_executor`).
+
+    Devolve `edges` (JDs que partem `[jd0, jd1]`) e `signs`, matriz
+    `(pedaços, len(SCAN_BODIES))` com o índice do signo de cada corpo em
+    cada pedaço.
+    """
+    asc = _Ascendant(jd0, jd1, lat, lon)
+    asc_roots = _asc_changes(asc, jd0, jd1)
+    per_body = [_body_signs(b, jd0, jd1) for b in BODIES]
+
+    inner = np.concatenate([asc_roots] + [roots for roots, _ in per_body])
+    inner = np.unique(inner[(inner > jd0) & (inner < jd1)])
+    edges = np.concatenate([[jd0], inner, [jd1]])
+
+    mids = (edges[:-1] + edges[1:]) / 2.0
+    signs = np.empty((len(mids), len(SCAN_BODIES)), dtype=np.int64)
+    for j, (roots, body_signs) in enumerate(per_body):
+        signs[:, j] = body_signs[np.searchsorted(roots, mids)]
+    signs[:, -1] = (asc(mids)[0] // 30.0).astype(np.int64) % 12   # analítico: barato
+    return {"edges": edges, "signs": signs}
+
+
+# ── Apresentação ──────────────────────────────────────────
+
+def _clock(jd: float, jd1: float, tzinfo) -> str:
+    if jd >= jd1:
+        return "24:00"
+    return utc_from_jd(jd).astimezone(tzinfo).strftime("%H:%M")
+
+
+def _intervals(edges: np.ndarray, signs: np.ndarray, tzinfo) -> List[Dict[str, object]]:
+    """Pedaços consecutivos com o mesmo signo → intervalos `(signo, início, fim)`."""
+    jd0, jd1 = float(edges[0]), float(edges[-1])
+    span = jd1 - jd0
+    change = np.flatnonzero(np.diff(signs)) + 1
+    starts = np.concatenate([[0], change])
+    ends = np.concatenate([change, [len(signs)]])
+    out = []
+    for s, e in zip(starts, ends):
+        a, b = float(edges[s]), float(edges[e])
+        out.append(
+            {
+                "sign": SIGNS[int(signs[s])],
+                "start": _clock(a, jd1, tzinfo),
+                "end": _clock(b, jd1, tzinfo),
+                "probability": round((b - a) / span, 4),
+            }
+        )
+    return out
+
+
+def _sign_probabilities(intervals: List[Dict[str, object]]) -> Dict[str, float]:
+    totals: Dict[str, float] = {}
+    for it in intervals:
+        totals[it["sign"]] = totals.get(it["sign"], 0.0) + it["probability"]
+    return {s: round(p, 4) for s, p in sorted(totals.items(), key=lambda kv: -kv[1])}
+
+
+def get_unknown_time_data(
+    birth_date: str,
+    birth_city: str,
+    birth_country: str,
+    timeout: Optional[float] = None,
+) -> Dict[str, object]:
+    """Mapa sem hora: intervalos de signo de cada corpo ao longo do dia local.
+
+    Devolve:
+        `bodies`: `{corpo: [{sign, start, end, probability}, …]}` em ordem
+            (horário local "HH:MM"; o último termina em "24:00");
+        `probabilities`: `{corpo: {signo: probabilidade}}` (intervalos do
+            mesmo signo somados — o ASC costuma voltar ao signo do início);
+        `fixed`: `{corpo: signo}` dos corpos que não mudam de signo no dia;
+        `combinations`: pares Lua × ASC com probabilidade, do mais provável
+            ao menos;
+        `coords`, `timezone`, `day_hours`.
+
+    `timeout` vai para o `ephemeris_executor` (padrão `EPHEMERIS_TIMEOUT`).
+    """
+    coords, tz_str = resolve_location(birth_city, birth_country)
+    day = datetime.strptime(birth_date, "%Y-%m-%d")
+    next_day = (day + timedelta(days=1)).strftime("%Y-%m-%d")
+    jd0 = jd_from_utc(local_to_utc(birth_date, "00:00", tz_str)[1])
+    jd1 = jd_from_utc(local_to_utc(next_day, "00:00", tz_str)[1])
+
+    scan = ephemeris_executor.run(scan_day, jd0, jd1, coords["lat"], coords["lon"], timeout=timeout)
+    edges, signs = scan["edges"], scan["signs"]
+    tzinfo = get_zoneinfo(tz_str)
+
+    bodies = {b: _intervals(edges, signs[:, j], tzinfo) for j, b in enumerate(SCAN_BODIES)}
+
+    moon, asc = SCAN_BODIES.index("MOON"), SCAN_BODIES.index("ASC")
+    weights = np.diff(edges) / (jd1 - jd0)
+    pair_keys = signs[:, moon] * 12 + signs[:, asc]
+    pair_p = np.bincount(pair_keys, weights=weights, minlength=144)
+    combinations = [
+        {"moon": SIGNS[k // 12], "asc": SIGNS[k % 12], "probability": round(float(pair_p[k]), 4)}
+        for k in np.argsort(-pair_p, kind="stable")
+        if pair_p[k] > 0
+    ]
+
+    return {
+        "bodies": bodies,
+        "probabilities": {b: _sign_probabilities(iv) for b, iv in bodies.items()},
+        "fixed": {b: iv[0]["sign"] for b, iv in bodies.items() if len(iv) == 1},
+        "combinations": combinations,
+        "coords": coords,
+        "timezone": tz_str,
+        "day_hours": round((jd1 - jd0) * 24.0, 2),
+    }
@@ -0,0 +1,221 @@
+"""
+benchmarks/bench_chart.py
+-------------------------
+Caminho quente do relatório sem rede: mapa (`get_astrological_data`),
+numerologia (`get_numerology`) e montagem do prompt
+(`generate_skyai_prompt`), etapa por etapa, contra um baseline gravado.
+
+Uso:
+    SWISS_EPHEMERIS_DATA_PATH=swisseph_data python benchmarks/bench_chart.py \
+        [--rounds 20] [--prompt-rounds 2] [--baseline benchmarks/baselines/bench_chart.json] \
+        [--save-baseline] [--tolerance 0.25]
+
+Os nascimentos vêm de `benchmarks/fixtures/births.json` (coordenadas e fuso
+já resolvidos): o geocodificador e o resolvedor de fuso de
+`astrology_service` são trocados por consultas a essa tabela, e o
+calendário do céu não toca o banco. Nada de OpenCage nem OpenAI.
+
+Etapas (mediana por registro, µs), medidas pelo próprio código de produção:
+location, time e chart vêm do `timings=` de `get_astrological_data` (sem
+cache); planets, houses e aspects do `timings=` de `compute_chart` — o
+mesmo mapa, com o JD já aquecido, então as três somam ~chart (chart
+inclui o `ephemeris_executor`); numerology e prompt (com o mapa já
+pronto; inclui trânsitos e calendário do céu — sem `EPHEMERIS_TABLES_PATH`
+os trânsitos dominam, por isso o prompt roda só `--prompt-rounds` vezes).
+Também mede a vazão (mapas/s, relatórios/s), o pico do `tracemalloc` por
+relatório e o RSS máximo do processo.
+
+Com `--baseline`, compara cada métrica com o arquivo e sai com código 1
+se alguma piorar mais que `--tolerance` (padrão 25%; etapas que pioram
+menos de `MIN_DELTA_US` em valor absoluto não contam). `--save-baseline`
+grava as métricas atuais nesse arquivo. Os números dependem da máquina:
+grave o baseline na mesma máquina (ou runner de CI) em que vai comparar.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SKY_CALENDAR_DB", "0")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import swisseph as swe  # noqa: E402
+from flask import Flask  # noqa: E402
+
+from app.services import astrology_service as astro  # noqa: E402
+from app.services.numerology_service import get_numerology  # noqa: E402
+from app.services.perfil_service import generate_skyai_prompt  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures", "births.json")
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baselines", "bench_chart.json")
+
+# Métricas em que maior é melhor; o resto (tempos, memória) é menor‑melhor
+HIGHER_IS_BETTER = {"charts_per_s", "reports_per_s"}
+MIN_DELTA_US = 20.0   # ruído de etapas de poucos µs (location/time simulados)
+
+
+# ── Stubs de I/O ──────────────────────────────────────────
+
+def install_stubs(records):
+    """Geocodificação e fuso a partir das fixtures (sem rede, sem gazetteer)."""
+    places = {(r["birth_city"], r["birth_country"]): r for r in records}
+    zones = {(r["lat"], r["lon"]): r["timezone"] for r in records}
+
+    def get_coordinates(city, country):
+        r = places[(city, country)]
+        return {"lat": r["lat"], "lon": r["lon"]}
+
+    def get_timezone(lat, lon):
+        return zones[(lat, lon)]
+
+    astro.get_coordinates = get_coordinates
+    astro.get_timezone = get_timezone
+
+
+# ── Etapas ────────────────────────────────────────────────
+
+def stage_times(records, rounds, prompt_rounds):
+    """Tempos do código de produção: `timings` de `get_astrological_data` e de `compute_chart`.
+
+    Cada registro é calculado uma vez antes das medições (cache de arquivo
+    do swe aquecido para aquele JD), então `planets + houses + aspects`
+    fica comparável com `chart`.
+    """
+    stages = {k: [] for k in ("location", "time", "chart", "planets", "houses", "aspects", "numerology", "prompt")}
+    for n in range(rounds):
+        for r in records:
+            args = (r["birth_date"], r["birth_time"], r["birth_city"], r["birth_country"])
+            chart = astro.get_astrological_data(*args, use_cache=False)   # aquecimento
+
+            t = {}
+            astro.get_astrological_data(*args, use_cache=False, timings=t)
+            t_chart = {}
+            astro.compute_chart(chart["jd_ut"], chart["coords"]["lat"], chart["coords"]["lon"], timings=t_chart)
+            for key, ms in (*t.items(), *t_chart.items()):
+                stages[key[: -len("_ms")]].append(ms / 1000)
+
+            t0 = time.perf_counter()
+            get_numerology(r["full_name"], r["birth_date"])
+            stages["numerology"].append(time.perf_counter() - t0)
+            if n < prompt_rounds:
+                t0 = time.perf_counter()
+                generate_skyai_prompt(r, chart)
+                stages["prompt"].append(time.perf_counter() - t0)
+    return {f"{k}_us": round(statistics.median(v) * 1e6, 1) for k, v in stages.items()}
+
+
+def throughput(records, rounds):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for r in records:
+            astro.get_astrological_data(r["birth_date"], r["birth_time"], r["birth_city"], r["birth_country"], use_cache=False)
+    charts_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for r in records:
+        chart = astro.get_astrological_data(r["birth_date"], r["birth_time"], r["birth_city"], r["birth_country"], use_cache=False)
+        get_numerology(r["full_name"], r["birth_date"])
+        generate_skyai_prompt(r, chart)
+    reports_s = time.perf_counter() - t0
+    return {
+        "charts_per_s": round(rounds * len(records) / charts_s, 1),
+        "reports_per_s": round(len(records) / reports_s, 2),
+    }
+
+
+def memory(records):
+    tracemalloc.start()
+    peaks = []
+    for r in records:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        chart = astro.get_astrological_data(r["birth_date"], r["birth_time"], r["birth_city"], r["birth_country"], use_cache=False)
+        get_numerology(r["full_name"], r["birth_date"])
+        generate_skyai_prompt(r, chart)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return {
+        "report_peak_kib": round(statistics.median(peaks) / 1024, 1),
+        "max_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+# ── Baseline ──────────────────────────────────────────────
+
+def compare(metrics, baseline, tolerance):
+    regressions = []
+    for key, old in baseline.get("metrics", {}).items():
+        new = metrics.get(key)
+        if new is None or not old:
+            continue
+        change = (old / new - 1.0) if key in HIGHER_IS_BETTER else (new / old - 1.0)
+        worse = change > tolerance and not (key.endswith("_us") and new - old < MIN_DELTA_US)
+        flag = "⚠️ " if worse else "  "
+        print(f"  {flag}{key:20}: {old:>10} → {new:>10} ({change:+.0%})")
+        if worse:
+            regressions.append(key)
+    return regressions
+
+
+def main(args):
+    with open(FIXTURES, encoding="utf-8") as f:
+        records = json.load(f)
+    install_stubs(records)
+
+    with Flask("bench_chart").app_context():   # o prompt loga via current_app
+        generate_skyai_prompt(records[0], astro.get_astrological_data(
+            records[0]["birth_date"], records[0]["birth_time"], records[0]["birth_city"],
+            records[0]["birth_country"], use_cache=False,
+        ))   # aquece: calendário do céu e efemérides em memória
+        metrics = {**stage_times(records, args.rounds, args.prompt_rounds), **throughput(records, args.rounds), **memory(records)}
+
+    print(f"Caminho do relatório ({len(records)} nascimentos × {args.rounds} rodadas, I/O simulado)")
+    for key, value in metrics.items():
+        print(f"  {key:22}: {value:>10}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "machine": f"{platform.machine()} {platform.python_version()} swisseph {swe.version}",
+                    "ephemeris_tables": bool(os.getenv("EPHEMERIS_TABLES_PATH")),
+                    "rounds": args.rounds,
+                    "metrics": metrics,
+                },
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print(f"Baseline gravado em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Sem baseline em {args.baseline} (use --save-baseline)")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"Comparação com {args.baseline} ({baseline.get('machine', '?')})")
+    regressions = compare(metrics, baseline, args.tolerance)
+    if regressions:
+        print(f"❌ Regressões acima de {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    print("✅ Sem regressões")
+    return 0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark do mapa, numerologia e prompt (I/O simulado)")
+    ap.add_argument("--rounds", type=int, default=20, help="passadas pelas fixtures")
+    ap.add_argument("--prompt-rounds", type=int, default=2, help="passadas com montagem do prompt")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE, help="arquivo de baseline (JSON)")
+    ap.add_argument("--save-baseline", action="store_true", help="grava as métricas atuais como baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="piora aceita por métrica (fração)")
+    sys.exit(main(ap.parse_args()))
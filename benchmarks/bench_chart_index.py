@@ -0,0 +1,90 @@
+"""
+benchmarks/bench_chart_index.py
+-------------------------------
+Índice de mapas parecidos: construção e latência de consulta (p50/p99) com
+N mapas, com e sem filtros, e *recall*@k contra a força bruta.
+
+Uso:
+    python benchmarks/bench_chart_index.py [-n 1000000] [--queries 200] [--nprobe 16]
+
+Os mapas são longitudes aleatórias; o índice vai para um diretório
+temporário (apagado no fim). Meta: consulta < 10 ms em 1 milhão de mapas.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services import chart_index as ci  # noqa: E402
+
+
+def _pct(times, p):
+    return float(np.percentile(times, p)) * 1000
+
+
+def main(args):
+    rng = np.random.default_rng(42)
+    n = args.n
+    lons = rng.uniform(0.0, 360.0, (n, len(ci.INDEX_BODIES)))
+    users = rng.integers(1, n // 3 + 2, n)
+    suns = (lons[:, 0] // 30).astype(np.int8)
+    years = rng.integers(1940, 2010, n).astype(np.int16)
+    ids = np.arange(1, n + 1)
+
+    out = tempfile.mkdtemp(prefix="chart_index_")
+    path = os.path.join(out, "idx")
+    try:
+        t0 = time.perf_counter()
+        meta = ci.build_index(path, ids, lons, users, suns, years, nlist=args.nlist)
+        build_s = time.perf_counter() - t0
+        index = ci.ChartIndex(path)
+        x = np.asarray(index.vectors)   # força bruta (ordem do índice)
+
+        queries = rng.uniform(0.0, 360.0, (args.queries, len(ci.INDEX_BODIES)))
+        print(f"Índice de mapas ({n:,} mapas, {meta['nlist']} listas, nprobe {args.nprobe})")
+        print(f"  construção                 : {build_s:8.1f} s")
+
+        cases = [
+            ("sem filtros", lambda q: (None, ci.NO_SIGN, None)),
+            ("signo solar + década", lambda q: (None, int(q[0] // 30), (1980, 1989))),
+            ("excluindo o usuário", lambda q: (int(users[0]), ci.NO_SIGN, None)),
+        ]
+        for name, make in cases:
+            times, hits = [], 0
+            for lon in queries:
+                q = ci.chart_features(lon)
+                filters = make(lon)
+                t0 = time.perf_counter()
+                got, _ = index.search(q, args.k, filters, args.nprobe)
+                times.append(time.perf_counter() - t0)
+
+                dots = x @ q
+                mask = ci._mask(index.user_ids, index.sun_signs, index.birth_years, filters)
+                if mask is not None:
+                    dots = np.where(mask, dots, -np.inf)
+                exact = index.session_ids[ci._top(dots, args.k)]
+                hits += len(np.intersect1d(got, exact))
+            recall = hits / (args.k * len(queries))
+            print(
+                f"  {name:<26} : p50 {_pct(times, 50):6.2f} ms · p99 {_pct(times, 99):6.2f} ms"
+                f" · recall@{args.k} {recall:.3f}"
+            )
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark do índice de mapas parecidos")
+    ap.add_argument("-n", type=int, default=1_000_000, help="mapas no índice")
+    ap.add_argument("--queries", type=int, default=200, help="consultas por cenário")
+    ap.add_argument("--nprobe", type=int, default=ci.CHART_INDEX_NPROBE, help="listas por consulta")
+    ap.add_argument("--nlist", type=int, default=None, help="listas do IVF (padrão √N)")
+    ap.add_argument("-k", type=int, default=10, help="vizinhos por consulta")
+    main(ap.parse_args())
@@ -0,0 +1,70 @@
+"""
+benchmarks/bench_houses.py
+--------------------------
+Micro‑benchmark do custo das casas em `compute_chart`: quanto a busca
+vetorizada planeta → casa (+ montagem das cúspides) acrescenta a um mapa.
+
+Uso:
+    SWISS_EPHEMERIS_DATA_PATH=swisseph_data python benchmarks/bench_houses.py [-n 5000]
+
+O `swe.houses` já era chamado antes (para o ASC); o que é novo é só
+`assign_houses` + as 12 cúspides formatadas.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services import astrology_service as astro  # noqa: E402
+
+
+def median_us(fn, cases):
+    times = []
+    for case in cases:
+        t0 = time.perf_counter()
+        fn(*case)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1e6
+
+
+def main(args):
+    rnd = random.Random(42)
+    charts = [
+        (2415020.0 + rnd.random() * 73000.0, rnd.uniform(-60.0, 60.0), rnd.uniform(-180.0, 180.0))
+        for _ in range(args.n)
+    ]
+
+    # Entradas da parte nova: longitudes (11 corpos) + cúspides de cada mapa
+    extra_cases = []
+    for jd, lat, lon in charts:
+        positions, _aspects, houses = astro.compute_chart(jd, lat, lon, house_system=args.system)
+        extra_cases.append(
+            ([p["longitude"] for p in positions.values()], [c["longitude"] for c in houses["cusps"]])
+        )
+
+    def extra(longitudes, cusps):
+        [astro._cusp_fields(i, c) for i, c in enumerate(cusps, 1)]
+        astro.assign_houses(longitudes, cusps)
+
+    total = median_us(lambda jd, lat, lon: astro.compute_chart(jd, lat, lon, house_system=args.system), charts)
+    swe_houses = median_us(lambda jd, lat, lon: astro.calc_houses(jd, lat, lon, args.system), charts)
+    assign = median_us(astro.assign_houses, extra_cases)
+    added = median_us(extra, extra_cases)
+
+    print(f"Sistema de casas: {astro.HOUSE_SYSTEMS[args.system]} ({args.n} mapas, mediana)")
+    print(f"  compute_chart completo     : {total:8.1f} µs")
+    print(f"  swe.houses (já existia)    : {swe_houses:8.1f} µs")
+    print(f"  assign_houses (11 corpos)  : {assign:8.1f} µs")
+    print(f"  novo total (casas+cúspides): {added:8.1f} µs  → {added / total * 100:.1f}% do mapa")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Custo das casas em compute_chart.")
+    parser.add_argument("-n", type=int, default=5000)
+    parser.add_argument("--system", default=astro.HOUSE_SYSTEM, choices=sorted(astro.HOUSE_SYSTEMS))
+    main(parser.parse_args())
@@ -0,0 +1,64 @@
+"""
+benchmarks/bench_numerology.py
+------------------------------
+Numerologia em lote (`get_numerology_many`) contra `get_numerology` chamado
+registro a registro, com os mesmos nomes e datas.
+
+Uso:
+    python benchmarks/bench_numerology.py [-n 200000]
+
+Nomes sintéticos com acentos, hífens e apóstrofos; datas 1930–2010 nos
+dois formatos aceitos. Confere que os dois caminhos dão o mesmo resultado
+em todos os registros.
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services import numerology_service as ns  # noqa: E402
+
+FIRST = ["María", "José", "Ana-Lucía", "João", "Zoë", "François", "Ñusta", "Ángel", "Chloé", "Björn", "Sofía", "Luis"]
+LAST = ["García", "O'Neill", "Müller", "Pérez-Díaz", "Gonçalves", "Smith", "Núñez", "Søren", "Ibáñez", "Lopes"]
+
+
+def _records(n):
+    rng = random.Random(5)
+    for _ in range(n):
+        name = f"{rng.choice(FIRST)} {rng.choice(FIRST)} {rng.choice(LAST)} {rng.choice(LAST)}"
+        y, m, d = rng.randint(1930, 2010), rng.randint(1, 12), rng.randint(1, 28)
+        date = f"{y}-{m:02d}-{d:02d}" if rng.random() < 0.8 else f"{d:02d}/{m:02d}/{y}"
+        yield name, date
+
+
+def main(args):
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    records = list(_records(args.n))
+
+    t0 = time.perf_counter()
+    single = [ns.get_numerology(name, date) for name, date in records]
+    single_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch = ns.get_numerology_many(records)
+    batch_s = time.perf_counter() - t0
+
+    mismatches = sum(a != b for a, b in zip(single, batch))
+    print(f"Numerologia ({args.n:,} registros)")
+    print(f"  get_numerology (um a um)   : {single_s:8.2f} s ({single_s * 1e6 / args.n:.2f} µs/registro)")
+    print(f"  get_numerology_many        : {batch_s:8.2f} s ({batch_s * 1e6 / args.n:.2f} µs/registro)")
+    print(f"  aceleração                 : {single_s / batch_s:8.1f}×")
+    print(f"  divergências               : {mismatches}")
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark da numerologia em lote")
+    ap.add_argument("-n", type=int, default=200_000, help="registros")
+    ap.add_argument("--verbose", action="store_true", help="logging em INFO (custo dos logs por registro)")
+    sys.exit(main(ap.parse_args()))
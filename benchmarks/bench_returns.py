@@ -0,0 +1,64 @@
+"""
+benchmarks/bench_returns.py
+---------------------------
+Revoluções solares em lote: N nascimentos × M anos (`returns_many`) e
+progressões (`progressed_positions`), com e sem tabelas de efemérides.
+
+Uso:
+    SWISS_EPHEMERIS_DATA_PATH=swisseph_data EPHEMERIS_TABLES_PATH=/data/eph \
+        python benchmarks/bench_returns.py [-n 10000] [--years 10]
+
+Nascimentos aleatórios (1930–2010). Confere no `swe.calc_ut` que o Sol de
+uma amostra dos retornos está na longitude natal.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import swisseph as swe
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services import returns_service as rs  # noqa: E402
+from app.services.ephemeris_tables import get_tables  # noqa: E402
+
+
+def main(args):
+    rng = np.random.default_rng(3)
+    jd_birth = rng.uniform(swe.julday(1930, 1, 1, 0.0), swe.julday(2010, 1, 1, 0.0), args.n)
+    lat = rng.uniform(-60.0, 60.0, args.n)
+    lon = rng.uniform(-180.0, 180.0, args.n)
+    years = list(range(2025, 2025 + args.years))
+    fast = None if get_tables() is not None else False
+
+    t0 = time.perf_counter()
+    result = rs.returns_many(jd_birth, lat, lon, years, fast=fast)
+    returns_s = time.perf_counter() - t0
+    pairs = args.n * args.years
+
+    t0 = time.perf_counter()
+    rs.progressed_positions(jd_birth, np.full(args.n, swe.julday(2025, 6, 1, 0.0)), fast=fast)
+    prog_s = time.perf_counter() - t0
+
+    sample = rng.choice(pairs, size=min(500, pairs), replace=False)
+    natal = np.array([swe.calc_ut(float(jd), swe.SUN, swe.FLG_SWIEPH)[0][0] for jd in jd_birth])
+    err = [
+        abs(rs._wrap(np.array(swe.calc_ut(float(result["jd"].ravel()[k]), swe.SUN, swe.FLG_SWIEPH)[0][0] - natal[k // args.years])))
+        for k in sample
+    ]
+    label = "tabelas" if fast is None else "swe.calc_ut"
+    print(f"Revoluções solares ({args.n:,} nascimentos × {args.years} anos, {label})")
+    print(f"  returns_many               : {returns_s:8.2f} s ({returns_s * 1e6 / pairs:.1f} µs/retorno)")
+    print(f"  progressed_positions       : {prog_s * 1000:8.1f} ms ({args.n:,} mapas)")
+    print(f"  erro do Sol (máx., amostra): {max(err) * 3600:8.4f}″")
+    print(f"  estimativa 1M sessões      : {returns_s * 1e6 / args.n / 60:8.1f} min")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark de revoluções solares e progressões")
+    ap.add_argument("-n", type=int, default=10_000, help="nascimentos")
+    ap.add_argument("--years", type=int, default=10, help="anos por nascimento")
+    main(ap.parse_args())
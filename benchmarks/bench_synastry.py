@@ -0,0 +1,65 @@
+"""
+benchmarks/bench_synastry.py
+----------------------------
+Sinastria: custo de um par (`synastry`, matriz 11 × 11 × 6 + lista de
+aspectos) e de um contra muitos (`score_many`, N mapas guardados).
+
+Uso:
+    python benchmarks/bench_synastry.py [-n 100000] [--pairs 2000]
+
+Os mapas são longitudes aleatórias (o motor não chama o Swiss Ephemeris).
+Também confere que `score_many` dá a mesma pontuação de `synastry`.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services import synastry_service as syn  # noqa: E402
+
+
+def _astro(lon):
+    return {"positions": {b: {"longitude": float(x)} for b, x in zip(syn.SYNASTRY_BODIES, lon)}}
+
+
+def main(args):
+    rng = np.random.default_rng(42)
+    me = rng.uniform(0.0, 360.0, len(syn.SYNASTRY_BODIES))
+    others = rng.uniform(0.0, 360.0, (args.n, len(syn.SYNASTRY_BODIES)))
+
+    pairs = [_astro(lon) for lon in others[: args.pairs]]
+    me_astro = _astro(me)
+    times, scores = [], []
+    for other in pairs:
+        t0 = time.perf_counter()
+        scores.append(syn.synastry(me_astro, other)["score"])
+        times.append(time.perf_counter() - t0)
+    pair_us = statistics.median(times) * 1e6
+
+    syn.score_many(me, others[:100])   # aquece
+    print(f"Sinastria ({args.n} mapas aleatórios)")
+    print(f"  synastry (um par, mediana) : {pair_us:8.1f} µs")
+    for n in (1_000, 10_000, args.n):
+        n = min(n, args.n)
+        t0 = time.perf_counter()
+        syn.score_many(me, others[:n])
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"  score_many  {n:>9,} mapas : {ms:8.1f} ms ({ms * 1000 / n:.2f} µs/mapa)")
+
+    bulk = syn.score_many(me, others[: args.pairs])
+    diff = float(np.abs(bulk - np.array(scores)).max())
+    print(f"  score_many × synastry      : diferença máx. {diff:g}")
+    return 0 if diff == 0 else 1
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark do motor de sinastria")
+    ap.add_argument("-n", type=int, default=100_000, help="mapas no um‑contra‑muitos")
+    ap.add_argument("--pairs", type=int, default=2000, help="pares no teste de um par")
+    sys.exit(main(ap.parse_args()))
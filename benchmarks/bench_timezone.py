@@ -0,0 +1,128 @@
+"""
+benchmarks/bench_timezone.py
+----------------------------
+Compara `get_timezone` via grade memory‑mapped × `TimezoneFinder` puro:
+tempo de inicialização, latência por consulta e memória por worker.
+
+Uso:
+    TZ_GRID_PATH=swisseph_data/tz_grid python benchmarks/bench_timezone.py [-n 20000]
+
+Cada modo roda num subprocesso limpo, como um worker do gunicorn.
+"Privada" é a memória que cada worker forkado NÃO compartilha.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _memory_kb():
+    """(RSS, privada) do processo atual em kB, via /proc (Linux)."""
+    rss = private = 0
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key == "Rss":
+                    rss = int(rest.split()[0])
+                elif key in ("Private_Clean", "Private_Dirty"):
+                    private += int(rest.split()[0])
+    except OSError:
+        import resource
+
+        rss = private = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss, private
+
+
+def _points(n, seed=42):
+    import random
+
+    rnd = random.Random(seed)
+    # Mistura: cidades reais (fronteiras frequentes) + pontos aleatórios
+    cities = [(-23.55, -46.63), (19.43, -99.13), (40.42, -3.70), (-34.60, -58.38),
+              (4.71, -74.07), (25.76, -80.19), (48.86, 2.35), (-12.05, -77.04)]
+    pts = [cities[i % len(cities)] for i in range(n // 4)]
+    pts += [(rnd.uniform(-60, 70), rnd.uniform(-180, 180)) for _ in range(n - len(pts))]
+    return pts
+
+
+def run_mode(mode, n):
+    sys.path.insert(0, ROOT)
+    if mode == "finder":
+        os.environ.pop("TZ_GRID_PATH", None)
+
+    from app.services import timezone_service as tzs
+
+    base_rss, base_private = _memory_kb()
+    t0 = time.perf_counter()
+    if mode == "finder":
+        tzs.get_finder()
+    else:
+        if tzs.get_grid() is None:
+            raise SystemExit("TZ_GRID_PATH não configurado ou grade ausente.")
+    init_s = time.perf_counter() - t0
+    init_rss, init_private = _memory_kb()
+
+    pts = _points(n)
+    lat = []
+    results = []
+    for la, lo in pts:
+        t = time.perf_counter()
+        try:
+            results.append(tzs.get_timezone(la, lo))
+        except ValueError:
+            results.append(None)
+        lat.append(time.perf_counter() - t)
+
+    lat.sort()
+    rss, private = _memory_kb()
+    print(json.dumps({
+        "mode": mode,
+        "init_ms": init_s * 1e3,
+        "mean_us": sum(lat) / len(lat) * 1e6,
+        "p50_us": lat[len(lat) // 2] * 1e6,
+        "p99_us": lat[int(len(lat) * 0.99)] * 1e6,
+        "init_rss_mb": (init_rss - base_rss) / 1024,
+        "init_private_mb": (init_private - base_private) / 1024,
+        "rss_mb": (rss - base_rss) / 1024,
+        "private_mb": (private - base_private) / 1024,
+        "polygon_lookups": sum(1 for la, lo in pts if tzs.get_grid() and tzs.get_grid().cell(la, lo) == tzs.BOUNDARY),
+        "results": results,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=20000)
+    parser.add_argument("--mode", choices=["grid", "finder"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.n)
+        return
+
+    out = {}
+    for mode in ("finder", "grid"):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "-n", str(args.n)],
+            capture_output=True, text=True, check=True,
+        )
+        out[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    agree = sum(a == b for a, b in zip(out["finder"]["results"], out["grid"]["results"]))
+    print("Memória = acréscimo sobre o processo já com `app` importado (init → após consultas).")
+    print(f"{'modo':8} {'init ms':>9} {'média µs':>9} {'p50 µs':>8} {'p99 µs':>8} "
+          f"{'RSS MB':>13} {'privada MB':>13}")
+    for mode, r in out.items():
+        print(f"{mode:8} {r['init_ms']:9.1f} {r['mean_us']:9.2f} {r['p50_us']:8.2f} {r['p99_us']:8.2f} "
+              f"{r['init_rss_mb']:5.1f} → {r['rss_mb']:5.1f} {r['init_private_mb']:5.1f} → {r['private_mb']:5.1f}")
+    print(f"Concordância grade × polígono: {agree}/{args.n} · "
+          f"consultas de fronteira: {out['grid']['polygon_lookups']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+benchmarks/bench_transits.py
+----------------------------
+Mede `transit_service.find_transits`: 12 meses, todos os corpos (sem a Lua),
+contra um mapa natal completo. Compara tabelas interpoladas × swe direto.
+
+Uso:
+    SWISS_EPHEMERIS_DATA_PATH=swisseph_data EPHEMERIS_TABLES_PATH=swisseph_data/tables \
+        python benchmarks/bench_transits.py [-n 50] [--months 12]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import swisseph as swe  # noqa: E402
+
+from app.services import ephemeris_tables  # noqa: E402
+from app.services import transit_service as ts  # noqa: E402
+from app.services.astrology_service import ASPECTS_LIST, compute_chart  # noqa: E402
+
+
+def run(natal, jd0, days, n, fast):
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        events = ts.find_transits(natal, ASPECTS_LIST, jd0, jd0 + days, fast=fast)
+        times.append(time.perf_counter() - t0)
+    return events, times
+
+
+def main(args):
+    positions = compute_chart(swe.julday(1990, 5, 17, 14.5), -23.55, -46.63)[0]
+    natal = {name: p["longitude"] for name, p in positions.items()}
+    jd0 = swe.julday(2026, 1, 1, 0.0)
+    days = args.months * ts.DAYS_PER_MONTH
+
+    modes = [("tabelas", None), ("swe", False)]
+    if ephemeris_tables.get_tables() is None:
+        print("⚠️  EPHEMERIS_TABLES_PATH não configurado — só o modo swe.")
+        modes = modes[1:]
+
+    print(f"{'modo':8} {'eventos':>8} {'mediana ms':>11} {'p95 ms':>8}")
+    for name, fast in modes:
+        events, times = run(natal, jd0, days, args.n if fast is None else max(1, args.n // 10), fast)
+        times.sort()
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+        print(f"{name:8} {len(events):8d} {statistics.median(times) * 1000:11.1f} {p95 * 1000:8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do motor de trânsitos.")
+    parser.add_argument("-n", type=int, default=50, help="Repetições (modo tabelas)")
+    parser.add_argument("--months", type=int, default=12)
+    main(parser.parse_args())
@@ -0,0 +1,81 @@
+"""
+benchmarks/bench_unknown_time.py
+--------------------------------
+Modo "hora desconhecida": custo de varrer um dia inteiro (`scan_day`) contra
+a força bruta de um `swe.houses` + `swe.calc_ut` da Lua a cada minuto.
+
+Uso:
+    SWISS_EPHEMERIS_DATA_PATH=swisseph_data python benchmarks/bench_unknown_time.py [-n 200]
+
+Dias e locais aleatórios (1900–2050, latitudes −60…60). Também confere que o
+signo do ASC e da Lua em cada minuto da força bruta cai no intervalo certo
+(minutos a menos de 1 s de uma troca são ignorados).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import swisseph as swe
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services import unknown_time_service as ut  # noqa: E402
+
+MOON = ut.SCAN_BODIES.index("MOON")
+EDGE_TOL = 1.0 / 86400
+
+
+def _brute(jd0, lat, lon):
+    out = []
+    for t in jd0 + np.arange(1440) / 1440.0:
+        asc = swe.houses(float(t), lat, lon, b"O")[1][0]
+        moon = swe.calc_ut(float(t), swe.MOON, swe.FLG_SWIEPH)[0][0]
+        out.append((t, int(moon // 30), int(asc // 30)))
+    return out
+
+
+def main(args):
+    rng = np.random.default_rng(7)
+    jd_min, jd_max = swe.julday(1900, 1, 1, 0.0), swe.julday(2050, 1, 1, 0.0)
+    cases = [
+        (float(np.floor(rng.uniform(jd_min, jd_max))) + 0.5, float(rng.uniform(-60, 60)), float(rng.uniform(-180, 180)))
+        for _ in range(args.n)
+    ]
+
+    ut.scan_day(cases[0][0], cases[0][0] + 1, cases[0][1], cases[0][2])   # aquece
+    scan_times, results = [], []
+    for jd0, lat, lon in cases:
+        t0 = time.perf_counter()
+        results.append(ut.scan_day(jd0, jd0 + 1, lat, lon))
+        scan_times.append(time.perf_counter() - t0)
+
+    brute_times, mismatches, checked = [], 0, 0
+    for (jd0, lat, lon), res in list(zip(cases, results))[: args.brute]:
+        t0 = time.perf_counter()
+        samples = _brute(jd0, lat, lon)
+        brute_times.append(time.perf_counter() - t0)
+        edges, signs = res["edges"], res["signs"]
+        for t, moon, asc in samples:
+            if np.min(np.abs(edges - t)) < EDGE_TOL:
+                continue
+            piece = signs[np.searchsorted(edges, t, side="right") - 1]
+            checked += 1
+            mismatches += int(piece[MOON] != moon or piece[-1] != asc)
+
+    print(f"Hora desconhecida ({args.n} dias aleatórios)")
+    print(f"  scan_day (mediana)         : {statistics.median(scan_times) * 1000:8.2f} ms")
+    print(f"  scan_day (p99)             : {np.percentile(scan_times, 99) * 1000:8.2f} ms")
+    print(f"  força bruta, 1440 minutos  : {statistics.median(brute_times) * 1000:8.2f} ms")
+    print(f"  minutos conferidos         : {checked} ({mismatches} divergentes)")
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark do modo hora desconhecida")
+    ap.add_argument("-n", type=int, default=200, help="dias varridos")
+    ap.add_argument("--brute", type=int, default=20, help="dias conferidos contra a força bruta")
+    sys.exit(main(ap.parse_args()))
@@ -0,0 +1,155 @@
+"""
+benchmarks/openai_stub.py
+-------------------------
+Servidor local que imita o endpoint `chat/completions` do OpenAI (com e sem
+streaming), para testar `llm_gateway`, o SSE e a geração por seções sem
+gastar cota.
+
+Uso:
+    python benchmarks/openai_stub.py [--port 8090] [--ttft 0.3] [--tps 80] [--fail-rate 0]
+
+    OPENAI_BASE_URL=http://127.0.0.1:8090/v1 OPENAI_API_KEY=x flask run ...
+
+A resposta ecoa as linhas do prompt que começam com "## " (títulos de seção)
+seguidas de texto de enchimento; se o prompt pedir JSON ("texto"), a
+resposta vem no formato do relatório. `--ttft` é a espera até o primeiro
+token e `--tps` os tokens por segundo depois disso. `GET /stats` mostra
+chamadas, streams abandonados pelo cliente e conexões TCP novas.
+
+Também importável: `start(port=0, ...)` sobe em thread e devolve o servidor
+(`server.url`, `server.counts`, `server.shutdown()`).
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER = "Las estrellas favorecen decisiones claras y pasos concretos esta semana. "
+
+
+def _answer(prompt):
+    sections = re.findall(r"^## .+$", prompt, flags=re.M) or ["## Respuesta"]
+    body = "\n\n".join(f"{title}\n{FILLER * 3}" for title in dict.fromkeys(sections))
+    if '"texto"' in prompt:
+        return json.dumps(
+            {
+                "sun_sign": "Aries", "moon_sign": "Leo", "ascendant": "Virgo",
+                "life_path": 7, "soul_urge": 3, "expression": 5, "texto": body,
+            },
+            ensure_ascii=False,
+        )
+    return body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.counts["connections"] += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        with self.server.lock:
+            return self._json(200, dict(self.server.counts))
+
+    def do_POST(self):
+        srv = self.server
+        req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with srv.lock:
+            srv.counts["requests"] += 1
+        if srv.fail_rate and random.random() < srv.fail_rate:
+            with srv.lock:
+                srv.counts["failures"] += 1
+            return self._json(503, {"error": {"message": "stub failure", "type": "server_error"}})
+
+        prompt = "\n".join(m.get("content", "") for m in req.get("messages", []))
+        tokens = re.findall(r"\S+\s*", _answer(prompt))[: req.get("max_tokens") or None]
+        model = req.get("model", "stub")
+        usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": len(tokens),
+                 "total_tokens": len(prompt.split()) + len(tokens)}
+        base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": model}
+        time.sleep(srv.ttft)
+
+        if not req.get("stream"):
+            time.sleep(len(tokens) / srv.tps)
+            return self._json(200, {
+                **base, "object": "chat.completion", "usage": usage,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(tokens)}}],
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(obj):
+            data = f"data: {obj if isinstance(obj, str) else json.dumps(obj)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            for tok in tokens:
+                send({**base, "object": "chat.completion.chunk",
+                      "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}]})
+                time.sleep(1.0 / srv.tps)
+            send({**base, "object": "chat.completion.chunk",
+                  "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if (req.get("stream_options") or {}).get("include_usage"):
+                send({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):   # cliente abandonou o stream
+            with srv.lock:
+                srv.counts["aborted"] += 1
+            self.close_connection = True
+
+
+def start(port=0, ttft=0.3, tps=80.0, fail_rate=0.0, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.counts = {"requests": 0, "failures": 0, "aborted": 0, "connections": 0}
+    server.ttft = ttft
+    server.tps = tps
+    server.fail_rate = fail_rate
+    server.url = f"http://{host}:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    ap.add_argument("--port", type=int, default=8090)
+    ap.add_argument("--ttft", type=float, default=0.3, help="segundos até o primeiro token")
+    ap.add_argument("--tps", type=float, default=80.0, help="tokens por segundo")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="fração de respostas 503")
+    args = ap.parse_args()
+
+    server = start(args.port, args.ttft, args.tps, args.fail_rate)
+    print(f"Stub OpenAI em {server.url}  (Ctrl+C para sair)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+benchmarks/opencage_stub.py
+---------------------------
+Servidor local que imita o endpoint `geocode/v1/json` do OpenCage, para
+testar `http_client` (retries, circuit breaker, pool) sem gastar cota.
+
+Uso:
+    python benchmarks/opencage_stub.py [--port 8089] [--latency 0.05]
+        [--fail-rate 0.2] [--status 503] [--retry-after 1]
+
+    OPENCAGE_URL=http://127.0.0.1:8089/geocode/v1/json OPENCAGE_API_KEY=x \
+        python -m app.services.astrology_service ...
+
+Coordenadas são determinísticas (hash de `q`); `q` contendo "nowhere" dá
+`results: []`. `--fail-rate` devolve `--status` nessa fração das chamadas
+(com `Retry-After` se pedido). `GET /stats` mostra chamadas e conexões
+TCP novas (keep‑alive reaproveita a mesma).
+
+Também importável: `start(port=0, ...)` sobe em thread e devolve o servidor
+(`server.url`, `server.counts`, `server.shutdown()`).
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep‑alive
+    disable_nagle_algorithm = True  # cabeçalho e corpo saem em writes separados
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.counts["connections"] += 1
+
+    def log_message(self, *args):  # silencioso
+        pass
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        srv = self.server
+        if url.path == "/stats":
+            with srv.lock:
+                return self._send(200, dict(srv.counts))
+        if url.path != "/geocode/v1/json":
+            return self._send(404, {"status": {"code": 404, "message": "not found"}})
+
+        with srv.lock:
+            srv.counts["requests"] += 1
+        if srv.latency:
+            time.sleep(srv.latency)
+
+        qs = parse_qs(url.query)
+        q = qs.get("q", [""])[0]
+        if not qs.get("key"):
+            return self._send(401, {"status": {"code": 401, "message": "missing key"}})
+        if srv.fail_rate and random.random() < srv.fail_rate:
+            with srv.lock:
+                srv.counts["failures"] += 1
+            headers = {"Retry-After": str(srv.retry_after)} if srv.retry_after is not None else None
+            return self._send(srv.status, {"status": {"code": srv.status, "message": "stub failure"}}, headers)
+
+        results = []
+        if "nowhere" not in q.lower():
+            h = int.from_bytes(hashlib.sha256(q.encode("utf-8")).digest()[:8], "big")
+            lat = (h % 1_600_000) / 10_000 - 80.0
+            lng = (h // 1_600_000 % 3_600_000) / 10_000 - 180.0
+            results = [{"formatted": q, "geometry": {"lat": round(lat, 4), "lng": round(lng, 4)}}]
+        self._send(200, {"results": results, "status": {"code": 200, "message": "OK"}})
+
+
+def start(port=0, latency=0.0, fail_rate=0.0, status=503, retry_after=None, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.counts = {"requests": 0, "failures": 0, "connections": 0}
+    server.latency = latency
+    server.fail_rate = fail_rate
+    server.status = status
+    server.retry_after = retry_after
+    server.url = f"http://{host}:{server.server_address[1]}/geocode/v1/json"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--latency", type=float, default=0.0, help="segundos por resposta")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="fração de respostas com erro")
+    ap.add_argument("--status", type=int, default=503, help="status das falhas (ex. 429, 503)")
+    ap.add_argument("--retry-after", type=int, default=None, help="cabeçalho Retry-After nas falhas")
+    args = ap.parse_args()
+
+    server = start(args.port, args.latency, args.fail_rate, args.status, args.retry_after)
+    print(f"Stub OpenCage em {server.url}  (Ctrl+C para sair)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
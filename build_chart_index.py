@@ -0,0 +1,108 @@
+"""
+build_chart_index.py
+--------------------
+(Re)constrói o índice de mapas parecidos (`chart_index`) a partir da tabela
+`chart_vectors`.
+
+Uso:
+    CHART_INDEX_PATH=/data/chart_index python build_chart_index.py [--backfill] [--nlist 1024]
+
+--backfill calcula antes o vetor das `TestSession` com relatório pronto que
+ainda não estão em `chart_vectors` (sessões anteriores ao índice): do
+`chart_blob` quando houver, senão em lote (`chart_batch`). O índice novo é gravado num diretório temporário e trocado
+atomicamente; os workers recarregam sozinhos.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.main import app, db  # noqa: E402
+from app.models import ChartVector, TestSession  # noqa: E402
+from app.services import chart_index, compact_chart  # noqa: E402
+from app.services.chart_batch import get_astrological_data_many  # noqa: E402
+
+
+def backfill(workers):
+    indexed = db.session.query(ChartVector.session_id)
+    sessions = (
+        TestSession.query.filter(TestSession.ai_result.isnot(None), ~TestSession.id.in_(indexed))
+        .order_by(TestSession.id)
+        .all()
+    )
+    if not sessions:
+        print("Backfill: nada a fazer.")
+        return
+    ok = failed = 0
+    pending = []
+    for s in sessions:
+        chart = compact_chart.session_chart(s, compute=False)
+        if chart is None:
+            pending.append(s)
+            continue
+        chart_index.add_chart(s.id, s.user_id, chart.to_astro(), s.birth_date.year)
+        ok += 1
+
+    records = [
+        (
+            s.birth_date.strftime("%Y-%m-%d"),
+            s.birth_time.strftime("%H:%M"),
+            s.birth_city,
+            s.birth_country,
+        )
+        for s in pending
+    ]
+    for s, result in zip(pending, get_astrological_data_many(records, workers=workers)):
+        if "error" in result:
+            failed += 1
+            continue
+        chart_index.add_chart(s.id, s.user_id, result, s.birth_date.year)
+        ok += 1
+    print(f"Backfill: {ok} sessões indexadas, {failed} com erro.")
+
+
+def main(args):
+    out = args.out or chart_index.CHART_INDEX_PATH
+    if not out:
+        sys.exit("Defina CHART_INDEX_PATH ou use --out.")
+
+    with app.app_context():
+        ChartVector.__table__.create(db.engine, checkfirst=True)
+        if args.backfill:
+            backfill(args.workers)
+
+        t0 = time.perf_counter()
+        rows = list(chart_index.iter_vectors())
+        if not rows:
+            sys.exit("chart_vectors está vazia (rode com --backfill?).")
+        ids, users, suns, years, lons = zip(*rows)
+        print(f"{len(rows)} vetores lidos em {time.perf_counter() - t0:.1f}s")
+
+    t0 = time.perf_counter()
+    meta = chart_index.build_index(
+        out,
+        np.array(ids),
+        np.stack(lons),
+        user_ids=np.array(users),
+        sun_signs=np.array(suns),
+        birth_years=np.array(years),
+        nlist=args.nlist,
+    )
+    print(
+        f"✅ Índice em {out}: {meta['n']} mapas, {meta['nlist']} listas, "
+        f"até a sessão {meta['max_session_id']} ({time.perf_counter() - t0:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstrói o índice de mapas parecidos.")
+    parser.add_argument("--out", default=None, help="Diretório (padrão CHART_INDEX_PATH)")
+    parser.add_argument("--backfill", action="store_true", help="Indexa sessões antigas antes")
+    parser.add_argument("--nlist", type=int, default=None, help="Listas do IVF (padrão √N)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processos do backfill")
+    main(parser.parse_args())
@@ -0,0 +1,53 @@
+"""
+build_ephemeris_tables.py
+-------------------------
+Gera as tabelas de efemérides pré‑calculadas (modo rápido de interpolação).
+
+Uso:
+    SWISS_EPHEMERIS_DATA_PATH=swisseph_data \
+        python build_ephemeris_tables.py swisseph_data/tables [--from 1800] [--to 2400]
+
+Depois aponte `EPHEMERIS_TABLES_PATH` para o diretório de saída e valide:
+    python check_ephemeris.py --validate-tables
+"""
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import swisseph as swe  # noqa: E402
+
+from app.services.ephemeris_tables import JD_1800, JD_2400, build_tables  # noqa: E402
+
+
+def main(args):
+    eph_path = os.getenv("SWISS_EPHEMERIS_DATA_PATH")
+    if eph_path:
+        swe.set_ephe_path(eph_path)
+
+    jd_start = swe.julday(args.year_from, 1, 1, 0.0) if args.year_from else JD_1800
+    jd_end = swe.julday(args.year_to, 1, 1, 0.0) if args.year_to else JD_2400
+
+    t0 = time.perf_counter()
+    stats = build_tables(
+        args.out, jd_start, jd_end,
+        progress=lambda body: print(f"  · {body} ok ({time.perf_counter() - t0:.0f}s)"),
+    )
+    size_mb = sum(
+        os.path.getsize(os.path.join(args.out, f)) for f in os.listdir(args.out)
+    ) / 1e6
+    print(
+        f"✅ {stats['planet_samples']} amostras planetárias + {stats['moon_samples']} lunares "
+        f"({size_mb:.0f} MB) em {time.perf_counter() - t0:.0f}s → {args.out}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pré‑calcula tabelas de efemérides.")
+    parser.add_argument("out", help="Diretório de saída")
+    parser.add_argument("--from", dest="year_from", type=int, help="Ano inicial (padrão 1800)")
+    parser.add_argument("--to", dest="year_to", type=int, help="Ano final, exclusivo (padrão 2400)")
+    main(parser.parse_args())
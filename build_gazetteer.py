@@ -0,0 +1,45 @@
+"""
+build_gazetteer.py
+------------------
+Gera o índice offline de geocodificação a partir de um dump GeoNames.
+
+Uso:
+    python build_gazetteer.py cities1000.txt swisseph_data/gazetteer \
+        [--country-info countryInfo.txt] [--min-population 0] [--alternates]
+
+Depois aponte `GAZETTEER_PATH` para o diretório de saída.
+Dumps: https://download.geonames.org/export/dump/
+"""
+import argparse
+import time
+
+from app.services.gazetteer_service import Gazetteer, build_index
+
+
+def main(args):
+    t0 = time.perf_counter()
+    total = build_index(
+        args.dump,
+        args.out,
+        country_info=args.country_info,
+        min_population=args.min_population,
+        alternates=args.alternates,
+    )
+    elapsed = time.perf_counter() - t0
+
+    gaz = Gazetteer(args.out)
+    print(f"✅ {total} chaves indexadas em {elapsed:.1f}s → {args.out}")
+    if args.probe:
+        city, _, country = args.probe.partition(",")
+        print(f"Teste '{args.probe}': {gaz.lookup(city, country)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o índice offline de cidades (GeoNames).")
+    parser.add_argument("dump", help="Arquivo GeoNames (cities500.txt, cities1000.txt …)")
+    parser.add_argument("out", help="Diretório de saída do índice")
+    parser.add_argument("--country-info", help="countryInfo.txt para resolver nomes de países")
+    parser.add_argument("--min-population", type=int, default=0)
+    parser.add_argument("--alternates", action="store_true", help="Indexa também nomes alternativos")
+    parser.add_argument("--probe", help='Consulta de teste, ex.: "Sao Paulo,Brazil"')
+    main(parser.parse_args())
@@ -0,0 +1,51 @@
+"""
+build_sky_calendar.py
+---------------------
+Pré‑calcula o calendário global do céu (ingressos, estações, lunações e
+eclipses) e grava na tabela `sky_events`.
+
+Uso:
+    python build_sky_calendar.py [--from 2025] [--to 2030] [--print]
+
+Anos já gravados são recalculados e substituídos. Sem este script o
+calendário é calculado sob demanda, na primeira consulta de cada ano.
+"""
+import argparse
+import time
+from collections import Counter
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.main import app, db  # noqa: E402
+from app.models import SkyEvent  # noqa: E402
+from app.services.sky_calendar import compute_year, describe, store_year  # noqa: E402
+
+
+def main(args):
+    with app.app_context():
+        SkyEvent.__table__.create(db.engine, checkfirst=True)
+
+        for year in range(args.year_from, args.year_to + 1):
+            t0 = time.perf_counter()
+            events = compute_year(year)
+            store_year(year, events)
+            kinds = Counter(e["kind"] for e in events)
+            print(
+                f"✅ {year}: {len(events)} eventos em {time.perf_counter() - t0:.1f}s "
+                f"({', '.join(f'{k}={n}' for k, n in sorted(kinds.items()))})"
+            )
+            if args.print:
+                for e in events:
+                    print(f"   {e['date']:%Y-%m-%d %H:%M} UTC  {describe(e)}")
+
+
+if __name__ == "__main__":
+    this_year = datetime.utcnow().year
+    parser = argparse.ArgumentParser(description="Pré‑calcula o calendário do céu.")
+    parser.add_argument("--from", dest="year_from", type=int, default=this_year)
+    parser.add_argument("--to", dest="year_to", type=int, default=this_year + 2)
+    parser.add_argument("--print", action="store_true", help="Lista os eventos")
+    main(parser.parse_args())
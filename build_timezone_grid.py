@@ -0,0 +1,36 @@
+"""
+build_timezone_grid.py
+----------------------
+Gera a grade pré‑calculada de fusos‑horários usada por `timezone_service`.
+
+Uso:
+    python build_timezone_grid.py swisseph_data/tz_grid [--resolution 0.25] [--workers 4]
+
+Depois aponte `TZ_GRID_PATH` para o diretório de saída. Regere a grade
+sempre que atualizar o pacote `timezonefinder`.
+"""
+import argparse
+import os
+import time
+
+from app.services.timezone_service import build_grid
+
+
+def main(args):
+    t0 = time.perf_counter()
+    stats = build_grid(args.out, resolution=args.resolution, workers=args.workers)
+    elapsed = time.perf_counter() - t0
+    size_mb = os.path.getsize(os.path.join(args.out, "tz_grid.npy")) / 1e6
+    share = 100.0 * stats["boundary_cells"] / (stats["rows"] * stats["cols"])
+    print(
+        f"✅ Grade {stats['rows']}×{stats['cols']} ({size_mb:.1f} MB) em {elapsed:.0f}s · "
+        f"{stats['zones']} zonas · {share:.1f}% células de fronteira → {args.out}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera a grade lat/lon → fuso IANA.")
+    parser.add_argument("out", help="Diretório de saída")
+    parser.add_argument("--resolution", type=float, default=0.25, help="Tamanho da célula em graus")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    main(parser.parse_args())
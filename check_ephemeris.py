@@ -5,7 +5,6 @@ import argparse
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 import swisseph as swe
-import requests
 
 load_dotenv()  # ✅ Agora o .env é lido na hora!
 
@@ -19,44 +18,30 @@ SIGNS = [
     "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces",
 ]
 
-# Timezone
-try:
-    from zoneinfo import ZoneInfo
-except ImportError:
-    from pytz import timezone as ZoneInfo
-
-try:
-    from timezonefinder import TimezoneFinder
-    _TF = TimezoneFinder()
-
-    def get_timezone(lat, lon):
-        tz = _TF.timezone_at(lat=lat, lng=lon)
-        if tz is None:
-            raise ValueError("Timezone not found")
-        return tz
-except ImportError:
-    def get_timezone(lat, lon):
-        return os.getenv("DEFAULT_TIMEZONE", "UTC")
+# Timezone (grade compartilhada + TimezoneFinder sob demanda)
+from app.services.timezone_service import get_timezone, get_zoneinfo
+
+# OpenCage via cliente compartilhado (pool, retries, circuit breaker)
+from app.services.http_client import get_client
+
+OPENCAGE_URL = os.getenv("OPENCAGE_URL", "https://api.opencagedata.com/geocode/v1/json")
 
 def get_coordinates(city, country):
     api_key = os.getenv("OPENCAGE_API_KEY")
     if not api_key:
         raise RuntimeError("Missing OPENCAGE_API_KEY")
     query = f"{city.strip()}, {country.strip()}"
-    url = (
-        "https://api.opencagedata.com/geocode/v1/json"
-        f"?q={query}&key={api_key}&limit=1&language=en"
+    payload = get_client("opencage").get_json(
+        OPENCAGE_URL,
+        params={"q": query, "key": api_key, "limit": 1, "language": "en", "no_annotations": 1},
     )
-    resp = requests.get(url, timeout=10)
-    resp.raise_for_status()
-    payload = resp.json()
     if not payload.get("results"):
         raise ValueError(f"No results for '{query}'")
     geom = payload["results"][0]["geometry"]
     return {"lat": float(geom["lat"]), "lon": float(geom["lng"])}
 
 def jd_from_utc(dt_utc):
-    jd_ut, _ = swe.utc_to_jd(
+    _, jd_ut = swe.utc_to_jd(   # (TT, UT1)
         dt_utc.year,
         dt_utc.month,
         dt_utc.day,
@@ -70,7 +55,7 @@ def jd_from_utc(dt_utc):
 def main(args):
     coords = get_coordinates(args.city, args.country)
     tz = get_timezone(coords["lat"], coords["lon"])
-    tzinfo = ZoneInfo(tz)
+    tzinfo = get_zoneinfo(tz)
 
     dt_format = "%Y-%m-%d %H:%M"
     local_dt = datetime.strptime(f"{args.date} {args.time}", dt_format)
@@ -93,11 +78,71 @@ def main(args):
     print(f"Degree in sign : {sol_degree:.4f}")
     print("========================\n")
 
+def validate_tables(args):
+    """Compara as tabelas interpoladas com o Swiss Ephemeris em instantes aleatórios."""
+    import numpy as np
+    from app.services.ephemeris_tables import (
+        ALL_BODIES, MAX_ERROR_ARCSEC, MAX_ERROR_NEAR_SUN_ARCSEC, NEAR_SUN_DEG,
+        EphemerisTables, swe_positions,
+    )
+
+    path = args.tables or os.getenv("EPHEMERIS_TABLES_PATH")
+    if not path:
+        sys.exit("Informe --tables ou EPHEMERIS_TABLES_PATH.")
+    tables = EphemerisTables(path)
+
+    rng = np.random.default_rng(args.seed)
+    jds = rng.uniform(tables.jd_start, tables.jd_end, args.samples)
+    bodies = list(ALL_BODIES)
+
+    fast_lon, fast_speed = tables.positions(jds, bodies)
+    ref_lon, ref_speed = swe_positions(jds, bodies)
+    err = np.abs((fast_lon - ref_lon + 180.0) % 360.0 - 180.0) * 3600.0
+    speed_err = np.abs(fast_speed - ref_speed)
+
+    sun = ref_lon[:, bodies.index("SUN")]
+    elong = np.abs((ref_lon - sun[:, None] + 180.0) % 360.0 - 180.0)
+    near = elong < NEAR_SUN_DEG
+    near[:, bodies.index("SUN")] = False   # o próprio Sol não sofre deflexão
+
+    print(f"\n=== VALIDAÇÃO DAS TABELAS ({args.samples} instantes) ===")
+    print(f"{'corpo':8} {'máx ″':>9} {'p99 ″':>9} {'limite ″':>9} "
+          f"{'máx <5° Sol':>12} {'máx vel °/d':>12}")
+    failed = []
+    for j, body in enumerate(bodies):
+        far_err = err[~near[:, j], j]
+        near_err = err[near[:, j], j]
+        worst = float(far_err.max()) if far_err.size else 0.0
+        worst_near = float(near_err.max()) if near_err.size else 0.0
+        ok = worst <= MAX_ERROR_ARCSEC[body] and worst_near <= MAX_ERROR_NEAR_SUN_ARCSEC
+        if not ok:
+            failed.append(body)
+        print(f"{body:8} {worst:9.4f} {np.percentile(far_err, 99):9.4f} {MAX_ERROR_ARCSEC[body]:9.2f} "
+              f"{worst_near:12.4f} {float(speed_err[:, j].max()):12.6f}{'' if ok else '  ✖'}")
+    print(f"(limite a menos de {NEAR_SUN_DEG:.0f}° do Sol: {MAX_ERROR_NEAR_SUN_ARCSEC:.0f}″)")
+    print("========================================\n")
+
+    if failed:
+        sys.exit(f"✖ Erro acima do limite documentado: {', '.join(failed)}")
+    print("✅ Todas as posições dentro do limite documentado.")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--date", required=True)
-    parser.add_argument("--time", required=True)
-    parser.add_argument("--city", required=True)
-    parser.add_argument("--country", required=True)
+    parser.add_argument("--date")
+    parser.add_argument("--time")
+    parser.add_argument("--city")
+    parser.add_argument("--country")
+    parser.add_argument("--validate-tables", action="store_true",
+                        help="Valida as tabelas pré‑calculadas contra o Swiss Ephemeris")
+    parser.add_argument("--tables", help="Diretório das tabelas (padrão: EPHEMERIS_TABLES_PATH)")
+    parser.add_argument("--samples", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
     args = parser.parse_args()
-    main(args)
+
+    if args.validate_tables:
+        validate_tables(args)
+    elif not all([args.date, args.time, args.city, args.country]):
+        parser.error("--date, --time, --city e --country são obrigatórios")
+    else:
+        main(args)
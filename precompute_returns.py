@@ -0,0 +1,93 @@
+"""
+precompute_returns.py
+---------------------
+Pré‑calcula as revoluções solares de toda a base (sessões com relatório)
+para uma faixa de anos e grava na tabela `solar_returns`.
+
+Uso:
+    EPHEMERIS_TABLES_PATH=/data/eph python precompute_returns.py [--from 2025] [--to 2034] [--chunk 5000]
+
+Por bloco de sessões: geocodificação + JD natal (um local distinto por vez,
+`chart_batch.resolve_births`) e depois todos os retornos do bloco de uma
+vez (`returns_service.returns_many`). Anos já gravados são substituídos.
+Com as tabelas de efemérides o cálculo é vetorizado; sem elas, cada passo
+de Newton chama o `swe.calc_ut` ponto a ponto (bem mais lento).
+"""
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.main import app, db  # noqa: E402
+from app.models import SolarReturn, TestSession  # noqa: E402
+from app.services import ephemeris_executor  # noqa: E402
+from app.services.chart_batch import resolve_births  # noqa: E402
+from app.services.returns_service import returns_many, store_returns  # noqa: E402
+
+
+def _chunks(size):
+    last = 0
+    while True:
+        sessions = (
+            TestSession.query.filter(TestSession.ai_result.isnot(None), TestSession.id > last)
+            .order_by(TestSession.id)
+            .limit(size)
+            .all()
+        )
+        if not sessions:
+            return
+        yield sessions
+        last = sessions[-1].id
+
+
+def main(args):
+    years = list(range(args.year_from, args.year_to + 1))
+    with app.app_context():
+        SolarReturn.__table__.create(db.engine, checkfirst=True)
+
+        locations = {}
+        t_start = time.perf_counter()
+        total = failed = 0
+        for sessions in _chunks(args.chunk):
+            t0 = time.perf_counter()
+            records = [
+                (s.birth_date.strftime("%Y-%m-%d"), s.birth_time.strftime("%H:%M"), s.birth_city, s.birth_country)
+                for s in sessions
+            ]
+            ids, jds, lats, lons = [], [], [], []
+            for s, moment in zip(sessions, resolve_births(records, locations)):
+                if isinstance(moment, Exception):
+                    failed += 1
+                    continue
+                jd, coords, _tz = moment
+                ids.append(s.id)
+                jds.append(jd)
+                lats.append(coords["lat"])
+                lons.append(coords["lon"])
+            db.session.expunge_all()
+            if not ids:
+                continue
+
+            result = ephemeris_executor.run(
+                returns_many, np.array(jds), np.array(lats), np.array(lons), years, timeout=0
+            )
+            total += store_returns(ids, years, result)
+            print(f"  sessões até {sessions[-1].id}: {len(ids) * len(years)} retornos em {time.perf_counter() - t0:.1f}s")
+
+        print(
+            f"✅ {total} retornos ({years[0]}–{years[-1]}) em {time.perf_counter() - t_start:.1f}s; "
+            f"{failed} sessões com erro de local/data"
+        )
+
+
+if __name__ == "__main__":
+    this_year = datetime.utcnow().year
+    parser = argparse.ArgumentParser(description="Pré‑calcula revoluções solares.")
+    parser.add_argument("--from", dest="year_from", type=int, default=this_year)
+    parser.add_argument("--to", dest="year_to", type=int, default=this_year + 9)
+    parser.add_argument("--chunk", type=int, default=5000, help="Sessões por bloco")
+    main(parser.parse_args())
@@ -0,0 +1,64 @@
+"""
+upgrade_db.py
+-------------
+Atualiza um banco existente para os modelos atuais sem apagar nada
+(ao contrário de `create_tables.py`, que faz drop_all).
+
+Uso:
+    python upgrade_db.py [--dry-run]
+
+Cria as tabelas que faltam (`db.create_all`) e adiciona, com
+`ALTER TABLE … ADD COLUMN`, as colunas dos modelos que ainda não existem
+no banco (ex. `test_sessions.chart_blob`). Colunas novas entram sempre
+como anuláveis; pode ser rodado quantas vezes quiser.
+"""
+import argparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import inspect, text  # noqa: E402
+
+from app.main import app, db  # noqa: E402
+from app import models  # noqa: E402,F401  (registra os modelos no metadata)
+
+
+def missing_columns():
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                yield table, column
+
+
+def main(args):
+    with app.app_context():
+        print(f"[DB CHECK] URI ativa: {app.config['SQLALCHEMY_DATABASE_URI']}")
+        preparer = db.engine.dialect.identifier_preparer
+        statements = [
+            f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN "
+            f"{preparer.format_column(column)} {column.type.compile(dialect=db.engine.dialect)}"
+            for table, column in missing_columns()
+        ]
+        for sql in statements:
+            print(f"  {sql}")
+        if args.dry_run:
+            print(f"(dry‑run) {len(statements)} colunas a adicionar")
+            return
+
+        db.create_all()
+        with db.engine.begin() as conn:
+            for sql in statements:
+                conn.execute(text(sql))
+        print(f"✅ Banco atualizado: {len(statements)} colunas adicionadas")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cria tabelas e colunas novas sem apagar dados.")
+    parser.add_argument("--dry-run", action="store_true", help="Só mostra o que seria feito")
+    main(parser.parse_args())
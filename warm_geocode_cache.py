@@ -0,0 +1,62 @@
+"""
+warm_geocode_cache.py
+---------------------
+Pré‑aquece o cache de geocodificação (`geocode_cache`) com todas as
+cidades já informadas em `TestSession` e `LoveCompatibility`.
+
+Uso:
+    python warm_geocode_cache.py [--delay 1.0] [--limit N] [--dry-run]
+
+O `--delay` padrão (1 s) respeita o rate‑limit do plano gratuito do OpenCage.
+"""
+import argparse
+from itertools import islice
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.main import app, db  # noqa: E402
+from app.models import GeocodeCache, LoveCompatibility, TestSession  # noqa: E402
+from app.services.astrology_service import geocode_opencage  # noqa: E402
+from app.services.geocoding_service import place_key, warm_cache  # noqa: E402
+
+
+def distinct_places():
+    """Pares (cidade, país) distintos das duas tabelas de entrada."""
+    q1 = db.session.query(TestSession.birth_city, TestSession.birth_country).distinct()
+    q2 = db.session.query(
+        LoveCompatibility.target_birth_city, LoveCompatibility.target_birth_country
+    ).distinct()
+    for city, country in q1.union(q2).yield_per(500):
+        if city and country:
+            yield city, country
+
+
+def main(args):
+    with app.app_context():
+        GeocodeCache.__table__.create(db.engine, checkfirst=True)
+
+        places = distinct_places()
+        if args.limit:
+            places = islice(places, args.limit)
+
+        if args.dry_run:
+            keys = {place_key(c, p) for c, p in places}
+            print(f"{len(keys)} locais distintos encontrados.")
+            return
+
+        stats = warm_cache(places, geocode_opencage, delay=args.delay)
+        print(
+            f"✅ Cache aquecido: {stats['seen']} locais · {stats['cached']} já em cache · "
+            f"{stats['fetched']} novos · {stats['not_found']} sem resultado · "
+            f"{stats['errors']} erros"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pré‑aquece o cache de geocodificação.")
+    parser.add_argument("--delay", type=float, default=1.0, help="Pausa entre chamadas ao OpenCage (s)")
+    parser.add_argument("--limit", type=int, default=0, help="Processa no máximo N locais")
+    parser.add_argument("--dry-run", action="store_true", help="Só conta os locais distintos")
+    main(parser.parse_args())
@@ -0,0 +1,60 @@
+"""
+worker.py
+---------
+Processo que executa a fila de jobs (`job_queue`, tabela `report_jobs`):
+hoje, a geração dos relatórios pagos.
+
+Uso:
+    python worker.py [--concurrency 2] [--once]
+    python worker.py --requeue-dead [JOB_ID ...]
+    python worker.py --stats
+    python worker.py --evict-llm-cache
+
+No Heroku é a linha `worker:` do Procfile; escale com `heroku ps:scale
+worker=N` (cada processo roda `--concurrency` jobs ao mesmo tempo, e vários
+processos/máquinas dividem a fila sem pegar o mesmo job). SIGTERM para de
+pegar jobs novos e espera os que estão rodando; o que não terminar volta
+para a fila quando o lease vencer.
+"""
+import argparse
+import json
+import logging
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.main import app, db  # noqa: E402  (create_app importa as rotas → handler "report")
+from app.models import ReportJob  # noqa: E402
+from app.services import job_queue, llm_cache  # noqa: E402
+
+
+def main(args):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    with app.app_context():
+        ReportJob.__table__.create(db.engine, checkfirst=True)
+        if args.stats:
+            print(json.dumps(job_queue.stats(), indent=2))
+            return
+        if args.requeue_dead is not None:
+            n = job_queue.requeue_dead(args.requeue_dead or None)
+            print(f"✅ {n} job(s) devolvidos à fila")
+            return
+        if args.evict_llm_cache:
+            print(json.dumps(llm_cache.evict(), indent=2))
+            return
+
+    executed = job_queue.Worker(app, concurrency=args.concurrency).run(once=args.once)
+    print(f"Worker encerrado: {executed} job(s) executados")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executa a fila de jobs (relatórios).")
+    parser.add_argument("--concurrency", type=int, default=job_queue.JOB_CONCURRENCY, help="Jobs simultâneos")
+    parser.add_argument("--once", action="store_true", help="Esvazia a fila e sai")
+    parser.add_argument("--requeue-dead", nargs="*", type=int, default=None, metavar="JOB_ID",
+                        help="Devolve jobs dead à fila (todos, sem IDs)")
+    parser.add_argument("--stats", action="store_true", help="Mostra a fila e sai")
+    parser.add_argument("--evict-llm-cache", action="store_true",
+                        help="Apaga respostas velhas/excedentes do cache do LLM e sai")
+    main(parser.parse_args())